@@ -0,0 +1,120 @@
+"""
+Benchmark de la limpieza de Skechers: camino anterior (separar válidos e inválidos, copiar,
+dos merges y concat) frente al plan actual (una máscara de validez y un solo cruce).
+
+Los dos caminos se miden con los mismos límites: la referencia se prepara antes de medir
+(deduplicada en el camino anterior, indexada en el plan) y el resultado es el DataFrame sin
+compactar. La compactación de la salida (categorías y texto de Arrow) se mide aparte.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/benchmark_skechers.py --rows 2000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from utils.data_cleaner import DataCleaner, PATRON_AMERICANA  # noqa: E402
+
+COLUMNAS_REFERENCIA = ['U_Genero', 'U_Suela', 'U_Division', 'U_Temporalidad']
+
+def generar_datos(filas: int, estilos: int, semilla: int = 0):
+    """Archivo de entrada con ~filas/estilos SKUs por estilo (un 5% inválidos) y su referencia"""
+    rng = np.random.default_rng(semilla)
+    codigos = np.array([f"{100000 + i}" for i in range(estilos)], dtype=object)
+    estilo = codigos[rng.integers(0, estilos, filas)]
+    descripcion = np.array([f"ZAPATILLA {i} AMERICANA {i % 40}.5" for i in range(500)], dtype=object)
+    item_name = (pd.Series(estilo) + '/' + descripcion[rng.integers(0, 500, filas)]
+                 + '/' + pd.Series(rng.integers(5, 12, filas)).astype(str) + '/BLK')
+    # Estilos inválidos: sin '/' o con un primer carácter no alfanumérico
+    invalidos = rng.random(filas) < 0.05
+    item_name[invalidos] = '-' + item_name[invalidos].str.replace('/', ' ', regex=False)
+    entrada = pd.DataFrame({
+        'ItemName': item_name,
+        'ItemCode': pd.Series(np.arange(filas)).astype(str),
+        'Empresa': 'SKECHERS',
+    })
+    referencia = pd.DataFrame({
+        'U_Estilo': codigos,
+        'U_Genero': rng.choice(['MENS', 'WOMENS', 'KIDS'], estilos),
+        'U_Suela': rng.choice(['GOMA', 'EVA'], estilos),
+        'U_Division': rng.choice(['FOOTWEAR', 'APPAREL'], estilos),
+        'U_Temporalidad': rng.choice(['SS24', 'FW24', 'SS25'], estilos),
+    })
+    return entrada, referencia
+
+def preparar_referencia_separada(referencia: pd.DataFrame) -> pd.DataFrame:
+    """Referencia del camino anterior: un documento por estilo, con el estilo como texto"""
+    df_reference = referencia[['U_Estilo'] + COLUMNAS_REFERENCIA].drop_duplicates('U_Estilo')
+    df_reference['U_Estilo'] = df_reference['U_Estilo'].astype(str)
+    return df_reference
+
+def limpieza_separada(df: pd.DataFrame, df_reference: pd.DataFrame) -> pd.DataFrame:
+    """Camino anterior: válidos e inválidos por separado, con copias, dos merges y concat"""
+    df = df.copy()
+    for col in ['U_Estilo', 'U_Descripcion'] + COLUMNAS_REFERENCIA:
+        if col not in df.columns:
+            df[col] = np.nan
+    df['U_Estilo'] = df['ItemName'].str.split('/').str[0]
+    cond_valido = df['ItemName'].str.contains('/') & (
+        (df['U_Estilo'].str.len() >= 2) & df['U_Estilo'].str[0].str.isalnum())
+    df_valido = df[cond_valido].copy()
+    df_invalido = df[~cond_valido].copy()
+    df_invalido['U_Estilo'] = np.nan
+    df_valido['U_Descripcion'] = df_valido['ItemName'].str.split('/').str[1].str.replace(
+        PATRON_AMERICANA, '', regex=True)
+
+    partes = []
+    for parte in (df_valido, df_invalido):
+        parte['U_Estilo'] = parte['U_Estilo'].astype(str)
+        parte = pd.merge(parte, df_reference, on='U_Estilo', how='left', suffixes=('', '_ref'))
+        for col in COLUMNAS_REFERENCIA:
+            parte[col] = parte[col].fillna(parte[f'{col}_ref'])
+            parte = parte.drop(columns=[f'{col}_ref'])
+        partes.append(parte)
+    return pd.concat(partes, ignore_index=True)
+
+def medir(funcion, repeticiones: int) -> float:
+    """Mejor tiempo de varias repeticiones"""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Filas del archivo de entrada")
+    parser.add_argument("--styles", type=int, default=100_000, help="Estilos distintos (~20 SKUs por estilo)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones de cada medición")
+    args = parser.parse_args()
+
+    entrada, referencia = generar_datos(args.rows, args.styles)
+    cleaner = DataCleaner("SK", {"Skechers": referencia})
+    cleaner.show_messages = False
+    cleaner.compact_output = False
+    # Fuera de la medición en los dos caminos: la referencia se prepara una vez por snapshot
+    df_reference = preparar_referencia_separada(referencia)
+    cleaner.prepare_reference()
+
+    anterior = medir(lambda: limpieza_separada(entrada, df_reference), args.repeat)
+    actual = medir(lambda: cleaner.clean_data(entrada), args.repeat)
+
+    resultado = cleaner.clean_data(entrada)
+    compactacion = medir(lambda: cleaner._plan("SK").compactar(resultado), args.repeat)
+    assert resultado['ItemName'].equals(entrada['ItemName']), "El plan debe conservar el orden del archivo"
+    completas = resultado[COLUMNAS_REFERENCIA].notna().any(axis=1).sum()
+
+    print(f"Skechers, {args.rows:,} filas, {args.styles:,} estilos ({completas:,} filas completadas)")
+    print(f"  separar + 2 merges + concat: {anterior:7.2f} s")
+    print(f"  máscara + un cruce:          {actual:7.2f} s  ({anterior / actual:.1f}x)")
+    print(f"  compactación de la salida:   {compactacion:7.2f} s  (aparte, con compact_output)")
+
+if __name__ == "__main__":
+    main()
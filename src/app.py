@@ -5,10 +5,19 @@ import os
 import tempfile
 import re
 import sys
+import logging
 from datetime import datetime
 from utils.data_cleaner import DataCleaner
 from utils.file_handler import FileHandler
-from mongo_extractor import crear_dataframes_de_todas_las_colecciones
+from utils.reference_provider import ReferenceProvider
+from mongo_extractor import (
+    extraer_todas_las_colecciones, cargar_coleccion_con_snapshot, invalidar_snapshots,
+    obtener_metricas, DEDUP_EN_SERVIDOR, UMBRAL_CLAVES_SEMIJOIN, SNAPSHOT_TTL_SEGUNDOS,
+    COLECCIONES_POR_MARCA
+)
+
+# Las métricas de extracción se escriben en el log del servidor (además de mostrarse en el sidebar)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
 # Configuración de autenticación usando secrets.toml
 LOGIN_CONFIG = {
@@ -163,18 +172,12 @@ def check_authentication():
         show_login_screen()
         st.stop()
 
-@st.cache_data
-def load_mongo_dataframes():
-    """Carga los DataFrames de MongoDB con cache"""
-    try:
-        dataframes = crear_dataframes_de_todas_las_colecciones()
-        if dataframes:
-            return dataframes
-        else:
-            return {}
-    except Exception as e:
-        st.error(f"Error cargando DataFrames de MongoDB: {e}")
-        return {}
+@st.cache_resource
+def get_reference_provider():
+    """Proveedor de referencias compartido por todas las sesiones (carga cada colección bajo demanda)"""
+    return ReferenceProvider(extraer_todas_las_colecciones, cargar_coleccion_con_snapshot,
+                             deduplicar=DEDUP_EN_SERVIDOR, umbral_semijoin=UMBRAL_CLAVES_SEMIJOIN,
+                             ttl_segundos=SNAPSHOT_TTL_SEGUNDOS, rutas=COLECCIONES_POR_MARCA)
 
 def detect_brand_from_filename(filename):
     """Detecta la marca desde el nombre del archivo"""
@@ -536,8 +539,11 @@ st.markdown('</div>', unsafe_allow_html=True)
 
 # Ticker horizontal estático - Contenedor centrado con ancho máximo
 try:
-    mongo_dataframes = load_mongo_dataframes()
-    if mongo_dataframes:
+    reference_provider = get_reference_provider()
+    colecciones = reference_provider.colecciones()
+    if colecciones:
+        # Solo se muestran los tamaños de las colecciones ya cargadas; el resto se carga al procesar
+        colecciones_cargadas = reference_provider.loaded()
         from datetime import datetime
         current_time = datetime.now().strftime("%H:%M:%S")
 
@@ -545,7 +551,7 @@ try:
         st.markdown('<div style="max-width: 1200px; margin: 0 auto; width: 100%;">', unsafe_allow_html=True)
 
         # Usar columns con gap específico para mejor espaciado
-        n_collections = len(mongo_dataframes)
+        n_collections = len(colecciones)
         # Crear columnas: LIVE + colecciones + tiempo, todas del mismo tamaño proporcional
         col_weights = [1] + [2] * n_collections + [1]
         cols = st.columns(col_weights, gap="small")
@@ -568,10 +574,15 @@ try:
             </div>
             """, unsafe_allow_html=True)
 
-        for i, (collection_name, df) in enumerate(mongo_dataframes.items()):
+        for i, collection_name in enumerate(colecciones):
             with cols[i + 1]:
-                total_records = df.shape[0]
-                total_fields = df.shape[1]
+                df = colecciones_cargadas.get(collection_name)
+                if df is not None:
+                    records_text = f"{df.shape[0]:,} registros"
+                    fields_text = f"{df.shape[1]} campos"
+                else:
+                    records_text = "Bajo demanda"
+                    fields_text = "sin cargar"
 
                 st.markdown(f"""
                 <div style="background: #ffffff; 
@@ -586,8 +597,8 @@ try:
                             flex-direction: column;
                             justify-content: center;">
                     <div style="color: #2d3748; font-weight: 600; font-size: 0.75rem; text-transform: uppercase; letter-spacing: 0.02em; line-height: 1.2; margin-bottom: 0.25rem;">{collection_name}</div>
-                    <div style="color: #718096; font-size: 0.7rem; font-weight: 400; line-height: 1.3;">{total_records:,} registros</div>
-                    <div style="color: #a0aec0; font-size: 0.65rem; line-height: 1.2;">{total_fields} campos</div>
+                    <div style="color: #718096; font-size: 0.7rem; font-weight: 400; line-height: 1.3;">{records_text}</div>
+                    <div style="color: #a0aec0; font-size: 0.65rem; line-height: 1.2;">{fields_text}</div>
                 </div>
                 """, unsafe_allow_html=True)
 
@@ -631,7 +642,8 @@ with st.sidebar:
     elif action == "Actualizar Base de Datos":
         with st.spinner("Actualizando base de datos..."):
             st.cache_data.clear()
-            load_mongo_dataframes.clear()
+            invalidar_snapshots()
+            get_reference_provider().clear()
         st.success("Base de datos actualizada")
 
     st.markdown("---")
@@ -700,6 +712,17 @@ with st.sidebar:
 
     st.markdown("---")
 
+    metricas = obtener_metricas()
+    if metricas:
+        with st.expander("Métricas de extracción"):
+            df_metricas = pd.DataFrame(metricas[::-1])
+            ultima = metricas[-1]
+            st.caption(f"Última: {ultima['coleccion']} • {ultima['total_s']:.2f}s • "
+                       f"{ultima['docs_por_s']:,.0f} docs/s • ~{ultima['mb_aprox']} MB")
+            st.dataframe(df_metricas, hide_index=True, use_container_width=True)
+
+        st.markdown("---")
+
     st.markdown("""
     <div style="text-align: center; padding: 1rem; color: #718096; font-size: 0.75rem;">
         <strong style="color: #4a5568; font-size: 0.85rem;">Data Cleaner Pro</strong><br>
@@ -816,13 +839,13 @@ with tab1:
                         ):
                             with st.spinner("Procesando datos..."):
                                 try:
-                                    mongo_dataframes = load_mongo_dataframes()
+                                    reference_provider = get_reference_provider()
 
-                                    if not mongo_dataframes:
+                                    if not reference_provider.colecciones():
                                         st.error("Error al conectar con MongoDB")
                                         st.stop()
 
-                                    cleaner = DataCleaner(brand, mongo_dataframes)
+                                    cleaner = DataCleaner(brand, reference_provider)
                                     cleaned_df = cleaner.clean_data(df)
 
                                     st.session_state['cleaned_data'] = cleaned_df
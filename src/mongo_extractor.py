@@ -1,10 +1,23 @@
 import pandas as pd
+import numpy as np
 from pymongo import MongoClient
 import logging
 from datetime import datetime, timedelta
 import sys
 import os
+import re
+import json
+import time
+import asyncio
+import atexit
+import hashlib
+import threading
+from collections import deque
+import pyarrow as pa
+import pyarrow.feather as feather
 import streamlit as st
+from utils.extraction_metrics import ExtractionMetrics
+from utils.arrow_io import arrow_to_dataframe, dataframe_to_arrow
 
 # Configuración de MongoDB usando secrets.toml
 try:
@@ -19,6 +32,158 @@ except KeyError as e:
         "db": None
     }
 
+def _leer_secret(nombre, defecto=None):
+    """Lee un secret opcional, devolviendo el valor por defecto si no está definido"""
+    try:
+        return st.secrets[nombre]
+    except (KeyError, FileNotFoundError):
+        return defecto
+
+# Configuración del pool de conexiones (opcional en secrets.toml)
+MONGO_POOL_CONFIG = {
+    "maxPoolSize": int(_leer_secret("MONGO_MAX_POOL_SIZE", 20)),
+    "minPoolSize": int(_leer_secret("MONGO_MIN_POOL_SIZE", 0)),
+    "maxIdleTimeMS": int(_leer_secret("MONGO_MAX_IDLE_TIME_MS", 300000)),
+    "serverSelectionTimeoutMS": int(_leer_secret("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000)),
+    "connectTimeoutMS": int(_leer_secret("MONGO_CONNECT_TIMEOUT_MS", 10000)),
+    "socketTimeoutMS": int(_leer_secret("MONGO_SOCKET_TIMEOUT_MS", 120000)),
+}
+
+# Deduplicar las referencias por estilo en el servidor (pipeline de agregación) en lugar de en pandas
+DEDUP_EN_SERVIDOR = str(_leer_secret("MONGO_DEDUP_EN_SERVIDOR", True)).lower() not in ("false", "0", "no")
+
+# Búsqueda dirigida (semi-join): hasta este número de claves distintas se consultan solo los
+# estilos presentes en el archivo con filtros $in por lotes; por encima se descarga la colección
+UMBRAL_CLAVES_SEMIJOIN = int(_leer_secret("MONGO_UMBRAL_CLAVES", 5000))
+TAMANO_LOTE_CLAVES = int(_leer_secret("MONGO_TAMANO_LOTE_CLAVES", 1000))
+
+# Documentos por lote al leer un cursor
+TAMANO_LOTE_CURSOR = int(_leer_secret("MONGO_BATCH_SIZE", 5000))
+
+# Número máximo de colecciones que se extraen en paralelo
+MAX_WORKERS_EXTRACCION = int(_leer_secret("MONGO_MAX_WORKERS", 4))
+
+# Colección de referencia de cada marca ({"SK": "nombre_coleccion"}); las marcas que no
+# aparecen se asignan por nombre a la colección que mejor coincide
+COLECCIONES_POR_MARCA = dict(_leer_secret("MONGO_COLECCIONES_MARCA", {}))
+
+# Snapshots locales de las colecciones (Feather sin comprimir, se leen con memory-map)
+SNAPSHOT_DIR = _leer_secret(
+    "SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "snapshots")
+)
+SNAPSHOT_TTL_SEGUNDOS = int(_leer_secret("SNAPSHOT_TTL_SEGUNDOS", 3600))
+
+# Sincronización incremental: las colecciones con estos campos se refrescan descargando solo
+# los documentos modificados desde la última marca de agua, con una reconciliación completa
+# periódica para eliminar los documentos borrados
+SYNC_INCREMENTAL = str(_leer_secret("SNAPSHOT_SYNC_INCREMENTAL", True)).lower() not in ("false", "0", "no")
+CAMPOS_ACTUALIZACION = list(_leer_secret("SNAPSHOT_CAMPOS_ACTUALIZACION", ["updatedate", "createdate"]))
+RECONCILIACION_SEGUNDOS = int(_leer_secret("SNAPSHOT_RECONCILIACION_SEGUNDOS", 86400))
+
+# Cliente compartido por todo el proceso (todas las sesiones de Streamlit usan el mismo pool)
+_cliente = None
+_cliente_lock = threading.Lock()
+
+def obtener_cliente():
+    """
+    Devuelve el MongoClient compartido del proceso, creándolo la primera vez que se necesita.
+
+    MongoClient es thread-safe y mantiene su propio pool de conexiones, por lo que
+    una sola instancia sirve a todas las funciones del extractor y a todas las sesiones.
+
+    Returns:
+        MongoClient: Cliente con pool configurado según MONGO_POOL_CONFIG
+    """
+    global _cliente
+    if _cliente is None:
+        with _cliente_lock:
+            if _cliente is None:
+                if not MONGO_CONFIG["mongouri"]:
+                    raise ValueError("MONGO_URI no está configurado")
+                _cliente = MongoClient(MONGO_CONFIG["mongouri"], **MONGO_POOL_CONFIG)
+                print(f"✓ Pool de conexiones MongoDB creado (maxPoolSize={MONGO_POOL_CONFIG['maxPoolSize']})")
+    return _cliente
+
+def cerrar_cliente():
+    """Cierra el cliente compartido y libera las conexiones del pool"""
+    global _cliente
+    with _cliente_lock:
+        if _cliente is not None:
+            _cliente.close()
+            _cliente = None
+            print("✓ Pool de conexiones MongoDB cerrado")
+
+atexit.register(cerrar_cliente)
+
+logger = logging.getLogger(__name__)
+
+# Últimas métricas de extracción (una por extracción), consultables desde la app
+_metricas = deque(maxlen=200)
+_metricas_lock = threading.Lock()
+
+def registrar_metricas(metricas):
+    """Guarda las métricas de una extracción y las escribe en el log"""
+    metricas.cerrar()
+    with _metricas_lock:
+        _metricas.append(metricas)
+    if metricas.error:
+        logger.warning("%s - error: %s", metricas, metricas.error)
+    else:
+        logger.info("%s", metricas)
+
+def obtener_metricas():
+    """
+    Devuelve las métricas de las últimas extracciones, de la más antigua a la más reciente
+
+    Returns:
+        list: Lista de diccionarios (ver ExtractionMetrics.como_dict)
+    """
+    with _metricas_lock:
+        return [metricas.como_dict() for metricas in _metricas]
+
+def limpiar_metricas():
+    """Descarta las métricas registradas"""
+    with _metricas_lock:
+        _metricas.clear()
+
+def _conectar(metricas):
+    """
+    Obtiene el cliente, registrando el tiempo en la fase conexion
+
+    El MongoClient conecta de forma perezosa: cuando se crea el cliente se hace un ping para
+    que la conexión y el handshake cuenten en la fase conexion y no en la fase consulta. Con
+    el cliente ya creado, el pool tiene conexiones abiertas y no se vuelve a hacer el ping.
+    """
+    with metricas.fase("conexion"):
+        nuevo = _cliente is None
+        cliente = obtener_cliente()
+        if nuevo:
+            cliente.admin.command("ping")
+
+def _medir_documentos(documentos, metricas):
+    """
+    Recorre un cursor registrando en metricas el tiempo hasta el primer lote (consulta),
+    el tiempo de drenado del resto (lectura) y el número y tamaño aproximado de los documentos
+    """
+    inicio = time.perf_counter()
+    primero = None
+    try:
+        for documento in documentos:
+            if primero is None:
+                primero = time.perf_counter()
+                metricas.fases["consulta"] = metricas.fases.get("consulta", 0.0) + primero - inicio
+            metricas.registrar_documento(documento)
+            yield documento
+    finally:
+        fin = time.perf_counter()
+        if primero is None:
+            metricas.fases["consulta"] = metricas.fases.get("consulta", 0.0) + fin - inicio
+        else:
+            metricas.fases["lectura"] = metricas.fases.get("lectura", 0.0) + fin - primero
+        if hasattr(documentos, "close"):
+            documentos.close()
+
 def extraer_todas_las_colecciones():
     """Extrae todas las colecciones de la base de datos MongoDB"""
     try:
@@ -33,7 +198,7 @@ def extraer_todas_las_colecciones():
         
         print(f"Intentando conectar a base de datos: {MONGO_CONFIG['db']}")
         
-        client = MongoClient(MONGO_CONFIG["mongouri"])
+        client = obtener_cliente()
         
         # Test de conexión
         client.admin.command('ping')
@@ -48,7 +213,6 @@ def extraer_todas_las_colecciones():
         for i, coleccion in enumerate(colecciones, 1):
             print(f"{i}. {coleccion}")
             
-        client.close()
         return colecciones
         
     except Exception as e:
@@ -56,67 +220,705 @@ def extraer_todas_las_colecciones():
         print(f"Tipo de error: {type(e).__name__}")
         return []
 
-def extraer_datos_coleccion(nombre_coleccion, limite=None):
-    """Extrae datos de una colección específica"""
+def construir_proyeccion(campos):
+    """
+    Construye la proyección de MongoDB para descargar solo los campos indicados
+
+    Args:
+        campos: Lista de campos a incluir (None para descargar el documento completo)
+
+    Returns:
+        dict: Proyección para find(), o None si no se restringen campos.
+              '_id' se excluye salvo que se pida explícitamente.
+    """
+    if campos is None:
+        return None
+    proyeccion = {campo: 1 for campo in campos}
+    if "_id" not in proyeccion:
+        proyeccion["_id"] = 0
+    return proyeccion
+
+def _abrir_cursor(nombre_coleccion, limite=None, campos=None, filtro=None, batch_size=None):
+    """Abre un cursor find() sobre la colección con la proyección y el tamaño de lote indicados"""
+    db = obtener_cliente()[MONGO_CONFIG["db"]]
+    cursor = db[nombre_coleccion].find(filtro or {}, construir_proyeccion(campos),
+                                       batch_size=batch_size or TAMANO_LOTE_CURSOR)
+    if limite:
+        cursor = cursor.limit(limite)
+    return cursor
+
+def extraer_datos_coleccion(nombre_coleccion, limite=None, campos=None, filtro=None):
+    """
+    Extrae datos de una colección específica
+
+    Args:
+        nombre_coleccion: Nombre de la colección
+        limite: Número máximo de documentos a extraer
+        campos: Lista de campos a descargar (proyección); None descarga todos
+        filtro: Filtro de find(); None extrae todos los documentos
+    """
+    metricas = ExtractionMetrics(nombre_coleccion, "filtrada" if filtro else "completa")
     try:
-        client = MongoClient(MONGO_CONFIG["mongouri"])
-        db = client[MONGO_CONFIG["db"]]
-        coleccion = db[nombre_coleccion]
-        
-        if limite:
-            datos = list(coleccion.find().limit(limite))
-        else:
-            datos = list(coleccion.find())
+        _conectar(metricas)
+        datos = list(_medir_documentos(_abrir_cursor(nombre_coleccion, limite, campos, filtro), metricas))
             
         print(f"Colección '{nombre_coleccion}': {len(datos)} documentos extraídos")
         
-        client.close()
         return datos
         
     except Exception as e:
+        metricas.error = str(e)
         print(f"Error al extraer datos de la colección '{nombre_coleccion}': {e}")
         return []
+    finally:
+        registrar_metricas(metricas)
+
+def construir_pipeline_unicos(claves, campos=None, filtro=None):
+    """
+    Construye un pipeline de agregación que devuelve un documento por valor de las claves
+
+    Equivale a drop_duplicates(claves) sobre la colección ordenada por _id: los documentos se
+    ordenan por _id antes de agrupar, de modo que $first conserva los valores del documento
+    con menor _id (con ObjectId, el primero que se insertó), y los grupos se devuelven
+    ordenados por el _id de ese documento. Así un drop_duplicates posterior sobre un
+    subconjunto de las claves conserva el mismo documento que sobre la colección completa.
+
+    Args:
+        claves: Lista de campos por los que agrupar (p. ej. ['U_Estilo'])
+        campos: Campos adicionales a conservar; None conserva solo las claves
+        filtro: Filtro ($match) a aplicar antes de agrupar
+
+    Returns:
+        list: Pipeline para aggregate()
+    """
+    otros_campos = [campo for campo in (campos or []) if campo not in claves and campo != "_id"]
+    grupo = {"_id": {clave: f"${clave}" for clave in claves}, "_primero": {"$first": "$_id"}}
+    grupo.update({campo: {"$first": f"${campo}"} for campo in otros_campos})
+    proyeccion = {"_id": 0}
+    proyeccion.update({clave: f"$_id.{clave}" for clave in claves})
+    proyeccion.update({campo: 1 for campo in otros_campos})
+    pipeline = [{"$match": filtro}] if filtro else []
+    return pipeline + [
+        # Sin un $sort previo, $first no garantiza qué documento del grupo se conserva
+        {"$sort": {"_id": 1}},
+        {"$group": grupo},
+        {"$sort": {"_primero": 1}},
+        {"$project": proyeccion},
+    ]
+
+def _abrir_cursor_unicos(nombre_coleccion, claves, campos=None, filtro=None, batch_size=None):
+    """Abre un cursor de agregación con un documento por clave"""
+    db = obtener_cliente()[MONGO_CONFIG["db"]]
+    pipeline = construir_pipeline_unicos(claves, campos, filtro)
+    return db[nombre_coleccion].aggregate(pipeline, allowDiskUse=True,
+                                          batchSize=batch_size or TAMANO_LOTE_CURSOR)
+
+def _variantes_clave(valores):
+    """Añade la variante entera de las claves numéricas (U_Estilo puede estar guardado como número)"""
+    variantes = []
+    for valor in valores:
+        variantes.append(valor)
+        if isinstance(valor, str) and valor.isdigit():
+            variantes.append(int(valor))
+    return variantes
+
+def _documentos_por_claves(nombre_coleccion, clave, valores, campos=None, agrupar_por=None,
+                           tamano_lote=None, batch_size=None):
+    """Genera los documentos cuya clave está en valores, consultando con $in por lotes"""
+    tamano_lote = tamano_lote or TAMANO_LOTE_CLAVES
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamano_lote):
+        lote = _variantes_clave(valores[inicio:inicio + tamano_lote])
+        filtro = {clave: {"$in": lote}}
+        if agrupar_por:
+            cursor = _abrir_cursor_unicos(nombre_coleccion, agrupar_por, campos, filtro, batch_size)
+        else:
+            cursor = _abrir_cursor(nombre_coleccion, campos=campos, filtro=filtro, batch_size=batch_size)
+        yield from cursor
+
+class ExtraccionCancelada(Exception):
+    """La extracción se interrumpió porque la tarea que la pidió fue cancelada"""
+
+def documentos_a_dataframe(documentos, cancelado=None, metricas=None, batch_size=None):
+    """
+    Construye un DataFrame leyendo los documentos uno a uno en arrays por columna
+
+    A diferencia de pd.DataFrame(list(cursor)), nunca mantiene en memoria la lista completa
+    de diccionarios: cada documento se vuelca en las columnas y se descarta. Los campos
+    ausentes en un documento quedan como NaN, igual que al construir desde una lista de dicts.
+
+    Args:
+        documentos: Iterable de documentos (p. ej. un cursor de pymongo)
+        cancelado: threading.Event opcional; si se activa, se cierra el cursor y se lanza
+            ExtraccionCancelada
+        metricas: ExtractionMetrics opcional donde se registran los tiempos de cada fase
+        batch_size: Cada cuántos documentos se comprueba la cancelación (por defecto
+            TAMANO_LOTE_CURSOR; conviene que coincida con el lote del cursor)
+
+    Returns:
+        pd.DataFrame: DataFrame con una columna por campo, en orden de aparición
+    """
+    if metricas is not None:
+        documentos = _medir_documentos(documentos, metricas)
+    batch_size = batch_size or TAMANO_LOTE_CURSOR
+    columnas = {}
+    n_filas = 0
+    for documento in documentos:
+        if cancelado is not None and n_filas % batch_size == 0 and cancelado.is_set():
+            if hasattr(documentos, "close"):
+                documentos.close()
+            raise ExtraccionCancelada()
+        for campo, valor in documento.items():
+            columna = columnas.get(campo)
+            if columna is None:
+                columna = columnas[campo] = [np.nan] * n_filas
+            columna.append(valor)
+        n_filas += 1
+        if len(documento) < len(columnas):
+            for columna in columnas.values():
+                if len(columna) < n_filas:
+                    columna.append(np.nan)
+    if not columnas:
+        return pd.DataFrame()
+    if metricas is None:
+        return pd.DataFrame(columnas)
+    with metricas.fase("construccion"):
+        return pd.DataFrame(columnas)
+
+def crear_dataframe_de_coleccion(nombre_coleccion, limite=None, campos=None, agrupar_por=None,
+                                 claves_busqueda=None, batch_size=None, filtro=None, cancelado=None):
+    """
+    Crea un DataFrame de pandas desde una colección de MongoDB
 
-def crear_dataframe_de_coleccion(nombre_coleccion, limite=None):
-    """Crea un DataFrame de pandas desde una colección de MongoDB"""
+    El cursor se lee por lotes de batch_size documentos y se vuelca directamente en
+    columnas, de modo que el pico de memoria es cercano al tamaño del DataFrame final.
+
+    Args:
+        nombre_coleccion: Nombre de la colección
+        limite: Número máximo de documentos a extraer
+        campos: Lista de campos a descargar (proyección); None descarga todos
+        agrupar_por: Lista de claves para deduplicar en el servidor (ignora limite)
+        claves_busqueda: Diccionario {clave: valores} para extraer solo esos documentos
+        batch_size: Documentos por lote del cursor (por defecto TAMANO_LOTE_CURSOR)
+        filtro: Filtro de find() para extraer solo parte de la colección
+        cancelado: threading.Event que interrumpe la lectura del cursor (ver la versión async)
+
+    Los tiempos de cada fase se registran en las métricas de extracción (ver obtener_metricas).
+    """
+    modo = ("por_claves" if claves_busqueda else "unicos" if agrupar_por
+            else "filtrada" if filtro else "completa")
+    metricas = ExtractionMetrics(nombre_coleccion, modo)
     try:
-        datos = extraer_datos_coleccion(nombre_coleccion, limite)
-        if datos:
-            df = pd.DataFrame(datos)
+        _conectar(metricas)
+        if claves_busqueda:
+            clave, valores = next(iter(claves_busqueda.items()))
+            documentos = _documentos_por_claves(nombre_coleccion, clave, valores, campos, agrupar_por,
+                                                batch_size=batch_size)
+        elif agrupar_por:
+            documentos = _abrir_cursor_unicos(nombre_coleccion, agrupar_por, campos, batch_size=batch_size)
+        else:
+            documentos = _abrir_cursor(nombre_coleccion, limite, campos, filtro, batch_size)
+        df = documentos_a_dataframe(documentos, cancelado, metricas, batch_size)
+        if not df.empty:
             print(f"DataFrame creado para '{nombre_coleccion}': {df.shape[0]} filas, {df.shape[1]} columnas")
             return df
         else:
             print(f"No se pudieron obtener datos de la colección '{nombre_coleccion}'")
             return pd.DataFrame()
+    except ExtraccionCancelada:
+        metricas.error = "cancelada"
+        print(f"Extracción de '{nombre_coleccion}' cancelada")
+        return pd.DataFrame()
     except Exception as e:
+        metricas.error = str(e)
         print(f"Error al crear DataFrame para '{nombre_coleccion}': {e}")
         return pd.DataFrame()
+    finally:
+        registrar_metricas(metricas)
+
+def _ruta_snapshot(nombre_coleccion, campos=None, agrupar_por=None):
+    """Ruta base (sin extensión) del snapshot de una colección para una proyección dada"""
+    firma = json.dumps({"campos": sorted(campos) if campos else None, "agrupar_por": agrupar_por})
+    sufijo = hashlib.sha1(firma.encode("utf-8")).hexdigest()[:10]
+    base = re.sub(r"[^A-Za-z0-9_-]+", "_", nombre_coleccion)
+    return os.path.join(SNAPSHOT_DIR, f"{base}__{sufijo}")
+
+def guardar_snapshot(df, nombre_coleccion, campos=None, agrupar_por=None, extra=None):
+    """
+    Guarda un DataFrame de colección como snapshot local con sus metadatos
+
+    Args:
+        df: DataFrame de la colección
+        nombre_coleccion: Nombre de la colección
+        campos: Proyección con la que se extrajo
+        agrupar_por: Claves con las que se deduplicó en el servidor
+        extra: Metadatos adicionales a guardar
+
+    Returns:
+        dict: Metadatos del snapshot (fecha de extracción, documentos, esquema)
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    ruta = _ruta_snapshot(nombre_coleccion, campos, agrupar_por)
+    tabla = dataframe_to_arrow(df)
+    metadata = {
+        "coleccion": nombre_coleccion,
+        "campos": campos,
+        "agrupar_por": agrupar_por,
+        "fecha_extraccion": time.time(),
+        "documentos": int(df.shape[0]),
+        "esquema": {campo.name: str(campo.type) for campo in tabla.schema},
+    }
+    metadata.update(extra or {})
+    # Escritura atómica: otro proceso nunca ve un snapshot a medio escribir
+    sufijo_tmp = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    feather.write_feather(tabla, ruta + ".feather" + sufijo_tmp, compression="uncompressed")
+    with open(ruta + ".json" + sufijo_tmp, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, default=str)
+    os.replace(ruta + ".feather" + sufijo_tmp, ruta + ".feather")
+    os.replace(ruta + ".json" + sufijo_tmp, ruta + ".json")
+    return metadata
+
+def leer_snapshot(nombre_coleccion, campos=None, agrupar_por=None):
+    """
+    Lee el snapshot local de una colección (memory-map del fichero Feather)
+
+    Returns:
+        tuple: (DataFrame, metadatos), o (None, None) si no existe o no se puede leer
+    """
+    ruta = _ruta_snapshot(nombre_coleccion, campos, agrupar_por)
+    try:
+        with open(ruta + ".json", encoding="utf-8") as f:
+            metadata = json.load(f)
+        tabla = feather.read_table(ruta + ".feather", memory_map=True)
+        # Mismos tipos que al descargar la colección (ver dataframe_to_arrow)
+        df = arrow_to_dataframe(tabla)
+        # Identifica la versión del snapshot (permite reutilizar lo que se construya sobre él)
+        df.attrs["snapshot"] = metadata.get("fecha_extraccion")
+        return df, metadata
+    except (OSError, ValueError, pa.ArrowException):
+        return None, None
+
+def invalidar_snapshots(nombre_coleccion=None):
+    """Elimina los snapshots locales (de una colección o de todas)"""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return
+    prefijo = re.sub(r"[^A-Za-z0-9_-]+", "_", nombre_coleccion) + "__" if nombre_coleccion else ""
+    for fichero in os.listdir(SNAPSHOT_DIR):
+        if fichero.startswith(prefijo) and fichero.endswith((".feather", ".json")):
+            try:
+                os.remove(os.path.join(SNAPSHOT_DIR, fichero))
+            except OSError:
+                pass
+
+def _snapshot_vigente(metadata, ttl):
+    return time.time() - metadata.get("fecha_extraccion", 0) < ttl
+
+_refrescos_en_curso = set()
+_refrescos_lock = threading.Lock()
+_colecciones_sincronizables = {}
+
+def _campos_sincronizacion(campos):
+    """Proyección de un snapshot incremental: los campos pedidos más _id y las fechas de cambio"""
+    if campos is None:
+        return None
+    extra = [campo for campo in ["_id"] + CAMPOS_ACTUALIZACION if campo not in campos]
+    return list(campos) + extra
+
+def _leer_metadata_snapshot(nombre_coleccion, campos=None, agrupar_por=None):
+    """Metadatos del snapshot de una colección, o None si no hay snapshot"""
+    try:
+        with open(_ruta_snapshot(nombre_coleccion, campos, agrupar_por) + ".json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _tiene_campos_de_actualizacion(nombre_coleccion):
+    """
+    Comprueba en MongoDB si la colección tiene algún campo de CAMPOS_ACTUALIZACION
+
+    El resultado se memoriza por proceso; devuelve None si no se pudo consultar.
+    """
+    if nombre_coleccion not in _colecciones_sincronizables:
+        try:
+            db = obtener_cliente()[MONGO_CONFIG["db"]]
+            filtro = {"$or": [{campo: {"$exists": True}} for campo in CAMPOS_ACTUALIZACION]}
+            _colecciones_sincronizables[nombre_coleccion] = (
+                db[nombre_coleccion].find_one(filtro, {"_id": 1}) is not None
+            )
+        except Exception as e:
+            print(f"No se pudo comprobar la sincronización incremental de '{nombre_coleccion}': {e}")
+            return None
+    return _colecciones_sincronizables[nombre_coleccion]
+
+def _usa_sincronizacion_incremental(nombre_coleccion, campos=None, agrupar_por=None):
+    """
+    Indica si la colección se sincroniza por cambios (tiene campos de fecha de actualización)
+
+    En un arranque en caliente la respuesta sale de los metadatos del snapshot en disco
+    ("incremental" en el snapshot completo o "sincronizable" en cualquiera de los dos), sin
+    consultar MongoDB; solo sin snapshot se comprueba con _tiene_campos_de_actualizacion.
+    """
+    if not SYNC_INCREMENTAL:
+        return False
+    for metadata in (_leer_metadata_snapshot(nombre_coleccion, campos),
+                     _leer_metadata_snapshot(nombre_coleccion, campos, agrupar_por) if agrupar_por else None):
+        if metadata is None:
+            continue
+        if metadata.get("incremental"):
+            return True
+        if "sincronizable" in metadata:
+            return bool(metadata["sincronizable"])
+    return bool(_tiene_campos_de_actualizacion(nombre_coleccion))
+
+# Fecha ISO 8601 (con hora y zona opcionales) tras sustituir cada dígito por 0
+FORMATO_FECHA_ISO = re.compile(r"^0000-00-00(?:[T ]00:00(?::00(?:\.0+)?)?)?(?:Z|[+-]00:?00)?$")
+
+def _fechas_iso_ordenables(serie):
+    """
+    Indica si un campo de texto guarda fechas ISO 8601 que se ordenan como texto igual que
+    como fecha: todas con el mismo formato y la misma zona horaria
+
+    MongoDB compara el texto con $gte carácter a carácter; '2024-1-5' o formatos y zonas
+    mezclados darían una marca de agua que se salta documentos modificados.
+    """
+    formatos = serie.str.replace(r"\d", "0", regex=True).unique()
+    if len(formatos) != 1 or not FORMATO_FECHA_ISO.match(formatos[0]):
+        return False
+    return serie.str.extract(r"(Z|[+-]\d{2}:?\d{2})$", expand=False).nunique(dropna=False) == 1
+
+def _calcular_marcas_agua(df):
+    """
+    Calcula la marca de agua (valor máximo) de cada campo de fecha de actualización
+
+    Solo se usan columnas de fecha, numéricas o de fechas ISO 8601 en texto con un único
+    formato (ver _fechas_iso_ordenables), que MongoDB puede comparar con $gte sin mezclar
+    tipos BSON. Un campo de texto con otro formato no se usa como marca de agua.
+    """
+    marcas = {}
+    for campo in CAMPOS_ACTUALIZACION:
+        if campo not in df.columns:
+            continue
+        serie = df[campo].dropna()
+        if serie.empty:
+            continue
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            marcas[campo] = {"tipo": "fecha", "valor": serie.max().isoformat()}
+        elif pd.api.types.is_numeric_dtype(serie):
+            marcas[campo] = {"tipo": "numero", "valor": serie.max().item()}
+        elif serie.map(type).eq(str).all():
+            if _fechas_iso_ordenables(serie):
+                marcas[campo] = {"tipo": "texto", "valor": serie.max()}
+            else:
+                logger.warning("El campo '%s' no tiene fechas ISO 8601 homogéneas: no se usa como marca de agua",
+                               campo)
+    return marcas
+
+def _filtro_cambios(marcas):
+    """Filtro de los documentos creados o modificados desde las marcas de agua"""
+    condiciones = []
+    for campo, marca in marcas.items():
+        valor = marca["valor"]
+        if marca["tipo"] == "fecha":
+            valor = pd.Timestamp(valor).to_pydatetime()
+        condiciones.append({campo: {"$gte": valor}})
+    return {"$or": condiciones}
+
+def aplicar_cambios(df, cambios):
+    """
+    Aplica documentos modificados sobre un DataFrame de colección (upsert por _id)
+
+    Los documentos existentes se sustituyen en su posición (MongoDB no cambia el orden natural
+    al actualizar) y los nuevos se añaden al final, de modo que el criterio "primero gana" de la
+    deduplicación por estilo se mantiene.
+
+    Args:
+        df: DataFrame de la colección con la columna _id
+        cambios: DataFrame con los documentos creados o modificados
+
+    Returns:
+        pd.DataFrame: DataFrame actualizado
+    """
+    if cambios.empty:
+        return df
+    base = df.assign(_id=df["_id"].astype(str)).set_index("_id")
+    nuevos = cambios.assign(_id=cambios["_id"].astype(str)).set_index("_id")
+    nuevos = nuevos[~nuevos.index.duplicated(keep="last")]
+    columnas = base.columns.union(nuevos.columns, sort=False)
+    base = base.reindex(columns=columnas)
+    nuevos = nuevos.reindex(columns=columnas)
+
+    existentes = nuevos.index.isin(base.index)
+    if existentes.any():
+        # Se sustituye el documento completo: un campo eliminado en MongoDB queda como NaN
+        base.loc[nuevos.index[existentes]] = nuevos[existentes]
+    resultado = pd.concat([base, nuevos[~existentes]])
+    return resultado.reset_index()
+
+def _sincronizar_cambios(nombre_coleccion, campos, df_previo, metadata):
+    """Descarga solo los documentos modificados desde la marca de agua y los aplica al snapshot"""
+    cambios = crear_dataframe_de_coleccion(nombre_coleccion, campos=_campos_sincronizacion(campos),
+                                           filtro=_filtro_cambios(metadata["marcas_agua"]))
+    print(f"Sincronización incremental de '{nombre_coleccion}': {cambios.shape[0]} documentos modificados")
+    return aplicar_cambios(df_previo, cambios)
+
+def _sin_campos_de_sincronizacion(df, campos):
+    """Quita las columnas que solo se guardan para la sincronización incremental"""
+    if campos is None:
+        return df
+    sobrantes = [columna for columna in ["_id"] + CAMPOS_ACTUALIZACION
+                 if columna in df.columns and columna not in campos]
+    return df.drop(columns=sobrantes)
+
+def _refrescar_snapshot(nombre_coleccion, campos=None, agrupar_por=None):
+    """
+    Actualiza el snapshot de una colección desde MongoDB
+
+    Las colecciones incrementales (sin agrupar_por) descargan solo los cambios desde la marca
+    de agua del snapshot anterior, salvo que toque la reconciliación completa periódica, que
+    es la que elimina del snapshot los documentos borrados en MongoDB.
+    """
+    incremental = SYNC_INCREMENTAL and not agrupar_por
+    df_previo, metadata = leer_snapshot(nombre_coleccion, campos, agrupar_por) if incremental else (None, None)
+    ahora = time.time()
+
+    if (df_previo is not None and metadata.get("marcas_agua")
+            and ahora - metadata.get("ultima_reconciliacion", 0) < RECONCILIACION_SEGUNDOS):
+        df = _sincronizar_cambios(nombre_coleccion, campos, df_previo, metadata)
+        ultima_reconciliacion = metadata["ultima_reconciliacion"]
+    elif incremental:
+        df = crear_dataframe_de_coleccion(nombre_coleccion, campos=_campos_sincronizacion(campos))
+        ultima_reconciliacion = ahora
+    else:
+        df = crear_dataframe_de_coleccion(nombre_coleccion, campos=campos, agrupar_por=agrupar_por)
+
+    if not df.empty:
+        # "sincronizable" guarda la comprobación de campos de actualización para que los
+        # arranques en caliente no consulten MongoDB (ver _usa_sincronizacion_incremental)
+        extra = None
+        if incremental:
+            if "_id" in df.columns:
+                df["_id"] = df["_id"].astype(str)
+            marcas = _calcular_marcas_agua(df)
+            # Sin marca de agua no se puede sincronizar por cambios: el snapshot no es incremental
+            extra = {"incremental": bool(marcas), "sincronizable": bool(marcas), "marcas_agua": marcas,
+                     "ultima_reconciliacion": ultima_reconciliacion}
+            _colecciones_sincronizables[nombre_coleccion] = bool(marcas)
+        elif _colecciones_sincronizables.get(nombre_coleccion) is not None:
+            extra = {"sincronizable": _colecciones_sincronizables[nombre_coleccion]}
+        try:
+            metadata = guardar_snapshot(df, nombre_coleccion, campos, agrupar_por, extra)
+            df.attrs["snapshot"] = metadata["fecha_extraccion"]
+        except Exception as e:
+            # Si no se puede escribir el snapshot, se sigue con los datos de MongoDB
+            print(f"Error al guardar el snapshot de '{nombre_coleccion}': {e}")
+    return _sin_campos_de_sincronizacion(df, campos)
+
+def _refrescar_snapshot_en_segundo_plano(nombre_coleccion, campos=None, agrupar_por=None):
+    """Lanza un refresco del snapshot en un hilo, salvo que ya haya uno en curso"""
+    clave = _ruta_snapshot(nombre_coleccion, campos, agrupar_por)
+    with _refrescos_lock:
+        if clave in _refrescos_en_curso:
+            return
+        _refrescos_en_curso.add(clave)
+
+    def refrescar():
+        try:
+            _refrescar_snapshot(nombre_coleccion, campos, agrupar_por)
+        except Exception as e:
+            print(f"Error al refrescar el snapshot de '{nombre_coleccion}': {e}")
+        finally:
+            with _refrescos_lock:
+                _refrescos_en_curso.discard(clave)
+
+    threading.Thread(target=refrescar, name=f"snapshot-{nombre_coleccion}", daemon=True).start()
+
+def cargar_coleccion_con_snapshot(nombre_coleccion, campos=None, agrupar_por=None,
+                                  claves_busqueda=None, ttl=None):
+    """
+    Carga una colección usando el snapshot local cuando es posible
+
+    - Snapshot más reciente que el TTL: se lee del disco sin consultar MongoDB.
+    - Snapshot caducado: se devuelve igualmente y se refresca en segundo plano (solo los
+      documentos modificados si la colección tiene fechas de actualización).
+    - Sin snapshot: se descarga de MongoDB y se guarda para los siguientes procesos.
+
+    Tiene la misma firma que crear_dataframe_de_coleccion para usarse como cargador
+    del ReferenceProvider. Una búsqueda dirigida (claves_busqueda) solo consulta MongoDB en
+    un arranque en frío, sin snapshot: se descargan los documentos de esas claves y el
+    snapshot completo se descarga en segundo plano. Si ya hay snapshot, se devuelve la
+    colección completa del snapshot (con attrs["snapshot"]), que el proveedor cachea.
+
+    Las colecciones que se sincronizan por cambios no se deduplican en el servidor: el snapshot
+    necesita cada documento (por _id) para aplicar los cambios. La primera descarga trae todos
+    los documentos y las siguientes solo los modificados; el resultado se deduplica por
+    agrupar_por en local, de modo que se devuelve un documento por clave igual que sin snapshot.
+
+    Args:
+        nombre_coleccion: Nombre de la colección
+        campos: Lista de campos a descargar (proyección); None descarga todos
+        agrupar_por: Lista de claves para deduplicar en el servidor
+        claves_busqueda: Diccionario {clave: valores} para extraer solo esos documentos
+        ttl: Antigüedad máxima del snapshot en segundos (por defecto SNAPSHOT_TTL_SEGUNDOS)
+    """
+    agrupar_busqueda = agrupar_por
+    # Las colecciones con fechas de actualización se guardan documento a documento para poder
+    # sincronizarlas por cambios; la deduplicación se hace entonces sobre el snapshot
+    deduplicar_por = None
+    if agrupar_por and _usa_sincronizacion_incremental(nombre_coleccion, campos, agrupar_por):
+        logger.info("'%s' se sincroniza por cambios: el snapshot guarda todos los documentos y se "
+                    "deduplica por %s en local", nombre_coleccion, agrupar_por)
+        deduplicar_por, agrupar_por = agrupar_por, None
+
+    ttl = SNAPSHOT_TTL_SEGUNDOS if ttl is None else ttl
+    df, metadata = leer_snapshot(nombre_coleccion, campos, agrupar_por)
+    if df is None and claves_busqueda:
+        _refrescar_snapshot_en_segundo_plano(nombre_coleccion, campos, agrupar_por)
+        return crear_dataframe_de_coleccion(nombre_coleccion, campos=campos, agrupar_por=agrupar_busqueda,
+                                            claves_busqueda=claves_busqueda)
+    if df is not None:
+        if _snapshot_vigente(metadata, ttl):
+            print(f"Snapshot de '{nombre_coleccion}' cargado desde disco: {df.shape[0]} filas")
+        else:
+            print(f"Snapshot de '{nombre_coleccion}' caducado: se usa y se refresca en segundo plano")
+            _refrescar_snapshot_en_segundo_plano(nombre_coleccion, campos, agrupar_por)
+        df = _sin_campos_de_sincronizacion(df, campos)
+    else:
+        df = _refrescar_snapshot(nombre_coleccion, campos, agrupar_por)
+    return _deduplicar(df, deduplicar_por)
+
+def _deduplicar(df, claves):
+    """
+    Un documento por clave, conservando el primero del snapshot (como el $group del servidor)
+
+    aplicar_cambios mantiene el orden del snapshot (los documentos nuevos van al final), así
+    que se conserva el documento más antiguo de cada clave.
+    """
+    claves = [clave for clave in (claves or []) if clave in df.columns]
+    if not claves:
+        return df
+    return df.drop_duplicates(claves, ignore_index=True)
+
+async def crear_dataframe_de_coleccion_async(nombre_coleccion, limite=None, campos=None, agrupar_por=None,
+                                             claves_busqueda=None, batch_size=None, filtro=None):
+    """
+    Versión asyncio de crear_dataframe_de_coleccion
+
+    La extracción corre en un hilo sobre el cliente compartido, de modo que el event loop queda
+    libre para otras tareas (p. ej. leer el archivo subido). Si la tarea se cancela, el cursor se
+    cierra en el siguiente lote y la excepción CancelledError se propaga al llamador.
+
+    Args:
+        Los mismos que crear_dataframe_de_coleccion
+
+    Returns:
+        pd.DataFrame: DataFrame de la colección (vacío si hubo un error)
+    """
+    cancelado = threading.Event()
+    try:
+        return await asyncio.to_thread(
+            crear_dataframe_de_coleccion, nombre_coleccion, limite, campos, agrupar_por,
+            claves_busqueda, batch_size, filtro, cancelado
+        )
+    except asyncio.CancelledError:
+        cancelado.set()
+        raise
+
+async def crear_dataframes_de_todas_las_colecciones_async(limite=None, max_workers=None):
+    """
+    Versión asyncio de crear_dataframes_de_todas_las_colecciones
 
-def crear_dataframes_de_todas_las_colecciones(limite=None):
-    """Crea DataFrames de todas las colecciones en la base de datos"""
+    Las colecciones se extraen concurrentemente, con como máximo max_workers a la vez. Un error
+    en una colección solo deja fuera esa colección; cancelar la tarea cancela todas las extracciones.
+
+    Args:
+        limite: Número máximo de documentos por colección
+        max_workers: Número máximo de colecciones simultáneas (por defecto MAX_WORKERS_EXTRACCION)
+
+    Returns:
+        dict: DataFrames por nombre de colección, en el orden en que las devuelve MongoDB
+    """
+    colecciones = await asyncio.to_thread(extraer_todas_las_colecciones)
+    if not colecciones:
+        return _resumir_extraccion(colecciones, {})
+
+    # Nunca usar más extracciones simultáneas que conexiones disponibles en el pool
+    workers = max_workers or MAX_WORKERS_EXTRACCION
+    workers = max(1, min(workers, len(colecciones), MONGO_POOL_CONFIG["maxPoolSize"]))
+    print(f"\nExtrayendo {len(colecciones)} colecciones en paralelo ({workers} workers)")
+    semaforo = asyncio.Semaphore(workers)
+
+    async def extraer(coleccion):
+        async with semaforo:
+            return await crear_dataframe_de_coleccion_async(coleccion, limite)
+
+    resultados = await asyncio.gather(*(extraer(c) for c in colecciones), return_exceptions=True)
+    dataframes = {}
+    for coleccion, resultado in zip(colecciones, resultados):
+        if isinstance(resultado, BaseException):
+            # Un fallo en una colección no afecta a las demás
+            print(f"Error al procesar la colección '{coleccion}': {resultado}")
+            resultado = pd.DataFrame()
+        dataframes[coleccion] = resultado
+    return _resumir_extraccion(colecciones, dataframes)
+
+def _resumir_extraccion(colecciones, resultados):
+    """Descarta las colecciones vacías e imprime el resumen de la extracción"""
     dataframes = {}
+    for coleccion in colecciones:
+        df = resultados.get(coleccion, pd.DataFrame())
+        
+        if not df.empty:
+            dataframes[coleccion] = df
+            print(f"✓ DataFrame '{coleccion}' creado exitosamente")
+        else:
+            print(f"✗ No se pudo crear DataFrame para '{coleccion}'")
+    
+    print(f"\n=== RESUMEN ===")
+    print(f"Total de colecciones procesadas: {len(colecciones)}")
+    print(f"DataFrames creados exitosamente: {len(dataframes)}")
     
+    for nombre, df in dataframes.items():
+        print(f"- {nombre}: {df.shape[0]} filas, {df.shape[1]} columnas")
+        
+    return dataframes
+
+def _ejecutar_async(corrutina):
+    """Ejecuta una corrutina desde código síncrono, aunque ya haya un event loop en este hilo"""
     try:
-        colecciones = extraer_todas_las_colecciones()
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(corrutina)
+    # Dentro de un event loop (p. ej. un notebook) se ejecuta en un hilo con su propio loop
+    resultado = {}
+    def ejecutar():
+        resultado["valor"] = asyncio.run(corrutina)
+    hilo = threading.Thread(target=ejecutar)
+    hilo.start()
+    hilo.join()
+    return resultado["valor"]
+
+def crear_dataframes_de_todas_las_colecciones(limite=None, paralelo=True, max_workers=None):
+    """
+    Crea DataFrames de todas las colecciones en la base de datos
+
+    Args:
+        limite: Número máximo de documentos por colección
+        paralelo: Si es True, las colecciones se extraen concurrentemente sobre el cliente compartido
+        max_workers: Número máximo de colecciones simultáneas (por defecto MAX_WORKERS_EXTRACCION)
+
+    Returns:
+        dict: DataFrames por nombre de colección, en el orden en que las devuelve MongoDB
+    """
+    try:
+        if paralelo:
+            return _ejecutar_async(crear_dataframes_de_todas_las_colecciones_async(limite, max_workers))
         
+        colecciones = extraer_todas_las_colecciones()
+        resultados = {}
         for coleccion in colecciones:
             print(f"\nProcesando colección: {coleccion}")
-            df = crear_dataframe_de_coleccion(coleccion, limite)
-            
-            if not df.empty:
-                dataframes[coleccion] = df
-                print(f"✓ DataFrame '{coleccion}' creado exitosamente")
-            else:
-                print(f"✗ No se pudo crear DataFrame para '{coleccion}'")
-        
-        print(f"\n=== RESUMEN ===")
-        print(f"Total de colecciones procesadas: {len(colecciones)}")
-        print(f"DataFrames creados exitosamente: {len(dataframes)}")
-        
-        for nombre, df in dataframes.items():
-            print(f"- {nombre}: {df.shape[0]} filas, {df.shape[1]} columnas")
-            
-        return dataframes
+            resultados[coleccion] = crear_dataframe_de_coleccion(coleccion, limite)
+        return _resumir_extraccion(colecciones, resultados)
         
     except Exception as e:
         print(f"Error al crear DataFrames de todas las colecciones: {e}")
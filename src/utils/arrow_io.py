@@ -0,0 +1,90 @@
+import bson
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from bson.errors import InvalidDocument
+
+# Metadato de campo que marca las columnas guardadas valor a valor en BSON
+CODIFICACION = b"codificacion"
+CODIFICACION_BSON = b"bson"
+
+def _codificar(valor) -> bytes:
+    """Valor de una columna de objetos como documento BSON ({"v": valor})"""
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    try:
+        return bson.encode({"v": valor})
+    except (InvalidDocument, OverflowError):
+        # Tipos que BSON no admite (no vienen de MongoDB): se guardan como texto
+        return bson.encode({"v": str(valor)})
+
+def _decodificar(dato: bytes):
+    return bson.decode(dato)["v"]
+
+def es_nativa(serie: pd.Series) -> bool:
+    """
+    Indica si Arrow representa la columna sin cambiar sus valores
+
+    Las columnas de objetos solo son nativas si son texto (o booleanas) con nulos. Tipos
+    mezclados (un estilo guardado unas veces como número y otras como texto), ObjectId o
+    números en una columna de objetos cambiarían de tipo al volver a pandas.
+    """
+    if serie.dtype != object:
+        return True
+    try:
+        tipo = pa.array(serie, from_pandas=True).type
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return False
+    return pa.types.is_string(tipo) or pa.types.is_boolean(tipo) or pa.types.is_null(tipo)
+
+def dataframe_to_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Convierte un DataFrame de MongoDB a una tabla Arrow
+
+    Las columnas que Arrow no puede representar tal cual (ver es_nativa) se guardan valor a
+    valor en BSON, el formato en que llegaron de MongoDB, y se marcan en los metadatos del
+    campo: arrow_to_dataframe las devuelve con los mismos tipos (7 sigue siendo 7 y '7.5'
+    sigue siendo '7.5'), así que leer un snapshot da lo mismo que descargar la colección.
+    """
+    codificadas = [columna for columna in df.columns if not es_nativa(df[columna])]
+    if codificadas:
+        df = df.assign(**{columna: [_codificar(valor) for valor in df[columna]] for columna in codificadas})
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    esquema = tabla.schema
+    for columna in codificadas:
+        posicion = esquema.get_field_index(columna)
+        esquema = esquema.set(posicion, esquema.field(posicion).with_metadata({CODIFICACION: CODIFICACION_BSON}))
+    return pa.Table.from_arrays(tabla.columns, schema=esquema)
+
+def columnas_codificadas(tabla: pa.Table) -> list:
+    """Columnas de la tabla guardadas en BSON por dataframe_to_arrow"""
+    return [campo.name for campo in tabla.schema
+            if (campo.metadata or {}).get(CODIFICACION) == CODIFICACION_BSON]
+
+def decodificar_columna(columna: pa.ChunkedArray) -> np.ndarray:
+    """Valores originales de una columna guardada en BSON, como array de objetos"""
+    valores = np.empty(len(columna), dtype=object)
+    for posicion, dato in enumerate(columna.to_pylist()):
+        valores[posicion] = _decodificar(dato)
+    return valores
+
+def arrow_to_dataframe(tabla: pa.Table, types_mapper=None) -> pd.DataFrame:
+    """
+    Convierte una tabla escrita con dataframe_to_arrow de vuelta a pandas
+
+    Las columnas guardadas en BSON recuperan sus valores originales (columna de objetos) y el
+    texto usa NaN como nulo, igual que el DataFrame construido desde los documentos.
+
+    Args:
+        tabla: Tabla Arrow (p. ej. leída de un Feather con memory-map)
+        types_mapper: Se pasa a Table.to_pandas (pd.ArrowDtype deja las columnas en Arrow)
+    """
+    codificadas = columnas_codificadas(tabla)
+    df = tabla.drop_columns(codificadas).to_pandas(types_mapper=types_mapper)
+    if types_mapper is None:
+        for columna in df.columns:
+            if df[columna].dtype == object:
+                df[columna] = df[columna].where(df[columna].notna(), np.nan)
+    for columna in codificadas:
+        df[columna] = decodificar_columna(tabla.column(columna))
+    return df[tabla.column_names]
@@ -0,0 +1,419 @@
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from utils.item_tokenizer import ItemNameTokens
+from utils.reference_index import ReferenceIndex
+
+# Tabla equipo -> liga de New Era (se versiona junto al código, en data/)
+TEAM_LICENSES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data", "team_licenses.json"
+)
+
+@lru_cache(maxsize=None)
+def load_team_licenses(path: str = TEAM_LICENSES_PATH) -> Dict[str, str]:
+    """Carga la tabla equipo -> liga (se lee una sola vez por ruta)"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def por_valor_unico(valores: pd.Series, funcion: Callable[[pd.Series], Union[pd.Series, pd.DataFrame]]):
+    """
+    Evalúa una regla sobre los valores distintos de una columna y reparte el resultado a las filas
+
+    En los exports de SAP cada estilo (y su descripción, equipo...) se repite en muchos SKUs de
+    talla y color, así que la regla se calcula una vez por valor y no una vez por fila.
+
+    Args:
+        valores: Columna sobre la que se evalúa la regla
+        funcion: Regla vectorizada; recibe los valores distintos (nulo incluido)
+
+    Returns:
+        El resultado de la regla con una fila por cada fila de valores (mismo índice)
+    """
+    codigos, unicos = pd.factorize(valores, use_na_sentinel=False)
+    resultado = funcion(pd.Series(unicos, dtype=valores.dtype)).take(codigos)
+    resultado.index = valores.index
+    return resultado
+
+def completar_en_cascada(df: pd.DataFrame, indice: ReferenceIndex,
+                         niveles: List[Tuple[str, List[str]]]) -> pd.DataFrame:
+    """
+    Completa los valores nulos de las columnas con los de la referencia (las crea si no existen)
+
+    Args:
+        df: DataFrame a completar
+        indice: Referencia de la marca
+        niveles: (clave, columnas) en orden de prioridad; las claves son columnas de df
+
+    Returns:
+        pd.DataFrame: df con las columnas completadas
+    """
+    referencia = indice.buscar_cascada([(clave, df[clave], columnas) for clave, columnas in niveles])
+    # Una sola combinación para todas las columnas existentes; las que faltan se añaden
+    existentes = [col for col in referencia.columns if col in df.columns]
+    nuevas = [col for col in referencia.columns if col not in df.columns]
+    if existentes:
+        df[existentes] = df[existentes].fillna(referencia[existentes])
+    if nuevas:
+        df[nuevas] = referencia[nuevas]
+    return df
+
+class EjecucionPlan:
+    """Estado de una limpieza: tokens del ItemName, referencia, máscaras y mensajes"""
+
+    def __init__(self, plan: "BrandPlan", tokens: ItemNameTokens, indice: Optional[ReferenceIndex],
+                 notify: Callable[[str, str], None]):
+        self.plan = plan
+        self.tokens = tokens
+        self.indice = indice
+        self.notify = notify
+        self._mascaras: Dict[str, np.ndarray] = {}
+
+    def mascara(self, nombre: Optional[str]) -> Optional[np.ndarray]:
+        """Máscara booleana por nombre ('~nombre' la niega); None si el paso aplica a todas las filas"""
+        if nombre is None:
+            return None
+        negada = nombre.startswith("~")
+        nombre = nombre.lstrip("~")
+        if nombre not in self._mascaras:
+            condiciones = [getattr(self.tokens, token) for token in self.plan.mascaras[nombre]]
+            self._mascaras[nombre] = np.logical_and.reduce([c.to_numpy(dtype=bool) for c in condiciones])
+        return ~self._mascaras[nombre] if negada else self._mascaras[nombre]
+
+# Texto respaldado por Arrow (pyarrow ya es dependencia de los snapshots)
+TEXTO_ARROW = pd.StringDtype("pyarrow")
+
+def _asignar(df: pd.DataFrame, columna: str, valores: pd.Series, mascara: Optional[np.ndarray]):
+    """Asigna una columna completa o, con máscara, solo las filas seleccionadas (valores de esas filas)"""
+    if mascara is None:
+        df[columna] = valores
+        return
+    actual = df[columna] if columna in df.columns else pd.Series(np.nan, index=df.index)
+    resultado = actual.to_numpy(dtype=object, copy=True)
+    resultado[mascara] = valores.to_numpy(dtype=object)
+    df[columna] = pd.Series(resultado, index=df.index)
+
+def _seleccion(valores: pd.Series, mascara: Optional[np.ndarray]) -> pd.Series:
+    return valores if mascara is None else valores[mascara]
+
+# Compiladores de pasos: cada uno recibe la definición del paso (un dict del pipeline de la
+# marca) y devuelve la función que lo ejecuta sobre (df, ejecucion). Todo lo que no depende
+# de los datos (regex, tablas de prefijos, columnas) se resuelve aquí, una sola vez.
+
+def _compilar_tokens(paso: dict):
+    """{"op": "tokens", "columns": {columna: token}, "where": máscara, "if_missing": bool}"""
+    asignaciones = dict(paso["columns"])
+    si_falta = paso.get("if_missing", False)
+    donde = paso.get("where")
+
+    def ejecutar(df, ejecucion):
+        mascara = ejecucion.mascara(donde)
+        for columna, token in asignaciones.items():
+            if si_falta and columna in df.columns:
+                continue
+            _asignar(df, columna, _seleccion(getattr(ejecucion.tokens, token), mascara), mascara)
+        return df
+    return ejecutar
+
+def _compilar_init(paso: dict):
+    """{"op": "init", "columns": [...]}: crea como nulas las columnas que no trae el archivo"""
+    columnas = list(paso["columns"])
+
+    def ejecutar(df, ejecucion):
+        for columna in columnas:
+            if columna not in df.columns:
+                df[columna] = np.nan
+        return df
+    return ejecutar
+
+def _compilar_prefix(paso: dict):
+    """{"op": "prefix", "source", "column", "rules": [[prefijo(s), valor], ...], "default"}"""
+    origen, destino = paso["source"], paso["column"]
+    prefijos = [prefijo if isinstance(prefijo, str) else tuple(prefijo) for prefijo, _ in paso["rules"]]
+    valores = [valor for _, valor in paso["rules"]]
+    defecto = paso.get("default", "")
+    por_unico = paso.get("unique", True)
+
+    def regla(serie: pd.Series) -> pd.Series:
+        # Un valor nulo no empieza por ningún prefijo: toma el valor por defecto
+        condiciones = [serie.str.startswith(prefijo, na=False) for prefijo in prefijos]
+        return pd.Series(np.select(condiciones, valores, default=defecto), index=serie.index)
+
+    def ejecutar(df, ejecucion):
+        df[destino] = por_valor_unico(df[origen], regla) if por_unico else regla(df[origen])
+        return df
+    return ejecutar
+
+def _compilar_map(paso: dict):
+    """{"op": "map", "source", "column", "values": {valor: resultado}, "default"}"""
+    origen, destino = paso["source"], paso["column"]
+    tabla = dict(paso["values"])
+    defecto = paso.get("default", "")
+
+    def ejecutar(df, ejecucion):
+        df[destino] = por_valor_unico(df[origen], lambda serie: serie.map(tabla).fillna(defecto))
+        return df
+    return ejecutar
+
+def _compilar_copy(paso: dict):
+    """{"op": "copy", "source", "column"}"""
+    origen, destino = paso["source"], paso["column"]
+
+    def ejecutar(df, ejecucion):
+        df[destino] = df[origen]
+        return df
+    return ejecutar
+
+def _compilar_text(paso: dict):
+    """{"op": "text", "column", "fillna"}: convierte la columna a texto"""
+    columna = paso["column"]
+    relleno = paso.get("fillna")
+
+    def ejecutar(df, ejecucion):
+        valores = df[columna] if relleno is None else df[columna].fillna(relleno)
+        df[columna] = valores.astype(str)
+        return df
+    return ejecutar
+
+def _compilar_split(paso: dict):
+    """{"op": "split", "source", "column", "sep", "index"}: parte del texto según un separador"""
+    origen, destino = paso["source"], paso["column"]
+    separador, posicion = paso["sep"], paso["index"]
+
+    def ejecutar(df, ejecucion):
+        df[destino] = por_valor_unico(df[origen], lambda serie: serie.str.split(separador).str[posicion])
+        return df
+    return ejecutar
+
+def _compilar_null(paso: dict):
+    """{"op": "null", "column", "where"}: vacía la columna en las filas de la máscara"""
+    columna, donde = paso["column"], paso["where"]
+
+    def ejecutar(df, ejecucion):
+        df[columna] = df[columna].where(~ejecucion.mascara(donde))
+        return df
+    return ejecutar
+
+def _compilar_replace(paso: dict):
+    """{"op": "replace", "column", "pattern", "repl", "strip", "where"}: sustitución por regex"""
+    columna = paso["column"]
+    patron = re.compile(paso["pattern"])
+    reemplazo = paso.get("repl", "")
+    quitar_espacios = paso.get("strip", False)
+    donde = paso.get("where")
+
+    def regla(serie: pd.Series) -> pd.Series:
+        serie = serie.str.replace(patron, reemplazo, regex=True)
+        return serie.str.strip() if quitar_espacios else serie
+
+    def ejecutar(df, ejecucion):
+        mascara = ejecucion.mascara(donde)
+        _asignar(df, columna, por_valor_unico(_seleccion(df[columna], mascara), regla), mascara)
+        return df
+    return ejecutar
+
+def _compilar_cascade(paso: dict):
+    """
+    {"op": "cascade", "levels": [{"key", "columns", "only_new", "optional"}, ...],
+     "key_as_text", "strip_key", "replace"}
+
+    Completa columnas desde la referencia cruzando por varias claves en orden (p. ej.
+    U_Estilo_Color y después U_Estilo). Cada nivel aporta sus columnas; si una columna la
+    aportan varios niveles, manda el primero que cruza. Todos los niveles se resuelven contra
+    el índice de la referencia y se combinan en un único resultado, que se vuelca al
+    DataFrame de una vez.
+
+    Con replace, las columnas del archivo se descartan y se toman las de la referencia; con
+    only_new, el nivel solo trae las columnas que el archivo no tiene. Con optional, si la
+    referencia no tiene la clave del nivel, este se omite sin avisar.
+    """
+    niveles = [{
+        "clave": nivel["key"],
+        "columnas": list(nivel["columns"]),
+        "solo_nuevas": nivel.get("only_new", paso.get("only_new", False)),
+        "opcional": nivel.get("optional", paso.get("optional", False)),
+        "como_texto": nivel.get("key_as_text", paso.get("key_as_text", False)),
+        "quitar_espacios": nivel.get("strip_key", paso.get("strip_key", False)),
+    } for nivel in paso["levels"]]
+    reemplazar = paso.get("replace", False)
+    descartar = [col for nivel in niveles for col in nivel["columnas"]]
+
+    def ejecutar(df, ejecucion):
+        indice = ejecucion.indice
+        if indice is None or indice.empty:
+            return df
+        faltantes = [nivel for nivel in niveles if not indice.tiene_clave(nivel["clave"])]
+        for nivel in faltantes:
+            if not nivel["opcional"]:
+                ejecucion.notify("error", f"La colección de MongoDB no tiene el campo clave '{nivel['clave']}'")
+                return df
+        if reemplazar:
+            df = df.drop(columns=descartar, errors='ignore')
+
+        cruces = []
+        for nivel in niveles:
+            if nivel in faltantes:
+                continue
+            disponibles = [col for col in nivel["columnas"] if col in indice.columnas]
+            if nivel["solo_nuevas"]:
+                disponibles = [col for col in disponibles if col not in df.columns]
+            if not disponibles:
+                continue
+            clave = nivel["clave"]
+            if nivel["como_texto"]:
+                # Asegurar tipos compatibles (String vs String)
+                df[clave] = df[clave].astype(str)
+                if nivel["quitar_espacios"]:
+                    df[clave] = df[clave].str.strip()
+            cruces.append((clave, disponibles))
+        if not cruces:
+            return df
+        return completar_en_cascada(df, indice, cruces)
+    return ejecutar
+
+def _compilar_lookup(paso: dict):
+    """
+    {"op": "lookup", "key", "columns", "key_as_text", "strip_key", "replace", "only_new", "optional"}
+
+    Cruce por una sola clave (una cascada de un nivel)
+    """
+    return _compilar_cascade({**paso, "levels": [paso]})
+
+def _compilar_licenses(paso: dict):
+    """{"op": "licenses", "source", "column", "path"}: completa la liga según el equipo"""
+    origen, destino = paso["source"], paso["column"]
+    ruta = paso.get("path", TEAM_LICENSES_PATH)
+
+    def ejecutar(df, ejecucion):
+        tabla = load_team_licenses(ruta)
+        # Solo en los registros sin liga
+        en_blanco = df[destino].isna() | (df[destino] == '')
+        ligas = por_valor_unico(df[origen], lambda equipos: equipos.map(tabla))
+        df[destino] = df[destino].mask(en_blanco & ligas.notna(), ligas)
+        return df
+    return ejecutar
+
+def _compilar_order(paso: dict):
+    """{"op": "order", "columns", "reindex"}: ordena las columnas (reindex crea las que faltan)"""
+    columnas = list(paso["columns"])
+    crear = paso.get("reindex", False)
+
+    def ejecutar(df, ejecucion):
+        if crear:
+            return df.reindex(columns=columnas)
+        return df[[col for col in columnas if col in df.columns]]
+    return ejecutar
+
+COMPILADORES = {
+    "tokens": _compilar_tokens,
+    "init": _compilar_init,
+    "prefix": _compilar_prefix,
+    "map": _compilar_map,
+    "copy": _compilar_copy,
+    "text": _compilar_text,
+    "split": _compilar_split,
+    "null": _compilar_null,
+    "replace": _compilar_replace,
+    "lookup": _compilar_lookup,
+    "cascade": _compilar_cascade,
+    "licenses": _compilar_licenses,
+    "order": _compilar_order,
+}
+
+class BrandPlan:
+    """Plan de limpieza de una marca, compilado a partir de su definición en brand_configs.
+
+    La definición es declarativa:
+        pipeline: lista de pasos ({"op": ..., ...}, ver COMPILADORES)
+        masks: máscaras con nombre, como conjunción de tokens booleanos del ItemName
+        on_missing_reference: "return" (aviso y se devuelve el archivo sin limpiar),
+            "warn" (aviso y se sigue sin referencia) o "continue" (se sigue sin aviso)
+        summary: {"columns", "message"} mensaje final con las filas completadas
+        schema: {"category": [...], "string": [...]} tipos compactos de la salida: categóricas
+            para las columnas con pocos valores distintos y texto de Arrow para el resto
+
+    Se compila una sola vez por marca; ejecutar() solo recorre las funciones ya preparadas.
+    """
+
+    # Compilador de cada tipo de paso (otros motores de ejecución usan los suyos)
+    compiladores = COMPILADORES
+
+    def __init__(self, config: dict):
+        """
+        Args:
+            config: Definición de la marca (una entrada de brand_configs)
+        """
+        self.nombre = config.get("name", "")
+        self.mascaras: Dict[str, List[str]] = {nombre: list(tokens)
+                                               for nombre, tokens in config.get("masks", {}).items()}
+        self.sin_referencia = config.get("on_missing_reference", "continue")
+        self.usa_referencia = "reference_columns" in config
+        self.resumen = config.get("summary")
+        esquema = config.get("schema", {})
+        self.esquema = {columna: "category" for columna in esquema.get("category", [])}
+        self.esquema.update({columna: TEXTO_ARROW for columna in esquema.get("string", [])})
+        self.pasos = []
+        for paso in config.get("pipeline", []):
+            if paso["op"] not in self.compiladores:
+                raise ValueError(f"Paso de limpieza desconocido en {self.nombre}: {paso['op']}")
+            self.pasos.append(self.compiladores[paso["op"]](paso))
+
+    def tokens(self, item_names: pd.Series) -> ItemNameTokens:
+        """Tokens del ItemName con los que trabajan los pasos de este motor"""
+        return ItemNameTokens(item_names)
+
+    def ejecutar(self, df: pd.DataFrame, tokens: ItemNameTokens, indice: Optional[ReferenceIndex],
+                 notify: Callable[[str, str], None]) -> pd.DataFrame:
+        """
+        Aplica el plan al DataFrame
+
+        Args:
+            df: DataFrame a limpiar (vista propia, se modifica)
+            tokens: Tokens del ItemName de df (ver tokens())
+            indice: Referencia de la marca (None si la marca no usa referencia)
+            notify: Función para los mensajes (nivel, texto)
+
+        Returns:
+            pd.DataFrame: DataFrame limpio
+        """
+        if self.usa_referencia and (indice is None or indice.empty) and self.sin_referencia != "continue":
+            notify("warning", f"No se encontró el DataFrame de referencia para {self.nombre}")
+            if self.sin_referencia == "return":
+                return df
+
+        df = self._aplicar_pasos(df, tokens, indice, notify)
+
+        if self.resumen:
+            columnas = [col for col in self.resumen["columns"] if col in df.columns]
+            estilos = indice.tamano('U_Estilo') if indice is not None and indice.tiene_clave('U_Estilo') else 0
+            notify("success", self.resumen["message"].format(
+                completas=int(df[columnas].notna().any(axis=1).sum()), total=len(df), estilos=estilos))
+        return df
+
+    def _aplicar_pasos(self, df: pd.DataFrame, tokens: ItemNameTokens, indice: Optional[ReferenceIndex],
+                       notify: Callable[[str, str], None]) -> pd.DataFrame:
+        """Recorre los pasos compilados sobre el DataFrame"""
+        ejecucion = EjecucionPlan(self, tokens, indice, notify)
+        for paso in self.pasos:
+            df = paso(df, ejecucion)
+        return df
+
+    def compactar(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convierte la salida a los tipos compactos del esquema de la marca
+
+        Columnas como Empresa, U_Genero o U_Talla repiten unos pocos valores: como categóricas
+        ocupan un código por fila en lugar de un objeto de Python. ItemName y las descripciones
+        pasan a texto de Arrow, más compacto y con operaciones .str vectorizadas. Los códigos
+        (ItemCode, BarCode) no se compactan: son casi únicos por fila y pasarlos a texto
+        cambiaría sus valores (123 -> '123', NaN -> <NA>).
+        """
+        conversiones = {columna: tipo for columna, tipo in self.esquema.items()
+                        if columna in df.columns and df[columna].dtype != tipo}
+        return df.astype(conversiones) if conversiones else df
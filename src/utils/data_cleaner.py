@@ -1,71 +1,374 @@
 import pandas as pd
 import numpy as np
 import streamlit as st
+import os
+import tempfile
 import warnings
-from typing import Dict
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, Optional, Union
+from utils.reference_provider import ReferenceProvider
+from utils.reference_index import ReferenceIndex
+from utils.item_tokenizer import ItemNameTokens
+from utils.brand_rules import BrandPlan, TEAM_LICENSES_PATH
 warnings.filterwarnings('ignore')
 
+# Patrón "Americana" seguido de número que se elimina de las descripciones
+PATRON_AMERICANA = r'(?i)americana\s*\d+(?:\.\d+)?'
+
+# Presupuesto de memoria por defecto del modo por bloques y memoria que ocupa la limpieza
+# de un bloque respecto a su tamaño de entrada (columnas nuevas y resultados intermedios)
+DEFAULT_MEMORY_BUDGET_MB = 512
+CLEANING_MEMORY_FACTOR = 4
+
+# Motores de ejecución de los planes de limpieza
+ENGINES = ("pandas", "polars")
+
+# Modo paralelo: procesos por defecto y filas mínimas por partición (por debajo no compensa
+# arrancar procesos y enviarles los datos)
+DEFAULT_WORKERS = os.cpu_count() or 1
+MIN_ROWS_PER_PARTITION = 50_000
+
 class DataCleaner:
-    def __init__(self, brand: str, mongo_dataframes: Dict[str, pd.DataFrame]):
+    def __init__(self, brand: str, mongo_dataframes: Union[Dict[str, pd.DataFrame], ReferenceProvider],
+                 engine: str = "pandas"):
         """
         Inicializa el DataCleaner con la marca y los DataFrames de MongoDB.
         
         Args:
             brand: Código de la marca (CH, CL, SK, NE, FB, etc.)
             mongo_dataframes: Diccionario con los DataFrames de MongoDB (colecciones por marca)
+                o un ReferenceProvider que carga la colección de la marca bajo demanda
+            engine: Motor de ejecución de los planes: "pandas" (por defecto) o "polars"
+                (columnar y multihilo; requiere el paquete opcional polars). Ambos devuelven
+                los mismos DataFrames.
         """
+        if engine not in ENGINES:
+            raise ValueError(f"Motor no soportado: {engine} (disponibles: {', '.join(ENGINES)})")
+        self.engine = engine
         self.brand = brand.upper()
         self.mongo_dataframes = mongo_dataframes
+        if isinstance(mongo_dataframes, ReferenceProvider):
+            self.reference_provider = mongo_dataframes
+        else:
+            self.reference_provider = ReferenceProvider.from_dataframes(mongo_dataframes)
+        # Referencias fijadas con prepare_reference (se usan en lugar de consultar al proveedor)
+        self.prepared_indices: Dict[str, ReferenceIndex] = {}
+        # Con False, la limpieza no muestra sus mensajes de resumen (modo por bloques)
+        self.show_messages = True
+        # Cada marca se define de forma declarativa (ver BrandPlan): tokens del ItemName, reglas,
+        # cruces con la referencia y orden de columnas. Se compila la primera vez que se usa.
         self.brand_configs = {
             "CH": {
                 "name": "Cole Haan",
                 "columns": ["ItemName", "ItemCode", "Empresa", "U_Estilo", "U_Genero", "U_Categoria", 
-                           "U_Segmento", "U_Descripcion", "U_Descrip_Color", "U_Segmentacion_SK", "U_Zone", "U_Talla"]
+                           "U_Segmento", "U_Descripcion", "U_Descrip_Color", "U_Segmentacion_SK", "U_Zone", "U_Talla"],
+                "reference_columns": ["U_Estilo", "U_Segmentacion_SK", "U_Zone", "U_Descrip_Color", "U_Descripcion"],
+                "on_missing_reference": "return",
+                "pipeline": [
+                    {"op": "tokens", "columns": {"U_Estilo": "estilo"}},
+                    # U_Genero y U_Categoria según el primer carácter del estilo
+                    {"op": "prefix", "source": "U_Estilo", "column": "U_Genero",
+                     "rules": [["F", "MACC"], ["W", "WFW"], ["C", "MFW"], ["U", "WACC"]]},
+                    {"op": "copy", "source": "U_Genero", "column": "U_Categoria"},
+                    {"op": "map", "source": "U_Genero", "column": "U_Segmento",
+                     "values": {"WFW": "FOOTWEAR", "MFW": "FOOTWEAR", "MACC": "ACCESSORIES", "WACC": "ACCESSORIES"}},
+                    # Las columnas de referencia sustituyen a las del archivo
+                    {"op": "lookup", "key": "U_Estilo", "replace": True,
+                     "columns": ["U_Segmentacion_SK", "U_Zone", "U_Descrip_Color", "U_Descripcion"]},
+                    {"op": "order", "columns": ["ItemName", "ItemCode", "Empresa", "U_Estilo", "U_Genero", "U_Categoria",
+                                                "U_Segmento", "U_Descripcion", "U_Descrip_Color", "U_Segmentacion_SK", "U_Zone"]},
+                    {"op": "tokens", "columns": {"U_Talla": "talla"}, "if_missing": True}
+                ],
+                # Tipos compactos de la salida (ver BrandPlan.compactar)
+                "schema": {"category": ["Empresa", "U_Estilo", "U_Genero", "U_Categoria", "U_Segmento",
+                                        "U_Descrip_Color", "U_Segmentacion_SK", "U_Zone", "U_Talla"],
+                           "string": ["ItemName", "U_Descripcion"]}
             },
             "CL": {
                 "name": "Columbia", 
                 "columns": ["ItemName", "ItemCode", "Empresa", "u_estilo", "u_descripcion", 
-                           "u_descrip_color", "u_cod_color", "u_genero"]
+                           "u_descrip_color", "u_cod_color", "u_genero"],
+                # Columbia no usa datos de referencia: no se descarga su colección
+                "pipeline": [
+                    {"op": "tokens", "columns": {"u_estilo": "estilo", "u_descripcion": "descripcion",
+                                                 "U_Talla": "talla", "u_descrip_color": "color"}},
+                    {"op": "text", "column": "u_descrip_color", "fillna": ""},
+                    {"op": "split", "source": "u_descrip_color", "column": "u_cod_color", "sep": "-", "index": 1},
+                    # Género según el prefijo del ItemCode (único por SKU: no se agrupa por valor)
+                    {"op": "text", "column": "ItemCode"},
+                    {"op": "prefix", "source": "ItemCode", "column": "u_genero", "unique": False,
+                     "rules": [["3", "MENS"], [["804", "805"], "UNISEX"], ["4", "WOMENS"],
+                               ["5", "YOUTH BOYS"], ["6", "YOUTH GIRLS"], ["802", "YOUTH UNISEX"]]}
+                ],
+                "schema": {"category": ["Empresa", "u_estilo", "U_Talla", "u_descrip_color", "u_cod_color", "u_genero"],
+                           "string": ["ItemName", "u_descripcion"]}
             },
             "SK": {
                 "name": "Skechers", 
                 "columns": ["ItemName", "ItemCode", "Empresa", "createdate", "updatedate", 
                            "U_Estilo", "U_Genero", "U_Division", "U_Suela", "U_Temporalidad", 
-                           "U_Segmentacion_SK", "U_Descripcion", "U_Descrip_Color", "BarCode"]
+                           "U_Segmentacion_SK", "U_Descripcion", "U_Descrip_Color", "BarCode"],
+                "reference_columns": ["U_Estilo", "U_Genero", "U_Suela", "U_Division", "U_Temporalidad"],
+                "on_missing_reference": "return",
+                # Válido si el ItemName tiene '/' y el estilo tiene formato correcto
+                "masks": {"valido": ["tiene_slash", "estilo_valido"]},
+                "pipeline": [
+                    {"op": "init", "columns": ["U_Estilo", "U_Genero", "U_Suela", "U_Descrip_Color", "U_Segmentacion_SK",
+                                               "U_Division", "U_Temporalidad", "U_Descripcion", "U_Talla"]},
+                    # Una sola máscara de validez y un solo cruce, en el orden del archivo: las
+                    # filas inválidas quedan sin estilo (nulo), que no cruza con la referencia
+                    {"op": "tokens", "columns": {"U_Estilo": "estilo"}},
+                    {"op": "null", "column": "U_Estilo", "where": "~valido"},
+                    {"op": "tokens", "columns": {"U_Descripcion": "descripcion"}, "where": "valido"},
+                    {"op": "replace", "column": "U_Descripcion", "pattern": PATRON_AMERICANA, "where": "valido"},
+                    {"op": "lookup", "key": "U_Estilo", "columns": ["U_Genero", "U_Suela", "U_Division", "U_Temporalidad"]}
+                ],
+                "summary": {"columns": ["U_Genero", "U_Suela", "U_Division", "U_Temporalidad"],
+                            "message": "Skechers: Se completaron {completas} de {total} filas con datos de MongoDB"},
+                "schema": {"category": ["Empresa", "U_Estilo", "U_Genero", "U_Division", "U_Suela", "U_Temporalidad",
+                                        "U_Segmentacion_SK", "U_Descrip_Color", "U_Talla"],
+                           "string": ["ItemName", "U_Descripcion"]}
             },
             "NE": {
                 "name": "New Era",
                 "columns": ["ItemCode", "Empresa", "ItemName", "U_Talla", "U_Estilo", "U_Silueta", 
                             "U_Team", "U_Descrip_Color", "U_Segmento", "U_Liga", "U_Coleccion_NE", 
-                            "U_Genero", "U_Descripcion", "U_Temporalidad"]
+                            "U_Genero", "U_Descripcion", "U_Temporalidad"],
+                "reference_columns": ["U_Estilo", "U_Silueta", "U_Team", "U_Descrip_Color", "U_Segmento",
+                                      "U_Liga", "U_Coleccion_NE", "U_Genero", "U_Descripcion", "U_Temporalidad"],
+                "on_missing_reference": "return",
+                "pipeline": [
+                    {"op": "init", "columns": ["U_Estilo", "U_Silueta", "U_Team", "U_Descrip_Color", "U_Segmento", "U_Liga",
+                                               "U_Coleccion_NE", "U_Genero", "U_Descripcion", "U_Temporalidad", "U_Talla"]},
+                    {"op": "tokens", "columns": {"U_Estilo": "estilo", "U_Descripcion": "descripcion", "U_Talla": "talla"}},
+                    {"op": "replace", "column": "U_Descripcion", "pattern": r"\s+", "repl": " ", "strip": True},
+                    {"op": "order", "reindex": True,
+                     "columns": ["U_Estilo", "U_Silueta", "U_Team", "U_Descrip_Color", "U_Segmento", "U_Liga",
+                                 "U_Coleccion_NE", "U_Genero", "U_Descripcion", "U_Temporalidad",
+                                 "ItemCode", "Empresa", "ItemName", "U_Talla"]},
+                    {"op": "lookup", "key": "U_Estilo", "key_as_text": True,
+                     "columns": ["U_Silueta", "U_Team", "U_Descrip_Color", "U_Segmento", "U_Liga",
+                                 "U_Coleccion_NE", "U_Genero", "U_Descripcion", "U_Temporalidad"]},
+                    # Tabla equipo -> liga (JSON) con la que se completa U_Liga
+                    {"op": "licenses", "source": "U_Team", "column": "U_Liga", "path": TEAM_LICENSES_PATH}
+                ],
+                "schema": {"category": ["Empresa", "U_Talla", "U_Estilo", "U_Silueta", "U_Team", "U_Descrip_Color",
+                                        "U_Segmento", "U_Liga", "U_Coleccion_NE", "U_Genero", "U_Temporalidad"],
+                           "string": ["ItemName", "U_Descripcion"]}
             },
             "BI": {
                 "name": "Birkenstock",
-                "columns": ["ItemName", "ItemCode", "Empresa", "U_Estilo", "U_Genero", "U_Categoria"]
+                "columns": ["ItemName", "ItemCode", "Empresa", "U_Estilo", "U_Genero", "U_Categoria"],
+                "reference_columns": ["U_Estilo", "U_Genero", "U_Categoria"],
+                "pipeline": [
+                    {"op": "tokens", "columns": {"U_Estilo": "estilo", "U_Descripcion": "descripcion"}},
+                    {"op": "lookup", "key": "U_Estilo", "columns": ["U_Genero", "U_Categoria"]}
+                ],
+                "schema": {"category": ["Empresa", "U_Estilo", "U_Genero", "U_Categoria"],
+                           "string": ["ItemName", "U_Descripcion"]}
             },
             "PB": {
                 "name": "Psycho Bunny",
-                "columns": ["ItemName", "ItemCode", "Empresa", "U_Estilo", "U_Prenda", "U_Subprenda","U_Genero", "U_Descrip_Color", "U_Temporalidad", "U_Talla"]
+                "columns": ["ItemName", "ItemCode", "Empresa", "U_Estilo", "U_Prenda", "U_Subprenda","U_Genero", "U_Descrip_Color", "U_Temporalidad", "U_Talla"],
+                "reference_columns": ["U_Estilo", "U_Genero", "U_Prenda", "U_Subprenda", "U_Temporalidad"],
+                # Psycho Bunny compara los estilos sin espacios en los extremos
+                "strip_reference_keys": True,
+                "on_missing_reference": "return",
+                "pipeline": [
+                    # ESTILO / DESCRIPCION / TALLA / COLOR (el color incluye lo que siga tras él)
+                    {"op": "tokens", "columns": {"U_Estilo": "estilo", "U_Descripcion": "descripcion",
+                                                 "U_Talla": "talla", "U_Descrip_Color": "color_resto"}},
+                    {"op": "replace", "column": "U_Descripcion", "pattern": PATRON_AMERICANA, "strip": True},
+                    {"op": "lookup", "key": "U_Estilo", "key_as_text": True, "strip_key": True,
+                     "columns": ["U_Genero", "U_Prenda", "U_Subprenda", "U_Temporalidad"]}
+                ],
+                "summary": {"columns": ["U_Genero", "U_Prenda", "U_Subprenda", "U_Temporalidad"],
+                            "message": "Psycho Bunny: Se enriquecieron {completas} filas usando {estilos} estilos de referencia."},
+                "schema": {"category": ["Empresa", "U_Estilo", "U_Prenda", "U_Subprenda", "U_Genero", "U_Descrip_Color",
+                                        "U_Temporalidad", "U_Talla"],
+                           "string": ["ItemName", "U_Descripcion"]}
             },
             "AD": {
                 "name": "Adolfo",
-                "columns": ["ItemName", "ItemCode", "Empresa", "U_Estilo", "U_Genero", "U_Categoria"]
+                "columns": ["ItemName", "ItemCode", "Empresa", "U_Estilo", "U_Genero", "U_Categoria"],
+                "reference_columns": ["U_Estilo", "U_Genero", "U_Categoria"],
+                "pipeline": [
+                    {"op": "tokens", "columns": {"U_Estilo": "estilo", "U_Descripcion": "descripcion"}},
+                    {"op": "lookup", "key": "U_Estilo", "columns": ["U_Genero", "U_Categoria"]}
+                ],
+                "schema": {"category": ["Empresa", "U_Estilo", "U_Genero", "U_Categoria"],
+                           "string": ["ItemName", "U_Descripcion"]}
             },
             "FB": {
                 "name": "Fabletics",
                 "columns": ["ItemName", "ItemCode", "Empresa", "U_Estilo", "U_Estilo_Color", 
                            "U_Descripcion", "U_Descrip_Color", "U_Talla", "U_Genero", "U_Segmento", 
-                           "U_Prenda", "U_Subprenda", "U_Categoria"]
+                           "U_Prenda", "U_Subprenda", "U_Categoria"],
+                "reference_columns": ["U_Estilo", "U_Estilo_Color", "U_Division", "U_Genero", "U_Segmento",
+                                      "U_Prenda", "U_Subprenda", "U_Categoria"],
+                # U_Division se cruza por U_Estilo_Color; el resto por U_Estilo
+                "reference_keys": ["U_Estilo", "U_Estilo_Color"],
+                # En Fabletics el estilo es lo que precede al primer '-' del ItemName
+                "style_separator": "-",
+                # Sin referencia se hace igualmente la limpieza básica
+                "on_missing_reference": "warn",
+                "pipeline": [
+                    # En Fabletics el color va antes que la talla
+                    {"op": "tokens", "columns": {"U_Estilo": "estilo_guion", "U_Estilo_Color": "estilo_color",
+                                                 "U_Descripcion": "descripcion", "U_Descrip_Color": "talla",
+                                                 "U_Talla": "color"}},
+                    # Un solo cruce en cascada: U_Division por U_Estilo_Color y, por U_Estilo,
+                    # las columnas que el archivo no tiene
+                    {"op": "cascade", "key_as_text": True, "levels": [
+                        {"key": "U_Estilo_Color", "columns": ["U_Division"], "optional": True},
+                        {"key": "U_Estilo", "columns": ["U_Genero", "U_Segmento", "U_Prenda", "U_Subprenda",
+                                                        "U_Categoria"], "only_new": True}
+                    ]},
+                    {"op": "order", "columns": ["ItemName", "ItemCode", "Empresa", "U_Estilo", "U_Estilo_Color",
+                                                "U_Descripcion", "U_Descrip_Color", "U_Talla", "U_Genero", "U_Segmento",
+                                                "U_Prenda", "U_Subprenda", "U_Categoria", "U_Division"]}
+                ],
+                "summary": {"columns": ["U_Genero", "U_Segmento", "U_Prenda", "U_Categoria"],
+                            "message": "Fabletics: Se completaron {completas} de {total} filas con datos de MongoDB"},
+                "schema": {"category": ["Empresa", "U_Estilo", "U_Estilo_Color", "U_Descrip_Color", "U_Talla",
+                                        "U_Genero", "U_Segmento", "U_Prenda", "U_Subprenda", "U_Categoria",
+                                        "U_Division"],
+                           "string": ["ItemName", "U_Descripcion"]}
             }
         }
+        # Planes ya compilados por marca
+        self.plans: Dict[str, BrandPlan] = {}
+        # Con False, la salida conserva los tipos de la limpieza (texto como object) en lugar
+        # del esquema compacto de la marca
+        self.compact_output = True
     
     def clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Limpia los datos según la marca especificada usando los DataFrames de MongoDB"""
+        """
+        Limpia los datos según la marca especificada usando los DataFrames de MongoDB
+
+        La limpieza se hace con copy-on-write: el plan de la marca trabaja sobre una vista
+        del DataFrame de entrada y solo se materializan las columnas que se modifican, sin
+        copiar el archivo completo. Al terminar se copian las columnas que la limpieza no
+        tocó, de modo que el resultado tiene sus propios datos: ni la limpieza modifica el
+        DataFrame de entrada ni modificar el resultado después lo cambia.
+        """
         if self.brand not in self.brand_configs:
             raise ValueError(f"Marca no soportada: {self.brand}")
         
-        # Copia del DataFrame original
-        cleaned_df = df.copy()
+        with pd.option_context("mode.copy_on_write", True):
+            return _sin_datos_compartidos(self._clean_brand(df), df)
+
+    def prepare_reference(self) -> ReferenceIndex:
+        """
+        Carga e indexa la referencia completa de la marca y la fija para las siguientes limpiezas
+
+        Así todos los bloques de un archivo se cruzan contra la misma referencia, sin volver
+        a consultar al proveedor (ni a MongoDB) por cada bloque.
+        """
+        indice = self._get_reference_index(self.brand)
+        self.prepared_indices[self.brand] = indice
+        return indice
+
+    def clean_data_chunks(self, chunks: Iterable[pd.DataFrame],
+                          memory_budget_mb: Optional[float] = None) -> Iterator[pd.DataFrame]:
+        """
+        Limpia un archivo por bloques, sin cargarlo entero en memoria
+
+        La lógica de cada marca solo depende de la fila y de la referencia, así que limpiar
+        por bloques da las mismas filas que clean_data sobre el archivo completo.
+
+        Args:
+            chunks: Iterable de DataFrames (p. ej. FileHandler.read_file_chunks)
+            memory_budget_mb: Memoria máxima para limpiar un bloque; los bloques que la superan
+                se dividen (por defecto DEFAULT_MEMORY_BUDGET_MB)
+
+        Yields:
+            pd.DataFrame: Cada bloque ya limpio, en el orden de entrada (las categorías de cada
+                bloque son las suyas: al unir bloques, volver a aplicar el esquema de la marca)
+        """
+        if self.brand not in self.brand_configs:
+            raise ValueError(f"Marca no soportada: {self.brand}")
+        presupuesto = (memory_budget_mb or DEFAULT_MEMORY_BUDGET_MB) * 1024 * 1024
+
+        # La referencia se prepara una sola vez para todos los bloques, y solo para esta
+        # ejecución: las limpiezas siguientes vuelven a consultar al proveedor (snapshots nuevos)
+        preparada = False
+        if "reference_columns" in self.brand_configs[self.brand] and self.brand not in self.prepared_indices:
+            preparada = True
+            if self.prepare_reference().empty:
+                self._notify("warning", f"No se encontró el DataFrame de referencia para {self.brand_configs[self.brand]['name']}")
+
+        show_messages = self.show_messages
+        self.show_messages = False
+        try:
+            for chunk in chunks:
+                for bloque in self._split_by_budget(chunk, presupuesto):
+                    yield self.clean_data(bloque)
+        finally:
+            self.show_messages = show_messages
+            if preparada:
+                self.prepared_indices.pop(self.brand, None)
+
+    def clean_data_parallel(self, df: pd.DataFrame, workers: Optional[int] = None) -> pd.DataFrame:
+        """
+        Limpia el DataFrame repartiendo las filas entre varios procesos
+
+        La referencia de la marca se prepara una sola vez y se publica en un archivo Arrow
+        que cada proceso mapea en memoria al arrancar: todos comparten las mismas páginas y
+        no hay que deserializar la referencia en cada proceso. Las particiones se limpian en
+        paralelo y el resultado se reensambla en el orden original.
+
+        Args:
+            df: DataFrame a limpiar
+            workers: Número de procesos (por defecto DEFAULT_WORKERS, uno por núcleo)
+
+        Returns:
+            pd.DataFrame: El mismo resultado que clean_data
+        """
+        if self.brand not in self.brand_configs:
+            raise ValueError(f"Marca no soportada: {self.brand}")
+        workers = max(1, min(workers or DEFAULT_WORKERS, len(df) // MIN_ROWS_PER_PARTITION))
+        if workers == 1:
+            return self.clean_data(df)
+
+        # La referencia se prepara para esta ejecución sin fijarla en el cleaner
+        indice = None
+        if "reference_columns" in self.brand_configs[self.brand]:
+            indice = self._get_reference_index(self.brand)
+
+        tamano = -(-len(df) // workers)
+        particiones = [df.iloc[inicio:inicio + tamano] for inicio in range(0, len(df), tamano)]
+        with tempfile.TemporaryDirectory(prefix="referencia_") as directorio:
+            publicada = indice.publicar(directorio) if indice is not None else None
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_process_context(),
+                                     initializer=_init_worker,
+                                     initargs=(self.brand, self.brand_configs, publicada,
+                                               self.compact_output, self.engine)) as executor:
+                resultados = list(executor.map(_clean_partition, particiones))
+        # Cada partición tiene sus propias categorías: al unirlas se vuelve a compactar
+        resultado = pd.concat(resultados)
+        return self._plan(self.brand).compactar(resultado) if self.compact_output else resultado
+
+    @staticmethod
+    def _split_by_budget(chunk: pd.DataFrame, presupuesto: float) -> Iterator[pd.DataFrame]:
+        """Divide un bloque en partes cuya limpieza cabe en el presupuesto de memoria"""
+        if chunk.empty:
+            return
+        bytes_por_fila = chunk.memory_usage(deep=True).sum() / len(chunk) * CLEANING_MEMORY_FACTOR
+        filas = max(1, int(presupuesto // max(bytes_por_fila, 1)))
+        for inicio in range(0, len(chunk), filas):
+            yield chunk.iloc[inicio:inicio + filas]
+
+    def _notify(self, level: str, message: str):
+        """Muestra un mensaje de Streamlit (st.success, st.warning...) salvo en modo silencioso"""
+        if self.show_messages:
+            getattr(st, level)(message)
+
+    def _clean_brand(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Valida las columnas y aplica la limpieza específica de la marca"""
+        # Vista del DataFrame original (con copy-on-write no comparte modificaciones)
+        cleaned_df = df.copy(deep=False)
         
         # Validar columnas requeridas
         required_cols = ["ItemName", "ItemCode", "Empresa"]
@@ -73,545 +376,107 @@ class DataCleaner:
         if missing_cols:
             raise ValueError(f"Columnas faltantes: {missing_cols}")
         
-        # Aplicar limpieza específica por marca
-        if self.brand == "CH":
-            cleaned_df = self._clean_cole_haan(cleaned_df)
-        elif self.brand == "CL":
-            cleaned_df = self._clean_columbia(cleaned_df)
-        elif self.brand == "SK":
-            cleaned_df = self._clean_skechers(cleaned_df)
-        elif self.brand == "NE":
-            cleaned_df = self._clean_new_era(cleaned_df)
-        elif self.brand == "FB":
-            cleaned_df = self._clean_fabletics(cleaned_df)
-        elif self.brand == "PB":
-            cleaned_df = self._clean_psycho_bunny(cleaned_df)
-        elif self.brand in ["BI", "AD"]:
-            cleaned_df = self._clean_generic_brand(cleaned_df)
-        
-        return cleaned_df
+        # Un ItemName sin ningún valor se lee como float: se trata como texto (todo nulo)
+        if pd.api.types.is_numeric_dtype(cleaned_df['ItemName']) and cleaned_df['ItemName'].isna().all():
+            cleaned_df['ItemName'] = cleaned_df['ItemName'].astype(object)
+
+        # El ItemName se divide una sola vez; todos los pasos leen de los mismos tokens
+        plan = self._plan(self.brand)
+        tokens = plan.tokens(cleaned_df['ItemName'])
+        
+        # Aplicar el plan de la marca (solo se consulta la referencia si la marca la usa)
+        indice = self._get_reference_index(self.brand, tokens) if plan.usa_referencia else None
+        cleaned_df = plan.ejecutar(cleaned_df, tokens, indice, self._notify)
+        return plan.compactar(cleaned_df) if self.compact_output else cleaned_df
+
+    def _plan(self, brand: str) -> BrandPlan:
+        """Plan de limpieza de la marca, compilado una sola vez a partir de brand_configs"""
+        if brand not in self.plans:
+            if self.engine == "polars":
+                # polars es opcional: solo se importa si se elige este motor
+                from utils.polars_engine import PolarsPlan
+                self.plans[brand] = PolarsPlan(self.brand_configs[brand])
+            else:
+                self.plans[brand] = BrandPlan(self.brand_configs[brand])
+        return self.plans[brand]
     
-    def _get_reference_dataframe(self, brand: str) -> pd.DataFrame:
-        """Obtiene el DataFrame de referencia para la marca desde los DataFrames de MongoDB"""
-        brand_name = self.brand_configs.get(brand, {}).get("name", "")
+    def _style_keys(self, brand: str, tokens: ItemNameTokens) -> list:
+        """Devuelve los estilos distintos del archivo, tal como los extrae el cleaner de la marca"""
+        separador = self.brand_configs[brand].get("style_separator", "/")
+        estilos = tokens.estilos(separador).dropna()
+        # Algunos cleaners comparan el estilo sin espacios: se buscan ambas variantes
+        return pd.unique(pd.concat([estilos, estilos.str.strip()])).tolist()
+
+    def _get_reference_index(self, brand: str, tokens: ItemNameTokens = None) -> ReferenceIndex:
+        """
+        Obtiene la referencia de la marca ya deduplicada e indexada por sus claves de cruce
+
+        El índice lo construye y guarda el proveedor, así que las limpiezas siguientes sobre
+        el mismo snapshot no repiten drop_duplicates ni la normalización de las claves. Con los
+        tokens del archivo, el proveedor puede consultar solo los estilos presentes en él.
+        """
+        if brand in self.prepared_indices:
+            return self.prepared_indices[brand]
+        config = self.brand_configs.get(brand, {})
+        brand_name = config.get("name", "")
         if not brand_name:
-            return pd.DataFrame()
-        
-        # Buscar el DataFrame correspondiente en los datos de MongoDB
-        for df_name, df in self.mongo_dataframes.items():
-            if brand_name.lower() in df_name.lower():
-                return df.copy()
-        
-        return pd.DataFrame()
+            return ReferenceIndex(pd.DataFrame(), [])
+        claves = config.get("reference_keys", ["U_Estilo"])
+        valores_clave = self._style_keys(brand, tokens) if tokens is not None else None
+        return self.reference_provider.get_index(brand, brand_name, config.get("reference_columns"), claves,
+                                                 valores_clave, config.get("strip_reference_keys", False))
 
-    # Cole Haan limpieza
-    def _clean_cole_haan(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Proceso de limpieza para Cole Haan usando DataFrames de MongoDB"""
-        cleaned_df = df.copy()
-        
-        # Obtener DataFrame de referencia de MongoDB
-        df_reference = self._get_reference_dataframe("CH")
-        if df_reference.empty:
-            st.warning("No se encontró el DataFrame de referencia para Cole Haan")
-            return cleaned_df
-        
-        # Procesamiento similar al original pero usando df_reference en lugar de los archivos L
-        # Extraer U_Estilo de ItemName
-        cleaned_df['U_Estilo'] = cleaned_df['ItemName'].str.split('/').str[0]
-        
-        # Asignar U_Genero y U_Categoria basado en el primer carácter
-        conditions = [
-            cleaned_df['U_Estilo'].str.startswith('F'),
-            cleaned_df['U_Estilo'].str.startswith('W'),
-            cleaned_df['U_Estilo'].str.startswith('C'),
-            cleaned_df['U_Estilo'].str.startswith('U')
-        ]
-        choices = ['MACC', 'WFW', 'MFW', 'WACC']
-        cleaned_df['U_Genero'] = np.select(conditions, choices, default='')
-        cleaned_df['U_Categoria'] = cleaned_df['U_Genero']
-        
-        # Asignar U_Segmento según reglas
-        cleaned_df['U_Segmento'] = np.where(
-            cleaned_df['U_Genero'].isin(['WFW', 'MFW']),
-            'FOOTWEAR',
-            np.where(cleaned_df['U_Genero'].isin(['MACC', 'WACC']), 'ACCESSORIES', '')
-        )
-        
-        # Hacer merge con el DataFrame de referencia
-        if not df_reference.empty:
-            # Seleccionar solo las columnas necesarias del DataFrame de referencia
-            ref_columns = ['U_Estilo', 'U_Segmentacion_SK', 'U_Zone', 'U_Descrip_Color','U_Descripcion']
-            ref_columns = [col for col in ref_columns if col in df_reference.columns]
-            
-            df_reference = df_reference[ref_columns].drop_duplicates('U_Estilo')
-            
-            # Realizar el merge
-            df_resultado = pd.merge(
-                cleaned_df.drop(columns=[ 'U_Segmentacion_SK', 'U_Zone', 'U_Descrip_Color', 'U_Descripcion'], 
-                errors='ignore'),
-                df_reference,
-                on='U_Estilo',
-                how='left'
-            )
-        else:
-            df_resultado = cleaned_df.copy()
-        
-        # Reordenar columnas
-        column_order = [
-            'ItemName', 'ItemCode', 'Empresa', 'U_Estilo', 'U_Genero', 'U_Categoria',
-            'U_Segmento', 'U_Descripcion', 'U_Descrip_Color', 'U_Segmentacion_SK', 'U_Zone'
-        ]
-        df_resultado = df_resultado.reindex(columns=[col for col in column_order if col in df_resultado.columns])
-        
-        # Agregar U_Talla si no existe
-        if 'U_Talla' not in df_resultado.columns:
-            df_resultado['U_Talla'] = df_resultado['ItemName'].str.split('/').str[2]
-        
-        return df_resultado
-    
-    # Columbia limpieza
-    def _clean_columbia(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Proceso de limpieza para Columbia usando DataFrames de MongoDB"""
-        cleaned_df = df.copy()
-        
-        # Obtener DataFrame de referencia de MongoDB
-        df_reference = self._get_reference_dataframe("CL")
-        if not df_reference.empty:
-            # Si hay datos de referencia, podemos usarlos para completar información faltante
-            pass  # Columbia no usa mucho datos de referencia en su proceso original
-        
-        # Proceso literal del CL.PY (líneas 7-31)
-        # 1. Extraer información de ItemName
-        cleaned_df['u_estilo'] = cleaned_df['ItemName'].str.split('/').str[0]
-        cleaned_df['u_descripcion'] = cleaned_df['ItemName'].str.split('/').str[1]
-        cleaned_df['U_Talla'] = cleaned_df['ItemName'].str.split('/').str[2]
-        cleaned_df['u_descrip_color'] = cleaned_df['ItemName'].str.split('/').str[3]
-        
-        # Manejar casos donde u_descrip_color es NaN y convertir a string
-        cleaned_df['u_descrip_color'] = cleaned_df['u_descrip_color'].fillna('').astype(str)
-        cleaned_df['u_cod_color'] = cleaned_df['u_descrip_color'].str.split('-').str[1]
-        
-        # Definir condiciones y valores
-        # Asegurar que ItemCode es string
-        cleaned_df['ItemCode'] = cleaned_df['ItemCode'].astype(str)
-        
-        conditions = [
-            cleaned_df['ItemCode'].str.startswith('3'),               # MENS
-            cleaned_df['ItemCode'].str.startswith(('804', '805')),    # UNISEX
-            cleaned_df['ItemCode'].str.startswith('4'),               # WOMENS
-            cleaned_df['ItemCode'].str.startswith('5'),               # YOUTH BOYS
-            cleaned_df['ItemCode'].str.startswith('6'),               # YOUTH GIRLS
-            cleaned_df['ItemCode'].str.startswith('802')              # YOUTH UNISEX
-        ]
-        
-        choices = ['MENS', 'UNISEX', 'WOMENS', 'YOUTH BOYS', 'YOUTH GIRLS', 'YOUTH UNISEX']
-        
-        # Aplicar condiciones
-        cleaned_df['u_genero'] = np.select(conditions, choices, default='')
-        
-        return cleaned_df
-    
-    # Skechers limpieza
-    def _clean_skechers(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Proceso de limpieza para Skechers usando DataFrames de MongoDB"""
-        # El DF de entrada es como sk.csv
-        df_null_sk = df.copy()
-        
-        # Obtener DataFrames de referencia de MongoDB
-        df_sk = self._get_reference_dataframe("SK")
-        
-        if df_sk.empty:
-            st.warning("No se encontró el DataFrame de referencia para Skechers")
-            return df_null_sk
-        
-        # Inicializar columnas que podrían no existir en el DataFrame de entrada
-        required_columns = ['U_Estilo', 'U_Genero', 'U_Suela', 'U_Descrip_Color', 
-                           'U_Segmentacion_SK', 'U_Division', 'U_Temporalidad', 'U_Descripcion', 'U_Talla']
-        for col in required_columns:
-            if col not in df_null_sk.columns:
-                df_null_sk[col] = np.nan
-        
-        # 1. Extraer u_estilo de ItemName
-        df_null_sk['U_Estilo'] = df_null_sk['ItemName'].str.split('/').str[0]
-        
-        # 2. Condiciones de validación
-        tiene_slash = df_null_sk['ItemName'].str.contains('/')
-        formato_correcto = (
-            df_null_sk['U_Estilo'].str.len() >= 2
-        ) & (
-            df_null_sk['U_Estilo'].str[0].str.isalnum()
-        )
-        
-        # 3. Condición final: válido si cumple ambas
-        cond_valido = tiene_slash & formato_correcto
-        
-        # 4. Separar válidos e inválidos
-        df_valido = df_null_sk[cond_valido].copy()
-        df_invalido = df_null_sk[~cond_valido].copy()
-        
-        # 5. Limpiar u_estilo en los inválidos
-        df_invalido['U_Estilo'] = np.nan
-        
-        # 6. Procesar válidos - extraer descripción
-        df_valido['U_Descripcion'] = df_valido['ItemName'].str.split('/').str[1]
-        
-        # Eliminar "Americana" seguido de número
-        df_valido['U_Descripcion'] = df_valido['U_Descripcion'].str.replace(
-            r'(?i)americana\s*\d+(?:\.\d+)?', '', regex=True
-        )
-        
-        # 7. Usar solo las columnas disponibles en MongoDB para completar datos
-        available_mongo_columns = list(df_sk.columns)
-        
-        # Preparar DataFrame de referencia usando U_Estilo como clave
-        if 'U_Estilo' in available_mongo_columns:
-            df_reference = df_sk[['U_Estilo'] + [col for col in ['U_Genero', 'U_Suela', 'U_Division', 'U_Temporalidad'] 
-                                                 if col in available_mongo_columns]].copy()
-            
-            # Limpiar duplicados por U_Estilo
-            df_reference = df_reference.drop_duplicates('U_Estilo')
-            
-            # Asegurar tipos compatibles
-            df_reference['U_Estilo'] = df_reference['U_Estilo'].astype(str)
-            df_valido['U_Estilo'] = df_valido['U_Estilo'].astype(str)
-            df_invalido['U_Estilo'] = df_invalido['U_Estilo'].astype(str)
-            
-            # Merge para válidos - usar U_Estilo como clave
-            df_valido = pd.merge(
-                df_valido,
-                df_reference,
-                on='U_Estilo',
-                how='left',
-                suffixes=('', '_ref')
-            )
-            
-            # Completar columnas faltantes para válidos
-            for col in ['U_Genero', 'U_Suela', 'U_Division', 'U_Temporalidad']:
-                col_ref = f'{col}_ref'
-                if col_ref in df_valido.columns:
-                    # Usar datos de MongoDB para completar valores faltantes
-                    df_valido[col] = df_valido[col].fillna(df_valido[col_ref])
-                    df_valido.drop(columns=[col_ref], inplace=True)
-            
-            # Merge para inválidos - también intentar completar por U_Estilo
-            df_invalido = pd.merge(
-                df_invalido,
-                df_reference,
-                on='U_Estilo',
-                how='left',
-                suffixes=('', '_ref')
-            )
-            
-            # Completar columnas faltantes para inválidos
-            for col in ['U_Genero', 'U_Suela', 'U_Division', 'U_Temporalidad']:
-                col_ref = f'{col}_ref'
-                if col_ref in df_invalido.columns:
-                    # Usar datos de MongoDB para completar valores faltantes
-                    df_invalido[col] = df_invalido[col].fillna(df_invalido[col_ref])
-                    df_invalido.drop(columns=[col_ref], inplace=True)
-        
-        # 8. Concatenar válidos e inválidos
-        df_final = pd.concat([df_valido, df_invalido], ignore_index=True)
-        
-        # 9. Mostrar estadísticas de limpieza
-        total_rows = len(df_final)
-        completed_rows = len(df_final[df_final['U_Genero'].notna() | df_final['U_Suela'].notna() | 
-                                     df_final['U_Division'].notna() | df_final['U_Temporalidad'].notna()])
-        
-        st.success(f"Skechers: Se completaron {completed_rows} de {total_rows} filas con datos de MongoDB")
-        
-        return df_final
-    
-    # New Era limpieza
-    def _clean_new_era(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Proceso de limpieza para New Era usando DataFrames de MongoDB"""
-        # El DF de entrada es como DataNull.csv
-        df_null = df.copy()
-        
-        # Obtener DataFrame de referencia de MongoDB
-        df_reference = self._get_reference_dataframe("NE")
-        if df_reference.empty:
-            st.warning("No se encontró el DataFrame de referencia para New Era")
-            return df_null
-        
-        # Inicializar columnas que podrían no existir en el DataFrame de entrada
-        required_columns = ['U_Estilo', 'U_Silueta', 'U_Team', 'U_Descrip_Color', 'U_Segmento',
-                           'U_Liga', 'U_Coleccion_NE', 'U_Genero', 'U_Descripcion', 'U_Temporalidad', 'U_Talla']
-        for col in required_columns:
-            if col not in df_null.columns:
-                df_null[col] = np.nan
-        
-        # Procesar DataFrame principal
-        df_null['U_Estilo'] = df_null['ItemName'].str.split('/').str[0]
-        df_null['U_Descripcion'] = (
-            df_null['ItemName']
-            .str.replace(r'\s+', ' ', regex=True)
-            .str.strip()
-            .str.split('/')
-            .str[1]
-            .str.strip()
-        )
-        df_null['U_Talla'] = df_null['ItemName'].str.split('/').str[2]
-        
-        # Completar datos desde el DataFrame de referencia
-        columnas_completar = ['U_Estilo', 'U_Silueta', 'U_Team', 'U_Descrip_Color', 'U_Segmento',
-                             'U_Liga', 'U_Coleccion_NE', 'U_Genero', 'U_Descripcion', 'U_Temporalidad']
-        columnas_extra = ['ItemCode', 'Empresa', 'ItemName', 'U_Talla']
-        
-        df_reference = df_reference[columnas_completar]
-        df_null = df_null.reindex(columns=columnas_completar + columnas_extra)
-        
-        df_reference['U_Estilo'] = df_reference['U_Estilo'].astype(str)
-        df_null['U_Estilo'] = df_null['U_Estilo'].astype(str)
-        
-        df_reference = df_reference.drop_duplicates('U_Estilo').reset_index(drop=True)
-        
-        temp_df = df_null[columnas_extra + ['U_Estilo']].merge(
-            df_reference, 
-            on='U_Estilo', 
-            how='left',
-            suffixes=('', '_ref')
-        )
-        
-        for col in columnas_completar[1:]:
-            mask = df_null[col].isnull()
-            if col in temp_df.columns:
-                df_null.loc[mask, col] = temp_df.loc[mask, col]
-        
-        # Aplicar team_licenses
-        team_licenses = {
-            'LOS ANGELES DODGERS': 'MLB', 'NEW YORK YANKEES': 'MLB', 'PITTSBURGH PIRATES': 'MLB',
-            'SAN FRANCISCO GIANTS': 'MLB', 'SEATTLE MARINERS': 'MLB', 'TAMPA BAY RAYS': 'MLB',
-            'NEW ERA BRANDED': 'NEW ERA BRANDED', 'NO APLICA': 'NO APLICA', 'NEW ENGLAND PATRIOTS': 'NFL',
-            'HOUSTON TEXANS': 'NFL', 'BALTIMORE RAVENS': 'NFL', 'TORONTO BLUE JAYS': 'MLB',
-            'HOUSTON ASTROS': 'MLB', 'GREEN BAY PACKERS': 'NFL', 'BOSTON RED SOX': 'MLB',
-            'BALTIMORE ORIOLES': 'MLB', 'ST. LOUIS CARDINALS': 'MLB', 'SEATTLE SEAHAWKS': 'NFL',
-            'DALLAS COWBOYS': 'NFL', 'PITTSBURGH STEELERS': 'NFL', 'MIAMI DOLPHINS': 'NFL',
-            'STARWARS': 'ENTERTAINMENT', 'DALLAS MAVERICKS': 'NBA', 'LOS ANGELES LAKERS': 'NBA',
-            'NEW ORLEANS SAINTS': 'NFL', 'JACKSONVILLE JAGUARS': 'NFL', 'CLEVELAND BROWNS': 'NFL',
-            'NEW YORK KNICKS': 'NBA', 'SAN ANTONIO SPURS': 'NBA', 'WASHINGTON NATIONALS': 'MLB',
-            'OAKLAND ATHLETICS': 'MLB', 'DETROIT TIGERS': 'MLB', 'ANAHEIM ANGELS': 'MLB',
-            'NASCAR': 'MOTORSPORT', 'NEW YORK METS': 'MLB', 'PHILADELPHIA PHILLIES': 'MLB',
-            'CHICAGO WHITE SOX': 'MLB', 'SAN DIEGO PADRES': 'MLB', 'CLEVELAND INDIANS': 'MLB',
-            'DENVER BRONCOS': 'NFL', 'BUFFALO BILLS': 'NFL', 'ATLANTA FALCONS': 'NFL',
-            'CHICAGO BEARS': 'NFL', 'BROOKLYN NETS': 'NBA', 'CHICAGO BULLS': 'NBA',
-            'SAN FRANCISCO 49ERS': 'NFL', 'INDIANAPOLIS COLTS': 'NFL', 'ARIZONA CARDINALS': 'NFL',
-            'OAKLAND RAIDERS': 'NFL', 'LOS ANGELES RAMS': 'NFL', 'TAMPA BAY BUCCANEERS': 'NFL',
-            'GOLDEN STATE WARRIORS': 'NBA', 'BOSTON CELTICS': 'NBA', 'CHICAGO CUBS': 'MLB'
-        }
-        
-        # Aplicar team_licenses
-        registros_en_blanco = df_null[df_null['U_Liga'].isna() | (df_null['U_Liga'] == '')]
-        
-        for index, row in registros_en_blanco.iterrows():
-            equipo = row['U_Team']
-            if equipo in team_licenses:
-                df_null.at[index, 'U_Liga'] = team_licenses[equipo]
-        
-        return df_null
-    
-    # Fabletics limpieza
-    def _clean_fabletics(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Proceso de limpieza para Fabletics usando DataFrames de MongoDB"""
-        df_fb = df.copy()
-        
-        # Obtener DataFrame de referencia de MongoDB
-        df_db = self._get_reference_dataframe("FB")
-        if df_db.empty:
-            st.warning("No se encontró el DataFrame de referencia para Fabletics")
-            # Continuar con la limpieza básica aunque no haya datos de referencia
-        
-        # 1. Extraer U_Estilo (primer elemento antes del primer '-')
-        df_fb['U_Estilo'] = df_fb['ItemName'].str.split('-').str[0]
-        
-        # 2. Extraer U_Estilo_Color (primeros 2 elementos después de dividir por '-')
-        df_fb['U_Estilo_Color'] = df_fb['ItemName'].str.split('-').str[:2].str.join('-')
-        
-        # 3. Extraer información del ItemName usando '/' como delimitador
-        df_fb['U_Descripcion'] = df_fb['ItemName'].str.split('/').str[1]
-        df_fb['U_Descrip_Color'] = df_fb['ItemName'].str.split('/').str[2]
-        df_fb['U_Talla'] = df_fb['ItemName'].str.split('/').str[3]
-        
-        # 4. Si existe el DataFrame de referencia, hacer el merge
-        if not df_db.empty:
-            # Identificar columnas comunes entre ambos DataFrames
-            common_cols = df_fb.columns.intersection(df_db.columns).tolist()
-            
-            # Mantener U_Estilo para el merge
-            if 'U_Estilo' in common_cols:
-                common_cols.remove('U_Estilo')
-            
-            # Eliminar U_Division de las columnas a eliminar si existe
-            cols_to_drop = [col for col in common_cols if col != 'U_Division']
-            
-            # Preparar DataFrame de referencia para el primer merge (por U_Estilo)
-            merge_cols_estilo = ['U_Estilo'] + [col for col in df_db.columns 
-                                                if col not in cols_to_drop and col != 'U_Estilo' and col != 'U_Estilo_Color' and col != 'U_Division']
-            
-            if len(merge_cols_estilo) > 1:  # Si hay columnas además de U_Estilo
-                df_db_estilo = df_db[merge_cols_estilo].drop_duplicates('U_Estilo')
-                
-                # Asegurar tipo compatible
-                df_fb['U_Estilo'] = df_fb['U_Estilo'].astype(str)
-                df_db_estilo['U_Estilo'] = df_db_estilo['U_Estilo'].astype(str)
-                
-                # Primer merge por U_Estilo
-                df_fb = pd.merge(df_fb, df_db_estilo, on='U_Estilo', how='left', suffixes=('', '_ref'))
-                
-                # Completar valores faltantes con los de referencia
-                for col in df_db_estilo.columns:
-                    if col != 'U_Estilo' and f'{col}_ref' in df_fb.columns:
-                        df_fb[col] = df_fb[col].fillna(df_fb[f'{col}_ref'])
-                        df_fb.drop(columns=[f'{col}_ref'], inplace=True)
-            
-            # Segundo merge por U_Estilo_Color para obtener U_Division
-            if 'U_Estilo_Color' in df_db.columns and 'U_Division' in df_db.columns:
-                df_db_division = df_db[['U_Estilo_Color', 'U_Division']].drop_duplicates('U_Estilo_Color')
-                
-                # Asegurar tipo compatible
-                df_fb['U_Estilo_Color'] = df_fb['U_Estilo_Color'].astype(str)
-                df_db_division['U_Estilo_Color'] = df_db_division['U_Estilo_Color'].astype(str)
-                
-                # Merge para U_Division
-                df_fb = pd.merge(df_fb, df_db_division, on='U_Estilo_Color', how='left', suffixes=('', '_div'))
-                
-                # Completar U_Division si existe una columna duplicada
-                if 'U_Division_div' in df_fb.columns:
-                    df_fb['U_Division'] = df_fb['U_Division'].fillna(df_fb['U_Division_div'])
-                    df_fb.drop(columns=['U_Division_div'], inplace=True)
-        
-        # 5. Reordenar columnas según el orden esperado
-        column_order = ['ItemName', 'ItemCode', 'Empresa', 'U_Estilo', 'U_Estilo_Color', 
-                       'U_Descripcion', 'U_Descrip_Color', 'U_Talla', 'U_Genero', 'U_Segmento', 
-                       'U_Prenda', 'U_Subprenda', 'U_Categoria', 'U_Division']
-        
-        # Seleccionar solo las columnas que existen en el DataFrame
-        existing_columns = [col for col in column_order if col in df_fb.columns]
-        df_fb = df_fb[existing_columns]
-        
-        # Mostrar estadísticas de limpieza
-        total_rows = len(df_fb)
-        completed_rows = len(df_fb[df_fb['U_Genero'].notna() | df_fb['U_Segmento'].notna() | 
-                                   df_fb['U_Prenda'].notna() | df_fb['U_Categoria'].notna()])
-        
-        st.success(f"Fabletics: Se completaron {completed_rows} de {total_rows} filas con datos de MongoDB")
-        
-        return df_fb
 
-    def _clean_psycho_bunny(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Proceso de limpieza para Psycho Bunny optimizado"""
-        # Trabajamos sobre una copia para no afectar el original
-        df_trabajo = df.copy()
+def _comparte_datos(serie: pd.Series, original: pd.Series) -> bool:
+    """Indica si una columna del resultado sigue usando los datos de la columna de entrada"""
+    if serie.array is original.array:
+        return True
+    if isinstance(serie.dtype, np.dtype) and isinstance(original.dtype, np.dtype):
+        return np.may_share_memory(serie.to_numpy(), original.to_numpy())
+    return False
 
-        # 1. Obtener DataFrames de referencia de MongoDB
-        df_pb = self._get_reference_dataframe("PB")
+def _sin_datos_compartidos(resultado: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copia las columnas del resultado que comparten datos con el DataFrame de entrada
 
-        if df_pb.empty:
-            st.warning("No se encontró el DataFrame de referencia para Psycho Bunny")
-            return df_trabajo
+    Fuera del contexto de copy-on-write, una columna compartida que se modifica en el
+    resultado (resultado.loc[0, 'Qty'] = 99) cambiaría también la entrada. Solo se copian las
+    columnas que la limpieza no tocó; las que ya calculó son datos nuevos.
+    """
+    compartidas = [col for col in resultado.columns
+                   if col in df.columns and _comparte_datos(resultado[col], df[col])]
+    for col in compartidas:
+        resultado[col] = resultado[col].copy()
+    return resultado
 
-        # 2. Extracción eficiente de datos desde ItemName
-        # Asumimos estructura: ESTILO / DESCRIPCION / TALLA / COLOR
-        # Usamos expand=True para hacerlo en una sola pasada
-        split_data = df_trabajo['ItemName'].str.split('/', n=3, expand=True)
-        
-        # Asignamos las columnas si existen en el split, si no quedan como NaN
-        if len(split_data.columns) > 0: df_trabajo['U_Estilo'] = split_data[0]
-        if len(split_data.columns) > 1: df_trabajo['U_Descripcion'] = split_data[1]
-        if len(split_data.columns) > 2: df_trabajo['U_Talla'] = split_data[2]
-        if len(split_data.columns) > 3: df_trabajo['U_Descrip_Color'] = split_data[3]
-
-        # Limpieza específica de Descripción
-        df_trabajo['U_Descripcion'] = df_trabajo['U_Descripcion'].str.replace(
-            r'(?i)americana\s*\d+(?:\.\d+)?', '', regex=True
-        ).str.strip()
-
-        # 3. Preparar Reference Data (MongoDB)
-        # Nos aseguramos de tener columnas únicas para el merge
-        cols_interes = ['U_Genero', 'U_Prenda', 'U_Subprenda', 'U_Temporalidad']
-        available_cols = [c for c in cols_interes if c in df_pb.columns]
-        
-        if 'U_Estilo' in df_pb.columns:
-            # Crear un maestro de estilos únicos
-            df_ref = df_pb[['U_Estilo'] + available_cols].drop_duplicates(subset=['U_Estilo'])
-            
-            # Asegurar tipos de datos para el cruce (String vs String)
-            df_trabajo['U_Estilo'] = df_trabajo['U_Estilo'].astype(str).str.strip()
-            df_ref['U_Estilo'] = df_ref['U_Estilo'].astype(str).str.strip()
-
-            # 4. MERGE ÚNICO (Más eficiente que separar válidos/inválidos)
-            # Hacemos un Left Join: Mantenemos todas las filas de df_trabajo y traemos datos de df_ref
-            df_merged = pd.merge(
-                df_trabajo,
-                df_ref,
-                on='U_Estilo',
-                how='left',
-                suffixes=('', '_mongo')
-            )
-
-            # 5. Rellenar huecos (Fillna)
-            # Si la columna original está vacía, usa la que vino de Mongo
-            for col in available_cols:
-                col_mongo = f"{col}_mongo"
-                if col_mongo in df_merged.columns:
-                    # Prioridad: Dato existente > Dato de Mongo
-                    if col not in df_merged.columns:
-                        df_merged[col] = df_merged[col_mongo]
-                    else:
-                        df_merged[col] = df_merged[col].fillna(df_merged[col_mongo])
-                    
-                    # Eliminamos la columna auxiliar
-                    df_merged.drop(columns=[col_mongo], inplace=True)
-            
-            df_final = df_merged
-        else:
-            st.error("La colección de MongoDB no tiene el campo clave 'U_Estilo'")
-            df_final = df_trabajo
+def _process_context():
+    """
+    Contexto de multiprocessing del modo paralelo
 
-        # 6. Métricas finales
-        total_rows = len(df_final)
-        # Contamos cuántos tienen dato en al menos una columna clave
-        completeness = df_final[available_cols].notna().any(axis=1).sum()
-        
-        st.success(f"Psycho Bunny: Se enriquecieron {completeness} filas usando {len(df_ref)} estilos de referencia.")
+    Nunca se usa fork directo desde la app: heredaría los hilos de Streamlit y del cliente de
+    MongoDB. Con forkserver los procesos salen de un servidor limpio que ya tiene importado
+    este módulo (arrancar cada proceso es barato); donde no existe, se usa spawn.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        contexto = multiprocessing.get_context("forkserver")
+        contexto.set_forkserver_preload([__name__])
+        return contexto
+    return multiprocessing.get_context("spawn")
 
-        return df_final
+# Cleaner de cada proceso del modo paralelo (se crea una vez por proceso en _init_worker)
+_worker_cleaner: Optional[DataCleaner] = None
 
-    def _clean_generic_brand(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Proceso de limpieza genérico para marcas sin proceso específico (Birkenstock, Psycho Bunny, Adolfo)"""
-        cleaned_df = df.copy()
-        
-        # Obtener DataFrame de referencia de MongoDB
-        df_reference = self._get_reference_dataframe(self.brand)
-        
-        # Extraer información básica del ItemName
-        cleaned_df['U_Estilo'] = cleaned_df['ItemName'].str.split('/').str[0]
-        cleaned_df['U_Descripcion'] = cleaned_df['ItemName'].str.split('/').str[1]
-        
-        # Si hay datos de referencia, completar información faltante
-        if not df_reference.empty:
-            # Seleccionar solo las columnas necesarias del DataFrame de referencia
-            ref_columns = ['U_Estilo', 'U_Genero', 'U_Categoria']
-            ref_columns = [col for col in ref_columns if col in df_reference.columns]
-            
-            df_reference = df_reference[ref_columns].drop_duplicates('U_Estilo')
-            
-            # Realizar el merge para completar información
-            cleaned_df = pd.merge(
-                cleaned_df,
-                df_reference,
-                on='U_Estilo',
-                how='left',
-                suffixes=('', '_ref')
-            )
-            
-            # Completar columnas faltantes
-            if 'U_Genero_ref' in cleaned_df.columns:
-                cleaned_df['U_Genero'] = cleaned_df['U_Genero'].fillna(cleaned_df['U_Genero_ref'])
-                cleaned_df.drop('U_Genero_ref', axis=1, inplace=True)
-            
-            if 'U_Categoria_ref' in cleaned_df.columns:
-                cleaned_df['U_Categoria'] = cleaned_df['U_Categoria'].fillna(cleaned_df['U_Categoria_ref'])
-                cleaned_df.drop('U_Categoria_ref', axis=1, inplace=True)
-        
-        return cleaned_df
\ No newline at end of file
+def _init_worker(brand: str, brand_configs: dict, referencia: Optional[str], compact_output: bool = True,
+                 engine: str = "pandas"):
+    """Inicializa un proceso del pool con la configuración y la referencia publicada"""
+    global _worker_cleaner
+    _worker_cleaner = DataCleaner(brand, {}, engine=engine)
+    _worker_cleaner.brand_configs = brand_configs
+    _worker_cleaner.show_messages = False
+    _worker_cleaner.compact_output = compact_output
+    if referencia is not None:
+        _worker_cleaner.prepared_indices[brand] = ReferenceIndex.abrir(referencia)
+
+def _clean_partition(df: pd.DataFrame) -> pd.DataFrame:
+    """Limpia una partición en un proceso del pool"""
+    return _worker_cleaner.clean_data(df)
@@ -0,0 +1,88 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import bson
+
+# Cada cuántos documentos se codifica uno en BSON para estimar el volumen transferido
+MUESTREO_BYTES = 100
+
+class ExtractionMetrics:
+    """Tiempos por fase, volumen y throughput de la extracción de una colección.
+
+    Fases que registra el extractor:
+        conexion: obtener el cliente y hacer un ping (conexión y handshake con el servidor)
+        consulta: enviar la consulta y recibir el primer lote
+        lectura: drenar el resto del cursor (red + decodificación BSON)
+        construccion: construir el DataFrame a partir de las columnas
+    """
+
+    FASES = ("conexion", "consulta", "lectura", "construccion")
+
+    def __init__(self, coleccion: str, modo: str = "completa"):
+        """
+        Args:
+            coleccion: Nombre de la colección extraída
+            modo: Tipo de extracción (completa, filtrada, unicos, por_claves)
+        """
+        self.coleccion = coleccion
+        self.modo = modo
+        self.fecha = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.fases: Dict[str, float] = {}
+        self.documentos = 0
+        self.bytes_aprox = 0
+        self.error: Optional[str] = None
+        self._bytes_muestra = 0
+        self._documentos_muestra = 0
+
+    @contextmanager
+    def fase(self, nombre: str):
+        """Mide la duración de un bloque y la acumula en la fase indicada"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nombre] = self.fases.get(nombre, 0.0) + time.perf_counter() - inicio
+
+    def registrar_documento(self, documento: dict):
+        """Cuenta un documento y, uno de cada MUESTREO_BYTES, estima su tamaño en BSON"""
+        if self.documentos % MUESTREO_BYTES == 0:
+            try:
+                self._bytes_muestra += len(bson.encode(documento))
+                self._documentos_muestra += 1
+            except Exception:
+                pass
+        self.documentos += 1
+
+    def cerrar(self):
+        """Extrapola el volumen total a partir de la muestra"""
+        if self._documentos_muestra:
+            self.bytes_aprox = int(self._bytes_muestra / self._documentos_muestra * self.documentos)
+
+    @property
+    def total_segundos(self) -> float:
+        return sum(self.fases.values())
+
+    @property
+    def documentos_por_segundo(self) -> float:
+        return self.documentos / self.total_segundos if self.total_segundos else 0.0
+
+    def como_dict(self) -> dict:
+        """Devuelve las métricas como un registro plano (una fila de la tabla de métricas)"""
+        registro = {"coleccion": self.coleccion, "modo": self.modo, "fecha": self.fecha}
+        for fase in self.FASES:
+            registro[f"{fase}_s"] = round(self.fases.get(fase, 0.0), 4)
+        registro.update({
+            "total_s": round(self.total_segundos, 4),
+            "documentos": self.documentos,
+            "docs_por_s": round(self.documentos_por_segundo, 1),
+            "mb_aprox": round(self.bytes_aprox / 1_048_576, 2),
+            "error": self.error,
+        })
+        return registro
+
+    def __str__(self) -> str:
+        fases = ", ".join(f"{fase}={self.fases.get(fase, 0.0):.3f}s" for fase in self.FASES)
+        return (f"Extracción '{self.coleccion}' ({self.modo}): {self.documentos} documentos en "
+                f"{self.total_segundos:.3f}s ({self.documentos_por_segundo:.0f} docs/s, "
+                f"~{self.bytes_aprox / 1_048_576:.2f} MB) [{fases}]")
@@ -56,6 +56,52 @@ class FileHandler:
                     df = pd.read_csv(uploaded_file, encoding='utf-8')
                     return df
     
+    def read_file_chunks(self, file, chunksize=100_000):
+        """
+        Lee un archivo por bloques de filas, sin cargarlo entero en memoria
+
+        Pensado para DataCleaner.clean_data_chunks. Los CSV se leen en streaming; los Excel
+        no admiten lectura parcial, así que se leen completos y se entregan por bloques.
+
+        Args:
+            file: Ruta del archivo o archivo subido a través de Streamlit
+            chunksize: Filas por bloque
+
+        Yields:
+            pd.DataFrame: Bloques consecutivos del archivo
+        """
+        nombre = file if isinstance(file, str) else file.name
+        file_extension = nombre.split('.')[-1].lower()
+        if file_extension in ['xlsx', 'xls']:
+            df = self._read_excel(file)
+            for inicio in range(0, len(df), chunksize):
+                yield df.iloc[inicio:inicio + chunksize]
+            return
+        if file_extension != 'csv':
+            raise ValueError(f"Formato de archivo no soportado: {file_extension}")
+
+        # El delimitador y la codificación se detectan con el inicio del archivo
+        # (mismo orden de preferencia que _read_csv: ';' antes que ',', utf-8 antes que latin-1)
+        if isinstance(file, str):
+            with open(file, 'rb') as f:
+                inicio = f.read(65536)
+        else:
+            inicio = file.read(65536)
+            file.seek(0)
+        try:
+            inicio.decode('utf-8')
+            encoding = 'utf-8'
+        except UnicodeDecodeError as e:
+            # Un corte en mitad de un carácter al final de la muestra no cuenta como error
+            encoding = 'utf-8' if e.start >= len(inicio) - 3 else 'latin-1'
+        cabecera = inicio.decode(encoding, errors='ignore').splitlines()[0] if inicio else ''
+        delimiter = ';' if ';' in cabecera else ','
+
+        # Los tipos se infieren en cada bloque: un bloque con ItemName o ItemCode en blanco los
+        # leería como float. Se leen siempre como texto para que todos los bloques coincidan
+        yield from pd.read_csv(file, delimiter=delimiter, encoding=encoding, chunksize=chunksize,
+                               dtype={'ItemName': str, 'ItemCode': str})
+    
     def _read_excel(self, uploaded_file):
         """Lee un archivo Excel"""
         try:
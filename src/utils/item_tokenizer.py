@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from functools import cached_property
+
+class ItemNameTokens:
+    """Tokens del ItemName, calculados una sola vez y compartidos por los cleaners.
+
+    El formato habitual es ESTILO/DESCRIPCION/TALLA/COLOR. El ItemName se divide por '/'
+    una única vez (y por '-' solo si algún cleaner pide el estilo-color). Cada token se
+    comporta igual que ItemName.str.split(sep).str[i]: NaN si el ItemName es nulo o no
+    tiene esa parte.
+    """
+
+    # Partes por '/' que se separan; lo que sigue a la última queda en 'resto'
+    PARTES = 4
+
+    def __init__(self, item_names: pd.Series):
+        """
+        Args:
+            item_names: Columna ItemName del archivo a limpiar
+        """
+        self.item_names = item_names
+
+    @staticmethod
+    def _dividir(item_names: pd.Series, separador: str, n: int) -> pd.DataFrame:
+        """Divide una sola vez en n + 1 columnas, con NaN donde no hay parte"""
+        partes = item_names.str.split(separador, n=n, expand=True)
+        # Las partes que no aparecen en ningún ItemName quedan como texto nulo (no float)
+        partes = partes.reindex(columns=range(n + 1)).astype(object)
+        return partes.where(partes.notna(), np.nan)
+
+    @cached_property
+    def _partes(self) -> pd.DataFrame:
+        return self._dividir(self.item_names, '/', self.PARTES)
+
+    @cached_property
+    def _partes_guion(self) -> pd.DataFrame:
+        return self._dividir(self.item_names, '-', 2)
+
+    @property
+    def estilo(self) -> pd.Series:
+        return self._partes[0]
+
+    @property
+    def descripcion(self) -> pd.Series:
+        return self._partes[1]
+
+    @property
+    def talla(self) -> pd.Series:
+        return self._partes[2]
+
+    @property
+    def color(self) -> pd.Series:
+        return self._partes[3]
+
+    @cached_property
+    def color_resto(self) -> pd.Series:
+        """Color junto con lo que sigue tras él (equivale a split('/', n=3).str[3])"""
+        resto = self._partes[self.PARTES]
+        return self.color.where(resto.isna(), self.color + '/' + resto)
+
+    @property
+    def estilo_guion(self) -> pd.Series:
+        """Estilo cuando el separador es '-' (Fabletics)"""
+        return self._partes_guion[0]
+
+    @cached_property
+    def estilo_color(self) -> pd.Series:
+        """Dos primeras partes por '-' unidas con '-' (estilo-color de Fabletics)"""
+        estilo, color = self._partes_guion[0], self._partes_guion[1]
+        return estilo.where(color.isna(), estilo + '-' + color)
+
+    @cached_property
+    def tiene_slash(self) -> pd.Series:
+        """El ItemName tiene al menos un '/' (False si es nulo)"""
+        return self._partes[1].notna()
+
+    @cached_property
+    def estilo_valido(self) -> pd.Series:
+        """El estilo tiene al menos 2 caracteres y empieza por un carácter alfanumérico"""
+        # Cada estilo se repite en muchos SKUs: se valida una vez por estilo distinto
+        codigos, estilos = pd.factorize(self.estilo, use_na_sentinel=False)
+        estilos = pd.Series(estilos, dtype=object)
+        validos = (estilos.str.len() >= 2) & estilos.str[0].str.isalnum().eq(True)
+        return pd.Series(validos.to_numpy()[codigos], index=self.estilo.index)
+
+    def estilos(self, separador: str = '/') -> pd.Series:
+        """Estilo según el separador de la marca ('/' o '-')"""
+        return self.estilo_guion if separador == '-' else self.estilo
+
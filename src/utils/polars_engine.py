@@ -0,0 +1,477 @@
+import weakref
+from functools import cached_property
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import polars as pl
+except ImportError as e:
+    raise ImportError("El motor 'polars' necesita el paquete polars (pip install polars)") from e
+
+from utils.arrow_io import es_nativa
+from utils.brand_rules import BrandPlan, TEAM_LICENSES_PATH, load_team_licenses
+from utils.item_tokenizer import ItemNameTokens
+from utils.reference_index import ReferenceIndex
+
+# Primer carácter alfanumérico (letra o número Unicode, como str.isalnum)
+PATRON_ALFANUMERICO = r'^[\p{L}\p{N}]'
+
+def _serie_polars(nombre: str, valores: pd.Series) -> pl.Series:
+    """
+    Columna de pandas a polars sin cambiar sus valores
+
+    Las columnas que Arrow representa tal cual (ver es_nativa) pasan por Arrow; las de tipos
+    mezclados (un estilo unas veces número y otras texto) quedan como pl.Object con los mismos
+    objetos de Python, así que 1 sigue siendo 1 y no '1'.
+    """
+    if es_nativa(valores):
+        return pl.from_arrow(pa.array(valores, from_pandas=True)).alias(nombre)
+    return pl.Series(nombre, valores.tolist(), dtype=pl.Object)
+
+def _a_polars(df: pd.DataFrame) -> pl.DataFrame:
+    """DataFrame de pandas a polars, columna a columna (ver _serie_polars)"""
+    return pl.DataFrame([_serie_polars(columna, df[columna]) for columna in df.columns])
+
+def _valores(serie: pl.Series) -> pd.Series:
+    """Columna de polars a pandas (una columna pl.Object devuelve sus objetos de Python)"""
+    if serie.dtype == pl.Object:
+        return pd.Series(serie.to_list(), dtype=object)
+    return serie.to_pandas()
+
+def _solo_texto(valores) -> pl.Series:
+    """Los valores que son texto; el resto (nulos, números...) queda nulo, como con .str de pandas"""
+    return pl.Series([valor if isinstance(valor, str) else None for valor in valores], dtype=pl.String)
+
+def _rellenar(actual: pl.Series, valores: pl.Series) -> pl.Series:
+    """
+    Equivale a actual.fillna(valores) de pandas
+
+    Con el mismo tipo (o sobre una columna vacía recién creada) se combina en polars. Con tipos
+    distintos o mezclados se combina en pandas: coalesce buscaría un supertipo y convertiría
+    los números de la referencia en texto. Sin filas no hay nada que rellenar y la columna
+    conserva su tipo, como fillna en pandas.
+    """
+    if len(actual) == 0:
+        return actual
+    vacia = actual.dtype == pl.Float64 and actual.null_count() == len(actual) and valores.dtype == pl.String
+    if pl.Object not in (actual.dtype, valores.dtype) and (actual.dtype == valores.dtype or vacia):
+        return pl.select(pl.coalesce(pl.lit(actual), pl.lit(valores))).to_series().alias(actual.name)
+    return _serie_polars(actual.name, _valores(actual).fillna(_valores(valores)))
+
+class PolarsTokens:
+    """Tokens del ItemName calculados con polars (mismas partes que ItemNameTokens).
+
+    Cada token es una pl.Series con nulo donde el ItemName es nulo o no tiene esa parte.
+    """
+
+    PARTES = ItemNameTokens.PARTES
+
+    def __init__(self, item_names: pd.Series):
+        """
+        Args:
+            item_names: Columna ItemName del archivo a limpiar
+        """
+        serie = _serie_polars(item_names.name, item_names)
+        self.item_names = _solo_texto(serie) if serie.dtype == pl.Object else serie.cast(pl.String)
+
+    def _dividir(self, separador: str, n: int) -> pl.DataFrame:
+        """Divide una sola vez en n + 1 columnas (field_0...), con nulo donde no hay parte"""
+        return self.item_names.str.splitn(separador, n + 1).struct.unnest()
+
+    @cached_property
+    def _partes(self) -> pl.DataFrame:
+        return self._dividir('/', self.PARTES)
+
+    @cached_property
+    def _partes_guion(self) -> pl.DataFrame:
+        return self._dividir('-', 2)
+
+    @property
+    def estilo(self) -> pl.Series:
+        return self._partes["field_0"]
+
+    @property
+    def descripcion(self) -> pl.Series:
+        return self._partes["field_1"]
+
+    @property
+    def talla(self) -> pl.Series:
+        return self._partes["field_2"]
+
+    @property
+    def color(self) -> pl.Series:
+        return self._partes["field_3"]
+
+    @cached_property
+    def color_resto(self) -> pl.Series:
+        """Color junto con lo que sigue tras él"""
+        resto = pl.col(f"field_{self.PARTES}")
+        return self._partes.select(
+            pl.when(resto.is_null()).then(pl.col("field_3"))
+            .otherwise(pl.concat_str([pl.col("field_3"), resto], separator='/'))
+        ).to_series()
+
+    @property
+    def estilo_guion(self) -> pl.Series:
+        return self._partes_guion["field_0"]
+
+    @cached_property
+    def estilo_color(self) -> pl.Series:
+        """Dos primeras partes por '-' unidas con '-'"""
+        estilo, color = pl.col("field_0"), pl.col("field_1")
+        return self._partes_guion.select(
+            pl.when(color.is_null()).then(estilo).otherwise(pl.concat_str([estilo, color], separator='-'))
+        ).to_series()
+
+    @cached_property
+    def tiene_slash(self) -> pl.Series:
+        return self._partes["field_1"].is_not_null()
+
+    @cached_property
+    def estilo_valido(self) -> pl.Series:
+        estilo = self.estilo
+        return ((estilo.str.len_chars() >= 2) & estilo.str.contains(PATRON_ALFANUMERICO)).fill_null(False)
+
+    def estilos(self, separador: str = '/') -> pd.Series:
+        """Estilo según el separador de la marca, como pandas (para consultar la referencia)"""
+        estilos = self.estilo_guion if separador == '-' else self.estilo
+        return estilos.to_pandas().where(lambda serie: serie.notna(), np.nan)
+
+class EjecucionPolars:
+    """Estado de una limpieza con polars: tokens, referencia, máscaras y columnas escritas"""
+
+    def __init__(self, plan: "PolarsPlan", tokens: PolarsTokens, indice: Optional[ReferenceIndex],
+                 notify: Callable[[str, str], None]):
+        self.plan = plan
+        self.tokens = tokens
+        self.indice = indice
+        self.notify = notify
+        # Columnas que escribe el plan; el resto se devuelven tal como llegaron
+        self.escritas: Set[str] = set()
+        self._mascaras: Dict[str, pl.Series] = {}
+
+    def mascara(self, nombre: Optional[str]) -> Optional[pl.Series]:
+        """Máscara booleana por nombre ('~nombre' la niega); None si el paso aplica a todas las filas"""
+        if nombre is None:
+            return None
+        negada = nombre.startswith("~")
+        nombre = nombre.lstrip("~")
+        if nombre not in self._mascaras:
+            condiciones = [getattr(self.tokens, token) for token in self.plan.mascaras[nombre]]
+            mascara = condiciones[0]
+            for condicion in condiciones[1:]:
+                mascara = mascara & condicion
+            self._mascaras[nombre] = mascara.fill_null(False)
+        return ~self._mascaras[nombre] if negada else self._mascaras[nombre]
+
+    def escribir(self, pf: pl.DataFrame, columnas: Dict[str, pl.Expr]) -> pl.DataFrame:
+        """Asigna columnas (nuevas al final, existentes en su sitio, como en pandas)"""
+        self.escritas.update(columnas)
+        return pf.with_columns(**columnas)
+
+def _valor(pf: pl.DataFrame, columna: str) -> pl.Expr:
+    """La columna si existe; si no, nula (como la columna NaN que crearía pandas)"""
+    return pl.col(columna) if columna in pf.columns else pl.lit(None, dtype=pl.Float64)
+
+def _con_mascara(pf: pl.DataFrame, columna: str, valores: pl.Expr, mascara: Optional[pl.Series]) -> pl.Expr:
+    """Los valores en las filas de la máscara y lo que ya había en el resto"""
+    if mascara is None:
+        return valores
+    return pl.when(pl.lit(mascara)).then(valores).otherwise(_valor(pf, columna))
+
+def _texto(valores: pl.Expr) -> pl.Expr:
+    """Como astype(str) de pandas sobre un token: los nulos pasan a 'nan'"""
+    return valores.cast(pl.String).fill_null('nan')
+
+# Compiladores de pasos con polars: misma definición que en brand_rules, misma semántica.
+
+def _compilar_tokens(paso: dict):
+    asignaciones = dict(paso["columns"])
+    si_falta = paso.get("if_missing", False)
+    donde = paso.get("where")
+
+    def ejecutar(pf, ejecucion):
+        mascara = ejecucion.mascara(donde)
+        columnas = {}
+        for columna, token in asignaciones.items():
+            if si_falta and columna in pf.columns:
+                continue
+            columnas[columna] = _con_mascara(pf, columna, pl.lit(getattr(ejecucion.tokens, token)), mascara)
+        return ejecucion.escribir(pf, columnas)
+    return ejecutar
+
+def _compilar_init(paso: dict):
+    columnas = list(paso["columns"])
+
+    def ejecutar(pf, ejecucion):
+        return ejecucion.escribir(pf, {columna: pl.lit(None, dtype=pl.Float64)
+                                       for columna in columnas if columna not in pf.columns})
+    return ejecutar
+
+def _compilar_prefix(paso: dict):
+    origen, destino = paso["source"], paso["column"]
+    reglas = [([prefijo] if isinstance(prefijo, str) else list(prefijo), valor) for prefijo, valor in paso["rules"]]
+    defecto = paso.get("default", "")
+
+    def ejecutar(pf, ejecucion):
+        if pf.schema[origen] == pl.Object:
+            texto = pl.lit(_solo_texto(pf[origen]))
+        else:
+            texto = pl.col(origen).cast(pl.String)
+        expresion = None
+        for prefijos, valor in reglas:
+            condicion = pl.any_horizontal([texto.str.starts_with(prefijo) for prefijo in prefijos])
+            expresion = (pl.when(condicion) if expresion is None else expresion.when(condicion)).then(pl.lit(valor))
+        return ejecucion.escribir(pf, {destino: expresion.otherwise(pl.lit(defecto))})
+    return ejecutar
+
+def _compilar_map(paso: dict):
+    origen, destino = paso["source"], paso["column"]
+    tabla = dict(paso["values"])
+    defecto = paso.get("default", "")
+
+    def ejecutar(pf, ejecucion):
+        valores = pl.col(origen).replace_strict(tabla, default=None, return_dtype=pl.String)
+        return ejecucion.escribir(pf, {destino: valores.fill_null(defecto)})
+    return ejecutar
+
+def _compilar_copy(paso: dict):
+    origen, destino = paso["source"], paso["column"]
+
+    def ejecutar(pf, ejecucion):
+        return ejecucion.escribir(pf, {destino: pl.col(origen)})
+    return ejecutar
+
+def _compilar_text(paso: dict):
+    columna = paso["column"]
+    relleno = paso.get("fillna")
+
+    def ejecutar(pf, ejecucion):
+        if pf.schema[columna] == pl.Object:
+            valores = _valores(pf[columna])
+            valores = valores if relleno is None else valores.fillna(relleno)
+            return ejecucion.escribir(pf, {columna: _solo_texto(valores.astype(str))})
+        valores = pl.col(columna) if relleno is None else pl.col(columna).cast(pl.String).fill_null(relleno)
+        return ejecucion.escribir(pf, {columna: _texto(valores)})
+    return ejecutar
+
+def _compilar_split(paso: dict):
+    origen, destino = paso["source"], paso["column"]
+    separador, posicion = paso["sep"], paso["index"]
+
+    def ejecutar(pf, ejecucion):
+        partes = pf.select(pl.col(origen).str.split(separador).list.get(posicion, null_on_oob=True)).to_series()
+        # Como .str[i] de pandas: si ningún valor tiene esa parte, la columna es numérica (NaN)
+        if len(partes) and partes.null_count() == len(partes):
+            partes = partes.cast(pl.Float64)
+        return ejecucion.escribir(pf, {destino: partes})
+    return ejecutar
+
+def _compilar_null(paso: dict):
+    columna, donde = paso["column"], paso["where"]
+
+    def ejecutar(pf, ejecucion):
+        mascara = pl.lit(ejecucion.mascara(donde))
+        return ejecucion.escribir(pf, {columna: pl.when(mascara).then(None).otherwise(pl.col(columna))})
+    return ejecutar
+
+def _compilar_replace(paso: dict):
+    columna = paso["column"]
+    patron = paso["pattern"]
+    reemplazo = paso.get("repl", "")
+    quitar_espacios = paso.get("strip", False)
+    donde = paso.get("where")
+
+    def ejecutar(pf, ejecucion):
+        valores = pl.col(columna).str.replace_all(patron, reemplazo)
+        if quitar_espacios:
+            valores = valores.str.strip_chars()
+        return ejecucion.escribir(pf, {columna: _con_mascara(pf, columna, valores, ejecucion.mascara(donde))})
+    return ejecutar
+
+# Tablas de cada referencia ya convertidas a polars (se liberan con la referencia)
+_tablas_polars: "weakref.WeakKeyDictionary[ReferenceIndex, Dict[str, pl.DataFrame]]" = weakref.WeakKeyDictionary()
+
+def _tabla_polars(indice: ReferenceIndex, clave: str) -> pl.DataFrame:
+    """Tabla de la clave con la clave normalizada como columna (se convierte una sola vez)"""
+    tablas = _tablas_polars.setdefault(indice, {})
+    if clave not in tablas:
+        tabla = _a_polars(indice.tabla(clave).reset_index())
+        tablas[clave] = tabla.with_columns(pl.col(clave).cast(pl.String))
+    return tablas[clave]
+
+def buscar_cascada(pf: pl.DataFrame, indice: ReferenceIndex,
+                   niveles: List[Tuple[str, List[str]]]) -> pl.DataFrame:
+    """
+    Equivale a ReferenceIndex.buscar_cascada: un left join por nivel contra la tabla de su clave
+
+    Returns:
+        pl.DataFrame: Una fila por fila de pf con las columnas de todos los niveles
+    """
+    resultado = None
+    for clave, columnas in niveles:
+        claves = pf.get_column(clave)
+        if claves.dtype == pl.Object:
+            claves = _solo_texto(indice.normalizar(_valores(claves)))
+        else:
+            claves = claves.cast(pl.String)
+            if indice.quitar_espacios:
+                claves = claves.str.strip_chars()
+        # Los nulos no cruzan (tampoco se indexan en la referencia)
+        encontrado = (pl.DataFrame({"__clave": claves})
+                      .join(_tabla_polars(indice, clave).select([clave] + columnas),
+                            left_on="__clave", right_on=clave, how="left", maintain_order="left")
+                      .drop("__clave"))
+        if resultado is None:
+            resultado = encontrado
+            continue
+        resultado = resultado.with_columns(
+            [_rellenar(resultado[col], encontrado[col]) for col in encontrado.columns if col in resultado.columns]
+            + [encontrado[col] for col in encontrado.columns if col not in resultado.columns])
+    return resultado
+
+def _compilar_cascade(paso: dict):
+    niveles = [{
+        "clave": nivel["key"],
+        "columnas": list(nivel["columns"]),
+        "solo_nuevas": nivel.get("only_new", paso.get("only_new", False)),
+        "opcional": nivel.get("optional", paso.get("optional", False)),
+        "como_texto": nivel.get("key_as_text", paso.get("key_as_text", False)),
+        "quitar_espacios": nivel.get("strip_key", paso.get("strip_key", False)),
+    } for nivel in paso["levels"]]
+    reemplazar = paso.get("replace", False)
+    descartar = [col for nivel in niveles for col in nivel["columnas"]]
+
+    def ejecutar(pf, ejecucion):
+        indice = ejecucion.indice
+        if indice is None or indice.empty:
+            return pf
+        faltantes = [nivel for nivel in niveles if not indice.tiene_clave(nivel["clave"])]
+        for nivel in faltantes:
+            if not nivel["opcional"]:
+                ejecucion.notify("error", f"La colección de MongoDB no tiene el campo clave '{nivel['clave']}'")
+                return pf
+        if reemplazar:
+            pf = pf.drop([col for col in descartar if col in pf.columns])
+
+        cruces = []
+        for nivel in niveles:
+            if nivel in faltantes:
+                continue
+            disponibles = [col for col in nivel["columnas"] if col in indice.columnas]
+            if nivel["solo_nuevas"]:
+                disponibles = [col for col in disponibles if col not in pf.columns]
+            if not disponibles:
+                continue
+            clave = nivel["clave"]
+            if nivel["como_texto"]:
+                if pf.schema[clave] == pl.Object:
+                    valores = _solo_texto(_valores(pf[clave]).astype(str))
+                else:
+                    valores = _texto(pl.col(clave))
+                if nivel["quitar_espacios"]:
+                    valores = valores.str.strip_chars()
+                pf = ejecucion.escribir(pf, {clave: valores})
+            cruces.append((clave, disponibles))
+        if not cruces:
+            return pf
+
+        referencia = buscar_cascada(pf, indice, cruces)
+        return ejecucion.escribir(pf, {
+            col: _rellenar(pf[col], referencia[col]) if col in pf.columns else referencia[col]
+            for col in referencia.columns
+        })
+    return ejecutar
+
+def _compilar_lookup(paso: dict):
+    return _compilar_cascade({**paso, "levels": [paso]})
+
+def _compilar_licenses(paso: dict):
+    origen, destino = paso["source"], paso["column"]
+    ruta = paso.get("path", TEAM_LICENSES_PATH)
+
+    def ejecutar(pf, ejecucion):
+        if pf.height == 0:
+            # Sin filas, mask de pandas conserva el tipo de la columna: no se mezcla con el texto
+            return pf
+        tabla = load_team_licenses(ruta)
+        if pl.Object in (pf.schema[origen], pf.schema[destino]):
+            # Tipos mezclados: la misma regla que en brand_rules, con pandas
+            actual, ligas = _valores(pf[destino]), _valores(pf[origen]).map(tabla)
+            en_blanco = actual.isna() | (actual == '')
+            return ejecucion.escribir(pf, {destino: _serie_polars(destino, actual.mask(en_blanco & ligas.notna(), ligas))})
+        ligas = pl.col(origen).cast(pl.String).replace_strict(tabla, default=None, return_dtype=pl.String)
+        en_blanco = pl.col(destino).is_null()
+        if pf.schema[destino] == pl.String:
+            en_blanco = en_blanco | (pl.col(destino) == '')
+        return ejecucion.escribir(pf, {
+            destino: pl.when(en_blanco & ligas.is_not_null()).then(ligas).otherwise(pl.col(destino))
+        })
+    return ejecutar
+
+def _compilar_order(paso: dict):
+    columnas = list(paso["columns"])
+    crear = paso.get("reindex", False)
+
+    def ejecutar(pf, ejecucion):
+        if crear:
+            ejecucion.escritas.update(col for col in columnas if col not in pf.columns)
+            return pf.select([pl.col(col) if col in pf.columns else pl.lit(None, dtype=pl.Float64).alias(col)
+                              for col in columnas])
+        return pf.select([col for col in columnas if col in pf.columns])
+    return ejecutar
+
+COMPILADORES_POLARS = {
+    "tokens": _compilar_tokens,
+    "init": _compilar_init,
+    "prefix": _compilar_prefix,
+    "map": _compilar_map,
+    "copy": _compilar_copy,
+    "text": _compilar_text,
+    "split": _compilar_split,
+    "null": _compilar_null,
+    "replace": _compilar_replace,
+    "lookup": _compilar_lookup,
+    "cascade": _compilar_cascade,
+    "licenses": _compilar_licenses,
+    "order": _compilar_order,
+}
+
+def _a_pandas(serie: pd.Series) -> np.ndarray:
+    """Columna convertida desde polars, con NaN como nulo en el texto (igual que el motor pandas)"""
+    if serie.dtype == object:
+        return serie.where(serie.notna(), np.nan).to_numpy()
+    return serie.to_numpy()
+
+class PolarsPlan(BrandPlan):
+    """Plan de limpieza de una marca ejecutado con polars (motor columnar y multihilo).
+
+    Compila la misma definición de brand_configs que BrandPlan y devuelve el mismo DataFrame:
+    las columnas que escribe el plan se calculan con polars y el resto se devuelven tal como
+    llegaron. Los mensajes, el resumen y el esquema compacto son los de BrandPlan.
+    """
+
+    compiladores = COMPILADORES_POLARS
+
+    def tokens(self, item_names: pd.Series) -> PolarsTokens:
+        return PolarsTokens(item_names)
+
+    def _aplicar_pasos(self, df: pd.DataFrame, tokens: PolarsTokens, indice: Optional[ReferenceIndex],
+                       notify: Callable[[str, str], None]) -> pd.DataFrame:
+        """Convierte a polars, recorre los pasos y devuelve un DataFrame de pandas"""
+        ejecucion = EjecucionPolars(self, tokens, indice, notify)
+        pf = _a_polars(df)
+        for paso in self.pasos:
+            pf = paso(pf, ejecucion)
+
+        convertido = pf.to_pandas()
+        columnas = {}
+        for columna in pf.columns:
+            if columna in df.columns and columna not in ejecucion.escritas:
+                columnas[columna] = df[columna].array
+            else:
+                columnas[columna] = _a_pandas(convertido[columna])
+        return pd.DataFrame(columnas, index=df.index)
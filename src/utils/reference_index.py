@@ -0,0 +1,204 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from pyarrow import feather
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.arrow_io import arrow_to_dataframe, dataframe_to_arrow
+
+# Metadatos de una referencia publicada (columnas, claves y normalización)
+METADATA_PUBLICADA = "indice.json"
+
+def solo_lectura(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vista de un DataFrame compartido (cache de referencias) que no modifica sus datos
+
+    Cada columna de NumPy es una vista propia (ndarray.view()) marcada como no escribible: una
+    asignación como vista.loc[0, 'U_Genero'] = 'X' falla en lugar de cambiar la referencia de
+    todas las marcas y sesiones. Solo se bloquean esas vistas, no los arrays del DataFrame
+    original, que puede ser del llamador (from_dataframes) y sigue siendo escribible. Las
+    columnas de extensión (fechas, Int64, texto Arrow...) se copian: en las de Arrow la copia
+    comparte los buffers, que son inmutables. Añadir o quitar columnas no afecta al original.
+    """
+    columnas = {}
+    for posicion in range(df.shape[1]):
+        serie = df.iloc[:, posicion]
+        if isinstance(serie.dtype, np.dtype) and serie.dtype.kind not in "mM":
+            valores = serie.to_numpy(copy=False).view()
+            valores.flags.writeable = False
+        else:
+            valores = serie.array.copy()
+        columnas[posicion] = valores
+    # copy=False conserva las vistas (sin consolidar las columnas en un bloque nuevo)
+    vista = pd.DataFrame(columnas, index=df.index, copy=False)
+    vista.columns = df.columns
+    vista.attrs = dict(df.attrs)
+    return vista
+
+class ReferenceIndex:
+    """Referencia de una marca preparada para cruzarse por clave.
+
+    Se construye una sola vez por snapshot de la referencia: por cada clave de cruce guarda
+    las filas deduplicadas (se conserva la primera, igual que drop_duplicates) indexadas por
+    la clave normalizada a texto. El índice hash de pandas se crea en la primera búsqueda y
+    se reutiliza en las siguientes, de modo que cada limpieza solo paga la búsqueda.
+    """
+
+    def __init__(self, df: pd.DataFrame, claves: Sequence[str], quitar_espacios: bool = False):
+        """
+        Args:
+            df: DataFrame de referencia de la marca
+            claves: Columnas por las que se cruza la referencia (U_Estilo, U_Estilo_Color...)
+            quitar_espacios: Si es True, las claves se comparan sin espacios en los extremos
+        """
+        self.columnas: List[str] = list(df.columns)
+        self.quitar_espacios = quitar_espacios
+        self._tablas: Dict[str, pd.DataFrame] = {}
+        for clave in claves:
+            if clave not in df.columns:
+                continue
+            valores = self.normalizar(df[clave])
+            # Las filas sin clave no se indexan: un estilo nulo no cruza con nada
+            unicos = valores.notna() & ~valores.duplicated()
+            tabla = df.loc[unicos.to_numpy()].drop(columns=[clave])
+            tabla.index = pd.Index(valores[unicos].to_numpy(), name=clave)
+            self._tablas[clave] = tabla
+
+    def publicar(self, directorio: str) -> str:
+        """
+        Publica la referencia como Arrow IPC sin comprimir para compartirla entre procesos
+
+        Cada tabla de clave se escribe en su propio archivo Feather. Los procesos que la abren
+        con abrir() la mapean en memoria: el sistema operativo comparte las mismas páginas
+        entre todos, en lugar de deserializar una copia de la referencia en cada proceso.
+
+        Args:
+            directorio: Directorio (existente) donde se escriben los archivos
+
+        Returns:
+            str: El mismo directorio, que es lo que se pasa a abrir()
+        """
+        for clave, tabla in self._tablas.items():
+            feather.write_feather(dataframe_to_arrow(tabla.reset_index()),
+                                  os.path.join(directorio, f"{clave}.arrow"),
+                                  compression="uncompressed")
+        metadata = {
+            "columnas": self.columnas,
+            "claves": list(self._tablas),
+            "quitar_espacios": self.quitar_espacios,
+        }
+        with open(os.path.join(directorio, METADATA_PUBLICADA), "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+        return directorio
+
+    @classmethod
+    def abrir(cls, directorio: str) -> "ReferenceIndex":
+        """
+        Abre una referencia publicada con publicar() sin copiar sus datos
+
+        Las columnas de la referencia quedan respaldadas por Arrow sobre el archivo mapeado
+        (copia cero); solo se materializan la clave, porque el índice hash de la búsqueda la
+        necesita en memoria del proceso, y las columnas de tipos mezclados, que se guardaron
+        valor a valor (ver dataframe_to_arrow) y recuperan aquí sus tipos originales.
+
+        Args:
+            directorio: Directorio donde se publicó la referencia
+
+        Returns:
+            ReferenceIndex: Referencia lista para buscar
+        """
+        with open(os.path.join(directorio, METADATA_PUBLICADA), encoding="utf-8") as f:
+            metadata = json.load(f)
+        indice = cls.__new__(cls)
+        indice.columnas = metadata["columnas"]
+        indice.quitar_espacios = metadata["quitar_espacios"]
+        indice._tablas = {}
+        for clave in metadata["claves"]:
+            arrow = feather.read_table(os.path.join(directorio, f"{clave}.arrow"), memory_map=True)
+            tabla = arrow_to_dataframe(arrow.drop_columns([clave]), types_mapper=pd.ArrowDtype)
+            tabla.index = pd.Index(arrow.column(clave).to_pandas().to_numpy(), name=clave)
+            indice._tablas[clave] = tabla
+        return indice
+
+    @property
+    def empty(self) -> bool:
+        return not self.columnas
+
+    def tiene_clave(self, clave: str) -> bool:
+        """Indica si la referencia puede cruzarse por la clave indicada"""
+        return clave in self._tablas
+
+    def tabla(self, clave: str) -> pd.DataFrame:
+        """Filas de la referencia indexadas por la clave normalizada (vista de solo lectura)"""
+        return solo_lectura(self._tablas[clave])
+
+    def tamano(self, clave: str) -> int:
+        """Número de valores distintos de la clave en la referencia"""
+        return len(self._tablas[clave])
+
+    def normalizar(self, valores: pd.Series) -> pd.Series:
+        """Convierte los valores de una clave al texto con el que se comparan"""
+        # Los nulos (None o NaN) se mantienen nulos en lugar de convertirse en 'None' o 'nan'
+        texto = valores.astype(str).where(valores.notna())
+        return texto.str.strip() if self.quitar_espacios else texto
+
+    def buscar(self, clave: str, valores: pd.Series, columnas: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Busca en la referencia los valores de una clave (equivale a un merge how='left')
+
+        Args:
+            clave: Columna de la referencia por la que se cruza
+            valores: Valores de la clave en el DataFrame a completar
+            columnas: Columnas de la referencia a devolver (por defecto todas)
+
+        Returns:
+            pd.DataFrame: Una fila por valor, alineada con el índice de valores; NaN si no hay cruce
+        """
+        tabla = self._tablas[clave]
+        if columnas is not None:
+            tabla = tabla[list(columnas)]
+        # Cada estilo se repite en muchas filas (tallas, colores): se normaliza y se busca
+        # cada valor distinto una sola vez y el resultado se reparte a las filas por su código
+        codigos, unicos = pd.factorize(valores, use_na_sentinel=False)
+        claves = self.normalizar(pd.Series(unicos, dtype=valores.dtype))
+        resultado = tabla.reindex(claves.to_numpy())
+        # Una referencia abierta desde Arrow devuelve los mismos tipos que una en memoria
+        arrow = [col for col, dtype in resultado.dtypes.items() if isinstance(dtype, pd.ArrowDtype)]
+        if arrow:
+            resultado[arrow] = pd.DataFrame(
+                {col: resultado[col].to_numpy(dtype=object, na_value=np.nan) for col in arrow},
+                index=resultado.index).infer_objects()
+        resultado = resultado.take(codigos)
+        resultado.index = valores.index
+        return resultado
+
+    def buscar_cascada(self, niveles: Sequence[Tuple[str, pd.Series, Sequence[str]]]) -> pd.DataFrame:
+        """
+        Busca varias claves en orden de prioridad y combina los resultados en un solo DataFrame
+
+        Cada nivel aporta sus columnas. Si una columna la aportan varios niveles, se queda el
+        valor del primer nivel que cruza y los siguientes solo rellenan sus huecos (por ejemplo
+        U_Estilo_Color y, si no cruza, U_Estilo). No se generan columnas con sufijos.
+
+        Args:
+            niveles: (clave, valores de la clave, columnas que aporta) en orden de prioridad;
+                al menos uno
+
+        Returns:
+            pd.DataFrame: Una fila por valor, alineada con el índice de los valores
+        """
+        resultado = None
+        for clave, valores, columnas in niveles:
+            encontrado = self.buscar(clave, valores, columnas)
+            if resultado is None:
+                resultado = encontrado
+                continue
+            comunes = [col for col in encontrado.columns if col in resultado.columns]
+            nuevas = [col for col in encontrado.columns if col not in resultado.columns]
+            if comunes:
+                resultado[comunes] = resultado[comunes].fillna(encontrado[comunes])
+            if nuevas:
+                resultado[nuevas] = encontrado[nuevas]
+        return resultado
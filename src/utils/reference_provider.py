@@ -0,0 +1,240 @@
+import re
+import time
+import threading
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Sequence
+from utils.reference_index import ReferenceIndex, solo_lectura
+
+class ReferenceProvider:
+    """Proveedor perezoso de DataFrames de referencia por marca.
+
+    Solo descarga la colección que necesita la marca consultada, la primera vez que
+    se pide, y la mantiene en cache para las siguientes consultas.
+    """
+
+    def __init__(self, listar_colecciones: Callable[[], List[str]],
+                 cargar_coleccion: Callable[..., pd.DataFrame], deduplicar: bool = False,
+                 umbral_semijoin: Optional[int] = None, ttl_segundos: Optional[float] = None,
+                 rutas: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            listar_colecciones: Función que devuelve los nombres de las colecciones disponibles
+            cargar_coleccion: Función cargar_coleccion(nombre, campos=None, agrupar_por=None) que
+                devuelve el DataFrame de una colección, opcionalmente restringido a ciertos campos
+                y deduplicado por las claves indicadas
+            deduplicar: Si es True, se pide a cargar_coleccion un documento por clave de la marca
+            umbral_semijoin: Número máximo de valores de clave para los que se consulta solo la
+                parte de la colección que aparece en el archivo (None desactiva la búsqueda dirigida)
+            ttl_segundos: Tiempo tras el cual una colección en cache se vuelve a pedir al cargador
+                (None la mantiene hasta clear())
+            rutas: Colección fija por código de marca ({"SK": "skechers"}); tiene prioridad
+                sobre la búsqueda por nombre
+        """
+        self._listar_colecciones = listar_colecciones
+        self._cargar_coleccion = cargar_coleccion
+        self._colecciones: Optional[List[str]] = None
+        self._cache: Dict[object, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+        self._locks_coleccion: Dict[object, threading.Lock] = {}
+        self._static = False
+        self._deduplicar = deduplicar
+        self._umbral_semijoin = umbral_semijoin
+        self._ttl_segundos = ttl_segundos
+        self._cargado_en: Dict[object, float] = {}
+        # Índices de cruce ya construidos: (DataFrame de origen, versión del snapshot, índice)
+        self._indices: Dict[object, tuple] = {}
+        # Tabla de enrutamiento código de marca -> colección (se resuelve una vez por marca)
+        self._rutas_config: Dict[str, str] = {marca.upper(): nombre for marca, nombre in (rutas or {}).items()}
+        self._rutas: Dict[str, Optional[str]] = {}
+
+    @classmethod
+    def from_dataframes(cls, dataframes: Dict[str, pd.DataFrame]) -> "ReferenceProvider":
+        """Crea un proveedor sobre DataFrames ya cargados (sin acceso a MongoDB)"""
+        # Los DataFrames ya están en memoria: la proyección de campos no aporta nada
+        provider = cls(lambda: list(dataframes), lambda nombre, **kwargs: dataframes[nombre])
+        provider._static = True
+        provider._cache.update(dataframes)
+        return provider
+
+    def _clave_cache(self, nombre: str, campos: Optional[Sequence[str]],
+                     claves: Optional[Sequence[str]]):
+        """Clave de cache: la misma colección puede cargarse con distintas proyecciones"""
+        if (campos is None and claves is None) or self._static:
+            return nombre
+        return (nombre, tuple(sorted(campos or [])), tuple(claves or []))
+
+    def colecciones(self) -> List[str]:
+        """Devuelve los nombres de las colecciones disponibles (se consultan una sola vez)"""
+        if self._colecciones is None:
+            colecciones = list(self._listar_colecciones())
+            # Una lista vacía suele indicar un fallo de conexión: no se guarda para reintentar
+            if colecciones:
+                self._colecciones = colecciones
+            return colecciones
+        return self._colecciones
+
+    def resolver_coleccion(self, brand_name: str, brand: Optional[str] = None) -> Optional[str]:
+        """
+        Devuelve la colección de referencia de una marca
+
+        Con el código de marca, la resolución se guarda en la tabla de rutas y las consultas
+        siguientes son una búsqueda en un diccionario. La ruta configurada tiene prioridad;
+        si no hay, se elige la colección cuyo nombre mejor coincide con el de la marca
+        (igual > empieza por > contiene) en lugar de la primera que lo contiene.
+        """
+        if brand is not None and brand.upper() in self._rutas:
+            return self._rutas[brand.upper()]
+
+        colecciones = self.colecciones()
+        nombre = self._rutas_config.get(brand.upper()) if brand is not None else None
+        if nombre is not None and nombre not in colecciones:
+            print(f"La colección configurada para '{brand}' no existe: {nombre}")
+            nombre = None
+        if nombre is None:
+            nombre = self._mejor_coincidencia(brand_name, colecciones)
+
+        # Solo se memoriza si la lista de colecciones es definitiva (no tras un fallo de conexión)
+        if brand is not None and self._colecciones is not None:
+            self._rutas[brand.upper()] = nombre
+        return nombre
+
+    @staticmethod
+    def _mejor_coincidencia(brand_name: str, colecciones: List[str]) -> Optional[str]:
+        """Elige la colección cuyo nombre mejor coincide con el nombre de la marca"""
+        def normalizar(texto):
+            return re.sub(r'[^a-z0-9]', '', texto.lower())
+
+        marca = normalizar(brand_name)
+        if not marca:
+            return None
+        candidatas = []
+        for nombre in colecciones:
+            coleccion = normalizar(nombre)
+            if coleccion == marca:
+                candidatas.append((0, nombre))
+            elif coleccion.startswith(marca):
+                candidatas.append((1, nombre))
+            elif marca in coleccion:
+                candidatas.append((2, nombre))
+        if not candidatas:
+            return None
+        mejor = min(rango for rango, _ in candidatas)
+        empatadas = [nombre for rango, nombre in candidatas if rango == mejor]
+        if len(empatadas) > 1:
+            print(f"Varias colecciones coinciden con '{brand_name}': {empatadas}. Se usa '{empatadas[0]}' "
+                  f"(configura MONGO_COLECCIONES_MARCA para fijarla)")
+        return empatadas[0]
+
+    def get_reference(self, brand: str, brand_name: str,
+                      campos: Optional[Sequence[str]] = None,
+                      claves: Optional[Sequence[str]] = None,
+                      valores_clave: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Obtiene el DataFrame de referencia de una marca, cargándolo si aún no está en cache
+
+        Args:
+            brand: Código de la marca (CH, CL, SK, NE, FB, etc.)
+            brand_name: Nombre de la marca usado para localizar la colección
+            campos: Campos de la referencia que usa la marca (proyección); None carga todos
+            claves: Claves de cruce de la marca; con deduplicar=True se descarga un solo
+                documento por clave (el primero, igual que drop_duplicates)
+            valores_clave: Valores de la primera clave presentes en el archivo a limpiar. Si no
+                superan umbral_semijoin y la colección no está en cache, se pasan al cargador
+                como búsqueda dirigida. Si el cargador devuelve solo esos documentos, el resultado
+                no se cachea porque depende del archivo; si devuelve la colección completa (un
+                snapshot, con attrs["snapshot"]), se cachea como una carga normal
+
+        Returns:
+            pd.DataFrame: DataFrame de la colección (vacío si no existe). Es una vista del
+                DataFrame en cache, compartido con otras sesiones: sus datos no se pueden
+                modificar (ver solo_lectura); para editarlo, usar .copy().
+        """
+        return solo_lectura(self._obtener_referencia(brand, brand_name, campos, claves, valores_clave)[0])
+
+    def get_index(self, brand: str, brand_name: str,
+                  campos: Optional[Sequence[str]] = None,
+                  claves: Optional[Sequence[str]] = None,
+                  valores_clave: Optional[Sequence[str]] = None,
+                  quitar_espacios: bool = False) -> ReferenceIndex:
+        """
+        Obtiene la referencia de una marca preparada para cruzarse por sus claves
+
+        El índice se construye una vez por versión de la referencia y se comparte entre
+        llamadas y sesiones; solo se reconstruye cuando el cargador devuelve otro snapshot.
+        Una búsqueda dirigida servida desde el snapshot también reutiliza el índice; solo el
+        resultado parcial de un arranque en frío se indexa aparte y no se guarda.
+        Los argumentos son los de get_reference, más quitar_espacios (ver ReferenceIndex).
+        Con quitar_espacios no se hace la búsqueda dirigida: MongoDB compara las claves tal
+        cual con $in y no encontraría un estilo guardado con espacios (" PB01 ").
+        """
+        claves = list(claves or ["U_Estilo"])
+        if quitar_espacios:
+            valores_clave = None
+        df, clave = self._obtener_referencia(brand, brand_name, campos, claves, valores_clave)
+        if clave is None:
+            # Referencia parcial (búsqueda dirigida): depende del archivo y no se reutiliza
+            return ReferenceIndex(df, claves, quitar_espacios)
+
+        clave_indice = (clave, tuple(claves), quitar_espacios)
+        version = df.attrs.get("snapshot")
+        entrada = self._indices.get(clave_indice)
+        if entrada is not None and (entrada[0] is df or (version is not None and entrada[1] == version)):
+            return entrada[2]
+        indice = ReferenceIndex(df, claves, quitar_espacios)
+        self._indices[clave_indice] = (df, version, indice)
+        return indice
+
+    def _obtener_referencia(self, brand: str, brand_name: str, campos: Optional[Sequence[str]],
+                            claves: Optional[Sequence[str]], valores_clave: Optional[Sequence[str]]):
+        """Devuelve (DataFrame, clave de cache); la clave es None si el resultado no se cachea"""
+        nombre = self.resolver_coleccion(brand_name, brand)
+        if nombre is None:
+            return pd.DataFrame(), None
+
+        agrupar_por = list(claves) if (self._deduplicar and claves) else None
+        clave = self._clave_cache(nombre, campos, agrupar_por)
+        df = self._cache.get(clave)
+        if df is not None and not self._expirado(clave):
+            return df, clave
+
+        opciones = {"campos": campos}
+        if agrupar_por:
+            opciones["agrupar_por"] = agrupar_por
+
+        if (valores_clave is not None and claves and self._umbral_semijoin
+                and len(valores_clave) <= self._umbral_semijoin):
+            opciones["claves_busqueda"] = {claves[0]: list(valores_clave)}
+
+        # Un lock por colección evita que dos sesiones descarguen la misma colección a la vez
+        with self._lock:
+            lock_coleccion = self._locks_coleccion.setdefault(clave, threading.Lock())
+        with lock_coleccion:
+            df = self._cache.get(clave)
+            if df is None or self._expirado(clave):
+                df = self._cargar_coleccion(nombre, **opciones)
+                if "claves_busqueda" in opciones and df.attrs.get("snapshot") is None:
+                    # Solo los documentos del archivo: no sirve para otros archivos
+                    return df, None
+                if not df.empty:
+                    self._cache[clave] = df
+                    self._cargado_en[clave] = time.monotonic()
+        return df, (clave if not df.empty else None)
+
+    def _expirado(self, clave) -> bool:
+        """Indica si una entrada de la cache superó el TTL del proveedor"""
+        if self._ttl_segundos is None or self._static:
+            return False
+        return time.monotonic() - self._cargado_en.get(clave, 0) > self._ttl_segundos
+
+    def loaded(self) -> Dict[str, pd.DataFrame]:
+        """Devuelve las colecciones cargadas hasta el momento"""
+        return {clave if isinstance(clave, str) else clave[0]: df for clave, df in self._cache.items()}
+
+    def clear(self):
+        """Descarta la lista de colecciones y los DataFrames cargados"""
+        with self._lock:
+            self._colecciones = None
+            self._rutas.clear()
+            self._cache.clear()
+            self._cargado_en.clear()
+            self._indices.clear()
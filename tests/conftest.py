@@ -0,0 +1,7 @@
+import os
+import sys
+
+# El código de la app se importa como en streamlit (src/ en el path: utils.*, mongo_extractor)
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
@@ -0,0 +1,231 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.brand_rules import BrandPlan
+from utils.item_tokenizer import ItemNameTokens
+from utils.reference_index import ReferenceIndex
+
+
+def ejecutar(pasos, df, indice=None, masks=None):
+    """Aplica un plan con los pasos indicados; devuelve (resultado, mensajes)"""
+    mensajes = []
+    plan = BrandPlan({"name": "Prueba", "masks": masks or {}, "pipeline": pasos})
+    resultado = plan.ejecutar(df, ItemNameTokens(df["ItemName"]), indice,
+                              lambda nivel, texto: mensajes.append((nivel, texto)))
+    return resultado, mensajes
+
+
+def archivo(*item_names, **columnas):
+    return pd.DataFrame({"ItemName": list(item_names), **columnas})
+
+
+def referencia(claves=("U_Estilo",), **columnas):
+    return ReferenceIndex(pd.DataFrame(columnas), list(claves))
+
+
+def test_paso_desconocido():
+    with pytest.raises(ValueError, match="desconocido"):
+        BrandPlan({"name": "Prueba", "pipeline": [{"op": "ordenar"}]})
+
+
+def test_tokens():
+    df = archivo("S1/Desc/7/NEGRO", "S2", U_Talla=["X", np.nan])
+
+    resultado, _ = ejecutar([
+        {"op": "tokens", "columns": {"U_Estilo": "estilo", "U_Descripcion": "descripcion"}},
+        {"op": "tokens", "columns": {"U_Talla": "talla"}, "if_missing": True},
+    ], df)
+
+    assert resultado["U_Estilo"].tolist() == ["S1", "S2"]
+    assert resultado["U_Descripcion"].iloc[0] == "Desc" and pd.isna(resultado["U_Descripcion"].iloc[1])
+    # if_missing no pisa la columna del archivo
+    assert resultado["U_Talla"].iloc[0] == "X"
+
+
+def test_tokens_con_mascara():
+    df = archivo("S1/Desc", "SIN")
+
+    resultado, _ = ejecutar([{"op": "tokens", "columns": {"U_Descripcion": "descripcion"}, "where": "valido"}],
+                            df, masks={"valido": ["tiene_slash"]})
+
+    assert resultado["U_Descripcion"].iloc[0] == "Desc" and pd.isna(resultado["U_Descripcion"].iloc[1])
+
+
+def test_init_solo_crea_las_columnas_que_faltan():
+    df = archivo("S1", U_Genero=["M"])
+
+    resultado, _ = ejecutar([{"op": "init", "columns": ["U_Genero", "U_Suela"]}], df)
+
+    assert resultado["U_Genero"].tolist() == ["M"]
+    assert resultado["U_Suela"].isna().all()
+
+
+def test_prefix_gana_la_primera_regla_y_acepta_varios_prefijos():
+    df = archivo("a", "b", "c", "d", ItemCode=["3001", "8041", "8051", "9000"])
+
+    resultado, _ = ejecutar([{"op": "prefix", "source": "ItemCode", "column": "u_genero", "unique": False,
+                              "rules": [["3", "MENS"], [["804", "805"], "UNISEX"], ["80", "OTRO"]]}], df)
+
+    assert resultado["u_genero"].tolist() == ["MENS", "UNISEX", "UNISEX", ""]
+
+
+def test_prefix_por_valor_unico_con_defecto():
+    df = archivo("a", "b", "c", U_Estilo=["F1", "W1", "F1"])
+
+    resultado, _ = ejecutar([{"op": "prefix", "source": "U_Estilo", "column": "U_Genero", "default": "NA",
+                              "rules": [["W", "WFW"]]}], df)
+
+    assert resultado["U_Genero"].tolist() == ["NA", "WFW", "NA"]
+
+
+def test_map_y_copy():
+    df = archivo("a", "b", "c", U_Genero=["WFW", "MACC", "X"])
+
+    resultado, _ = ejecutar([
+        {"op": "map", "source": "U_Genero", "column": "U_Segmento", "values": {"WFW": "FOOTWEAR", "MACC": "ACCESSORIES"}},
+        {"op": "copy", "source": "U_Genero", "column": "U_Categoria"},
+    ], df)
+
+    assert resultado["U_Segmento"].tolist() == ["FOOTWEAR", "ACCESSORIES", ""]
+    assert resultado["U_Categoria"].tolist() == ["WFW", "MACC", "X"]
+
+
+def test_text_y_split():
+    df = archivo("a", "b", "c", color=["NEGRO-01", np.nan, "AZUL"], ItemCode=[300, 400, 500])
+
+    resultado, _ = ejecutar([
+        {"op": "text", "column": "color", "fillna": ""},
+        {"op": "split", "source": "color", "column": "codigo", "sep": "-", "index": 1},
+        {"op": "text", "column": "ItemCode"},
+    ], df)
+
+    assert resultado["color"].tolist() == ["NEGRO-01", "", "AZUL"]
+    assert resultado["codigo"].iloc[0] == "01" and resultado["codigo"].iloc[1:].isna().all()
+    assert resultado["ItemCode"].tolist() == ["300", "400", "500"]
+
+
+def test_null_vacia_las_filas_de_la_mascara():
+    df = archivo("S1/Desc", "-X/Desc", "SIN", U_Estilo=["S1", "-X", "SIN"])
+
+    resultado, _ = ejecutar([{"op": "null", "column": "U_Estilo", "where": "~valido"}],
+                            df, masks={"valido": ["tiene_slash", "estilo_valido"]})
+
+    assert resultado["U_Estilo"].iloc[0] == "S1"
+    assert resultado["U_Estilo"].iloc[1:].isna().all()
+
+
+def test_replace_con_mascara_y_strip():
+    df = archivo("S1/Desc", "SIN", U_Descripcion=[" Tenis americana 7.5 ", " Otro americana 8 "])
+
+    resultado, _ = ejecutar([{"op": "replace", "column": "U_Descripcion", "pattern": r"(?i)americana\s*\d+(?:\.\d+)?",
+                              "strip": True, "where": "valido"}], df, masks={"valido": ["tiene_slash"]})
+
+    assert resultado["U_Descripcion"].tolist() == ["Tenis", " Otro americana 8 "]
+
+
+def test_lookup_completa_solo_los_nulos():
+    df = archivo("a", "b", "c", U_Estilo=["S1", "S2", "S3"], U_Genero=["W", np.nan, np.nan])
+    indice = referencia(U_Estilo=["S1", "S2", "S2"], U_Genero=["M", "M", "X"], U_Suela=["GOMA", "EVA", "X"])
+
+    resultado, _ = ejecutar([{"op": "lookup", "key": "U_Estilo", "columns": ["U_Genero", "U_Suela"]}], df, indice)
+
+    assert resultado["U_Genero"].tolist()[:2] == ["W", "M"]
+    assert resultado["U_Suela"].tolist()[:2] == ["GOMA", "EVA"]
+    assert resultado[["U_Genero", "U_Suela"]].iloc[2].isna().all()
+
+
+def test_lookup_replace_toma_las_columnas_de_la_referencia():
+    df = archivo("a", "b", U_Estilo=["S1", "S2"], U_Zone=["Z0", "Z0"])
+    indice = referencia(U_Estilo=["S1"], U_Zone=["Z1"])
+
+    resultado, _ = ejecutar([{"op": "lookup", "key": "U_Estilo", "columns": ["U_Zone"], "replace": True}], df, indice)
+
+    assert resultado["U_Zone"].iloc[0] == "Z1" and pd.isna(resultado["U_Zone"].iloc[1])
+
+
+def test_lookup_clave_como_texto_sin_espacios():
+    df = archivo("a", "b", U_Estilo=[" PB1 ", 123])
+    indice = ReferenceIndex(pd.DataFrame({"U_Estilo": ["PB1 ", "123"], "U_Genero": ["M", "W"]}),
+                            ["U_Estilo"], quitar_espacios=True)
+
+    resultado, _ = ejecutar([{"op": "lookup", "key": "U_Estilo", "key_as_text": True, "strip_key": True,
+                              "columns": ["U_Genero"]}], df, indice)
+
+    assert resultado["U_Estilo"].tolist() == ["PB1", "123"]
+    assert resultado["U_Genero"].tolist() == ["M", "W"]
+
+
+def test_lookup_sin_la_clave_en_la_referencia():
+    df = archivo("a", U_Estilo=["S1"])
+    indice = referencia(claves=("Otra",), Otra=["S1"], U_Genero=["M"])
+
+    resultado, mensajes = ejecutar([{"op": "lookup", "key": "U_Estilo", "columns": ["U_Genero"]}], df, indice)
+
+    assert "U_Genero" not in resultado.columns
+    assert mensajes == [("error", "La colección de MongoDB no tiene el campo clave 'U_Estilo'")]
+
+
+def test_cascade_manda_el_primer_nivel_que_cruza():
+    df = archivo("a", "b", U_Estilo=["FB1", "FB1"], U_Estilo_Color=["FB1-BLK", "FB1-RED"], U_Genero=["W", "W"])
+    indice = referencia(claves=("U_Estilo", "U_Estilo_Color"), U_Estilo=["FB1", "FB1"],
+                        U_Estilo_Color=["FB1-BLK", "FB1-GRN"], U_Division=["ACTIVE", "LIFESTYLE"],
+                        U_Genero=["M", "M"], U_Prenda=["LEGGING", "TOP"])
+
+    resultado, _ = ejecutar([{"op": "cascade", "levels": [
+        {"key": "U_Estilo_Color", "columns": ["U_Division", "U_Prenda"]},
+        {"key": "U_Estilo", "columns": ["U_Genero", "U_Prenda"], "only_new": True},
+    ]}], df, indice)
+
+    assert resultado["U_Division"].iloc[0] == "ACTIVE" and pd.isna(resultado["U_Division"].iloc[1])
+    # U_Prenda: por estilo-color si cruza y, si no, por estilo
+    assert resultado["U_Prenda"].tolist() == ["LEGGING", "LEGGING"]
+    # only_new: U_Genero ya está en el archivo y no se trae
+    assert resultado["U_Genero"].tolist() == ["W", "W"]
+
+
+def test_cascade_nivel_opcional_sin_clave():
+    df = archivo("a", U_Estilo=["FB1"], U_Estilo_Color=["FB1-BLK"])
+    indice = referencia(U_Estilo=["FB1"], U_Genero=["W"])
+
+    resultado, mensajes = ejecutar([{"op": "cascade", "levels": [
+        {"key": "U_Estilo_Color", "columns": ["U_Division"], "optional": True},
+        {"key": "U_Estilo", "columns": ["U_Genero"]},
+    ]}], df, indice)
+
+    assert resultado["U_Genero"].tolist() == ["W"]
+    assert mensajes == []
+
+
+def test_licenses_solo_completa_las_ligas_en_blanco(tmp_path):
+    ruta = tmp_path / "ligas.json"
+    ruta.write_text(json.dumps({"YANKEES": "MLB", "LAKERS": "NBA"}), encoding="utf-8")
+    df = archivo("a", "b", "c", "d", U_Team=["YANKEES", "LAKERS", "YANKEES", "OTRO"],
+                 U_Liga=[np.nan, "PROPIA", "", np.nan])
+
+    resultado, _ = ejecutar([{"op": "licenses", "source": "U_Team", "column": "U_Liga", "path": str(ruta)}], df)
+
+    assert resultado["U_Liga"].tolist()[:3] == ["MLB", "PROPIA", "MLB"]
+    assert pd.isna(resultado["U_Liga"].iloc[3])
+
+
+def test_order():
+    df = archivo("a", U_Estilo=["S1"], Extra=[1])
+
+    resultado, _ = ejecutar([{"op": "order", "columns": ["U_Estilo", "ItemName", "U_Genero"]}], df)
+    assert resultado.columns.tolist() == ["U_Estilo", "ItemName"]
+
+    resultado, _ = ejecutar([{"op": "order", "columns": ["U_Estilo", "ItemName", "U_Genero"], "reindex": True}], df)
+    assert resultado.columns.tolist() == ["U_Estilo", "ItemName", "U_Genero"]
+    assert resultado["U_Genero"].isna().all()
+
+
+def test_prefix_valor_nulo_toma_el_defecto():
+    df = archivo("a", "b", "c", U_Estilo=["W1", np.nan, None])
+
+    resultado, _ = ejecutar([{"op": "prefix", "source": "U_Estilo", "column": "U_Genero",
+                              "rules": [["W", "WFW"], ["F", "MACC"]]}], df)
+
+    assert resultado["U_Genero"].tolist() == ["WFW", "", ""]
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import data_cleaner
+from utils.data_cleaner import DataCleaner
+
+
+def archivo():
+    return pd.DataFrame({
+        "ItemName": ["S001/Zapato/7/BLK-01", "S002/Bota/8/RED-02"],
+        "ItemCode": ["300123", "400456"],
+        "Empresa": ["E1", "E2"],
+        "Qty": [1.0, 2.0],
+        "Notas": ["a", "b"],
+    })
+
+
+@pytest.mark.parametrize("compact_output", [True, False])
+@pytest.mark.parametrize("brand", ["CL", "SK"])
+def test_modificar_el_resultado_no_cambia_la_entrada(brand, compact_output):
+    df = archivo()
+    cleaner = DataCleaner(brand, {"Skechers ref": pd.DataFrame({"U_Estilo": ["S001"], "U_Genero": ["M"]})})
+    cleaner.show_messages = False
+    cleaner.compact_output = compact_output
+
+    resultado = cleaner.clean_data(df)
+    resultado.loc[0, "Qty"] = 99
+    resultado.loc[0, "Notas"] = "z"
+    resultado.loc[0, "ItemName"] = "X"
+
+    pd.testing.assert_frame_equal(df, archivo())
+
+
+def test_la_limpieza_no_modifica_la_entrada():
+    df = archivo()
+    df.loc[0, "ItemCode"] = np.nan
+    esperado = df.copy()
+
+    DataCleaner("CL", {}).clean_data(df)
+
+    pd.testing.assert_frame_equal(df, esperado)
+
+
+def test_clean_data_chunks_no_fija_la_referencia_para_las_limpiezas_siguientes():
+    from utils.reference_provider import ReferenceProvider
+
+    coleccion = {"U_Estilo": ["S001"], "U_Genero": ["M"]}
+    provider = ReferenceProvider(lambda: ["Skechers ref"], lambda nombre, **kwargs: pd.DataFrame(coleccion))
+    cleaner = DataCleaner("SK", provider)
+    cleaner.show_messages = False
+
+    bloques = list(cleaner.clean_data_chunks([archivo().iloc[:1], archivo().iloc[1:]]))
+    assert bloques[0]["U_Genero"].tolist() == ["M"]
+    assert cleaner.prepared_indices == {}
+
+    # Un snapshot nuevo de la referencia se usa en la siguiente limpieza
+    coleccion["U_Genero"] = ["W"]
+    provider.clear()
+    assert cleaner.clean_data(archivo())["U_Genero"].tolist()[0] == "W"
+
+
+def referencia_tipos_mezclados():
+    # Estilos, géneros y tallas guardados unas veces como número y otras como texto
+    return pd.DataFrame({
+        "U_Estilo": ["S001", "S002", 100, "S004"],
+        "U_Genero": [1, "1", "M", np.nan],
+        "U_Suela": pd.Series([7, 8, 9, 10], dtype=object),
+        "U_Division": ["D1", 7.5, "D3", "D4"],
+        "U_Temporalidad": ["T1", np.nan, "T3", "T4"],
+    })
+
+
+@pytest.mark.parametrize("compact_output", [False, True])
+def test_clean_data_parallel_igual_que_clean_data_con_tipos_mezclados(monkeypatch, compact_output):
+    monkeypatch.setattr(data_cleaner, "MIN_ROWS_PER_PARTITION", 1)
+    nombres = ["S001/Zapato/7/BLK", "S002/Bota/8/RED", "100/Sandalia/9/WHT", "S004/Tenis/7/NVY", "S999/X/1/Y"]
+    df = pd.DataFrame({"ItemName": nombres * 4, "ItemCode": [str(i) for i in range(20)], "Empresa": "E1"})
+    cleaner = DataCleaner("SK", {"Skechers ref": referencia_tipos_mezclados()})
+    cleaner.show_messages = False
+    cleaner.compact_output = compact_output
+
+    secuencial = cleaner.clean_data(df)
+    paralelo = cleaner.clean_data_parallel(df, workers=2)
+
+    pd.testing.assert_frame_equal(paralelo, secuencial)
+    assert paralelo["U_Genero"].tolist()[:2] == [1, "1"]
+    assert paralelo["U_Suela"].tolist()[:3] == [7, 8, 9]
+
+
+def test_cole_haan_con_item_name_nulo():
+    df = pd.DataFrame({"ItemName": ["W200/Zapato/7/ROJO", np.nan], "ItemCode": ["1", "2"], "Empresa": ["E1", "E1"]})
+    cleaner = DataCleaner("CH", {"Cole Haan": pd.DataFrame({"U_Estilo": ["W200"], "U_Zone": ["Z1"]})})
+
+    resultado = cleaner.clean_data(df)
+
+    assert resultado["U_Genero"].tolist() == ["WFW", ""]
+    assert resultado["U_Segmento"].tolist() == ["FOOTWEAR", ""]
+    assert resultado["U_Zone"].tolist()[0] == "Z1" and pd.isna(resultado["U_Zone"].iloc[1])
+
+
+def test_clean_data_chunks_con_un_bloque_sin_item_name_ni_item_code(tmp_path):
+    from utils.file_handler import FileHandler
+
+    ruta = tmp_path / "archivo.csv"
+    ruta.write_text("ItemName;ItemCode;Empresa\nS001/Zapato/7/BLK-01;300123;E1\n;;E2\n", encoding="utf-8")
+    cleaner = DataCleaner("SK", {"Skechers ref": pd.DataFrame({"U_Estilo": ["S001"], "U_Genero": ["M"]})})
+    cleaner.show_messages = False
+
+    bloques = list(cleaner.clean_data_chunks(FileHandler().read_file_chunks(str(ruta), chunksize=1)))
+
+    assert bloques[0]["U_Genero"].tolist() == ["M"]
+    assert bloques[0]["ItemCode"].tolist() == ["300123"]
+    assert bloques[1]["ItemName"].isna().all() and bloques[1]["U_Genero"].isna().all()
+
+
+@pytest.mark.parametrize("brand", ["CL", "SK", "FB"])
+def test_item_name_sin_valores(brand):
+    cleaner = DataCleaner(brand, {})
+    cleaner.show_messages = False
+
+    resultado = cleaner.clean_data(pd.DataFrame({"ItemName": [np.nan], "ItemCode": [np.nan], "Empresa": ["E1"]}))
+
+    assert len(resultado) == 1
+
+
+@pytest.mark.parametrize("brand", ["CH", "SK"])
+def test_salida_compacta_conserva_los_codigos(brand):
+    df = pd.DataFrame({"ItemName": ["S001/Zapato/7/BLK", "S002/Bota/8/RED"], "ItemCode": [123, np.nan],
+                       "BarCode": pd.Series([7501, "A-1"], dtype=object), "Empresa": ["E1", "E1"]})
+    cleaner = DataCleaner(brand, {})
+    cleaner.show_messages = False
+
+    resultado = cleaner.clean_data(df)
+
+    assert resultado["ItemCode"].dtype == np.float64
+    assert resultado["ItemCode"].iloc[0] == 123 and np.isnan(resultado["ItemCode"].iloc[1])
+    if "BarCode" in resultado.columns:
+        assert resultado["BarCode"].tolist() == [7501, "A-1"]
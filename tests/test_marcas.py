@@ -0,0 +1,130 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.data_cleaner import DataCleaner
+
+# Salidas esperadas por marca, generadas con los cleaners imperativos (_clean_cole_haan,
+# _clean_skechers...) a los que sustituyen los planes declarativos de brand_configs. En
+# Skechers las filas siguen el orden del archivo y el estilo de las filas inválidas es nulo
+# (no el texto 'nan'), como hace el plan de la marca.
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+MARCAS = ["CH", "CL", "SK", "NE", "BI", "PB", "AD", "FB"]
+
+
+def archivo_marcas():
+    """Archivo con los casos del ItemName que tratan las marcas (uno por fila)"""
+    filas = [
+        ("F100/Cartera cuero/U/NEGRO", "300001"),
+        ("W200/Zapato  mujer americana 7.5/7/ROJO-02", "400002"),
+        ("C300/Bota hombre/9/CAFE-10", "804003"),
+        ("U400/Gorra/U/AZUL", "805004"),
+        ("X500/Otro/M/VERDE/EXTRA/MAS", "500005"),
+        ("S001/Tenis AMERICANA 12.5 run/8/BLK-01", "600006"),
+        ("S001/Tenis/9/BLK-01", "802007"),
+        ("12345/Numerico/10/WHT", "300008"),
+        (" PB01 /Polo/M/BLUE", "400009"),
+        ("SINSLASH", "100010"),
+        ("-X1/Invalido/S/RED", "300011"),
+        ("A/Corto/S/RED", "300012"),
+        ("NE01/Gorra   59fifty  /7 1/4/NEGRO", "700013"),
+        ("NE02/Gorra team/U/AZUL", "300014"),
+        ("NE03/Sin equipo/U/ROJO", "300015"),
+        ("FB01-BLK-S/Legging/BLACK/S", "400016"),
+        ("FB01-RED-M/Legging/RED/M", "400017"),
+        ("FB02-GRN/Top/GREEN/L", "400018"),
+        ("FB03/Short/GRAY/XL", "400019"),
+        ("S999/Sin referencia/8/GRY", "300020"),
+        ("W200/Zapato/8/ROJO-02", "400021"),
+        ("S002/Sin codigo/7/NEGRO", np.nan),
+    ]
+    return pd.DataFrame({
+        "ItemName": [item_name for item_name, _ in filas],
+        "ItemCode": [item_code for _, item_code in filas],
+        "Empresa": ["E1" if posicion % 3 else "E2" for posicion in range(len(filas))],
+        "Extra": np.arange(len(filas), dtype=float),
+    })
+
+
+def referencias_marcas():
+    """Colecciones de referencia por nombre de marca (el primer documento de cada estilo manda)"""
+    return {
+        "Cole Haan": pd.DataFrame({
+            "U_Estilo": ["F100", "W200", "C300", "W200"],
+            "U_Segmentacion_SK": ["BASICO", "MODA", "BASICO", "OTRO"],
+            "U_Zone": ["Z1", "Z2", np.nan, "Z9"],
+            "U_Descrip_Color": ["NEGRO", "ROJO", "CAFE", "AZUL"],
+            "U_Descripcion": ["CARTERA", np.nan, "BOTA", "OTRA"],
+        }),
+        "Skechers": pd.DataFrame({
+            "U_Estilo": ["S001", "W200", "12345", "X500", "A"],
+            "U_Genero": ["MENS", "WOMENS", np.nan, "UNISEX", "KIDS"],
+            "U_Suela": ["GOMA", np.nan, "EVA", "GOMA", "EVA"],
+            "U_Division": ["RUN", "LIFESTYLE", "RUN", np.nan, "KIDS"],
+            "U_Temporalidad": ["SS24", "FW24", np.nan, "SS24", "FW24"],
+        }),
+        "New Era": pd.DataFrame({
+            "U_Estilo": ["NE01", "NE02", "NE03"],
+            "U_Silueta": ["59FIFTY", "9FORTY", "9TWENTY"],
+            "U_Team": ["NEW YORK YANKEES", "LOS ANGELES DODGERS", np.nan],
+            "U_Descrip_Color": ["NEGRO", "AZUL", "ROJO"],
+            "U_Segmento": ["HEADWEAR", "HEADWEAR", "HEADWEAR"],
+            "U_Liga": [np.nan, "MLB-CUSTOM", ""],
+            "U_Coleccion_NE": ["CORE", np.nan, "CORE"],
+            "U_Genero": ["UNISEX", "UNISEX", "MENS"],
+            "U_Descripcion": ["GORRA NY", "GORRA LA", np.nan],
+            "U_Temporalidad": ["SS24", "FW24", "SS24"],
+        }),
+        "Birkenstock": pd.DataFrame({
+            "U_Estilo": ["F100", "S001", "12345"],
+            "U_Genero": ["MENS", "WOMENS", "UNISEX"],
+            "U_Categoria": ["SANDALIA", np.nan, "ZUECO"],
+        }),
+        "Psycho Bunny": pd.DataFrame({
+            "U_Estilo": ["PB01 ", "S001", "X500"],
+            "U_Genero": ["MENS", "WOMENS", np.nan],
+            "U_Prenda": ["POLO", "TENIS", "OTRO"],
+            "U_Subprenda": ["PIQUE", np.nan, "OTRO"],
+            "U_Temporalidad": ["SS24", "FW24", "SS24"],
+        }),
+        "Adolfo": pd.DataFrame({
+            "U_Estilo": ["C300", "U400"],
+            "U_Genero": ["MENS", "WOMENS"],
+            "U_Categoria": ["CALZADO", "ACCESORIOS"],
+        }),
+        "Fabletics": pd.DataFrame({
+            "U_Estilo": ["FB01", "FB02", "FB01"],
+            "U_Estilo_Color": ["FB01-BLK", "FB02-GRN", "FB01-RED"],
+            "U_Division": ["ACTIVE", "LIFESTYLE", np.nan],
+            "U_Genero": ["WOMENS", "WOMENS", "MENS"],
+            "U_Segmento": ["APPAREL", np.nan, "APPAREL"],
+            "U_Prenda": ["LEGGING", "TOP", "LEGGING"],
+            "U_Subprenda": [np.nan, "CROP", "FULL"],
+            "U_Categoria": ["BOTTOMS", "TOPS", "BOTTOMS"],
+        }),
+    }
+
+
+def cargar_golden(brand):
+    """Salida esperada de una marca ({"columns", "index", "data", "dtypes"}, nulos como null)"""
+    with open(os.path.join(GOLDEN_DIR, f"{brand}.json"), encoding="utf-8") as f:
+        golden = json.load(f)
+    df = pd.DataFrame(golden["data"], columns=golden["columns"], index=golden["index"], dtype=object)
+    df = df.astype(golden["dtypes"])
+    # Las columnas de texto usan NaN como nulo, igual que la limpieza
+    return df.where(df.notna(), np.nan)
+
+
+@pytest.mark.parametrize("brand", MARCAS)
+def test_limpieza_igual_que_los_cleaners_imperativos(brand):
+    cleaner = DataCleaner(brand, referencias_marcas())
+    cleaner.show_messages = False
+    cleaner.compact_output = False
+
+    resultado = cleaner.clean_data(archivo_marcas())
+
+    pd.testing.assert_frame_equal(resultado, cargar_golden(brand))
@@ -0,0 +1,206 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from bson import ObjectId
+
+import mongo_extractor
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(mongo_extractor, "SNAPSHOT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def documentos_referencia():
+    # Tallas y estilos guardados unas veces como número y otras como texto, un campo ausente
+    # y tipos BSON (ObjectId, fechas)
+    return [
+        {"_id": ObjectId(), "U_Estilo": 100, "U_Talla": 7, "U_Genero": "M",
+         "updatedate": datetime.datetime(2024, 1, 1)},
+        {"_id": ObjectId(), "U_Estilo": "S001", "U_Talla": "7.5",
+         "updatedate": datetime.datetime(2024, 1, 2)},
+        {"_id": ObjectId(), "U_Estilo": "100", "U_Talla": None, "U_Genero": "W",
+         "updatedate": datetime.datetime(2024, 1, 3)},
+    ]
+
+
+def test_snapshot_conserva_los_tipos(snapshot_dir):
+    descargado = mongo_extractor.documentos_a_dataframe(documentos_referencia())
+
+    mongo_extractor.guardar_snapshot(descargado, "Skechers ref")
+    leido, metadata = mongo_extractor.leer_snapshot("Skechers ref")
+
+    assert metadata["documentos"] == 3
+    pd.testing.assert_frame_equal(leido, descargado)
+    assert leido["U_Estilo"].tolist() == [100, "S001", "100"]
+    assert leido["U_Talla"].tolist()[:2] == [7, "7.5"]
+    assert isinstance(leido["_id"][0], ObjectId)
+
+
+def test_snapshot_texto_con_nulos(snapshot_dir):
+    descargado = pd.DataFrame({"U_Estilo": ["S001", np.nan], "U_Suela": [np.nan, "SU1"], "n": [1.0, np.nan]})
+
+    mongo_extractor.guardar_snapshot(descargado, "coleccion", campos=["U_Estilo", "U_Suela", "n"])
+    leido, _ = mongo_extractor.leer_snapshot("coleccion", campos=["U_Estilo", "U_Suela", "n"])
+
+    pd.testing.assert_frame_equal(leido, descargado)
+
+
+def test_marca_de_agua_en_texto_solo_con_fechas_iso_homogeneas():
+    iso = pd.DataFrame({"updatedate": ["2024-01-05T10:00:00Z", "2024-02-01T09:30:00Z", np.nan]})
+    locales = pd.DataFrame({"updatedate": ["5/1/2024", "12/31/2023"]})
+    mezcladas = pd.DataFrame({"updatedate": ["2024-01-05", "2024-01-05T10:00:00+02:00"]})
+
+    assert mongo_extractor._calcular_marcas_agua(iso) == {
+        "updatedate": {"tipo": "texto", "valor": "2024-02-01T09:30:00Z"}}
+    assert mongo_extractor._calcular_marcas_agua(locales) == {}
+    assert mongo_extractor._calcular_marcas_agua(mezcladas) == {}
+
+
+def test_snapshot_incremental_se_deduplica_por_clave(snapshot_dir, monkeypatch):
+    monkeypatch.setattr(mongo_extractor, "_usa_sincronizacion_incremental", lambda *args: True)
+    campos = ["U_Estilo", "U_Genero"]
+    documentos = pd.DataFrame({
+        "U_Estilo": ["S001", "S002", "S001", np.nan, np.nan],
+        "U_Genero": ["M", "W", "X", "U", "Y"],
+        "_id": ["a1", "a2", "a3", "a4", "a5"],
+        "updatedate": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]),
+    })
+    mongo_extractor.guardar_snapshot(documentos, "Skechers ref", campos, extra={"incremental": True})
+
+    df = mongo_extractor.cargar_coleccion_con_snapshot("Skechers ref", campos=campos, agrupar_por=["U_Estilo"])
+
+    assert df.columns.tolist() == campos
+    assert df["U_Estilo"].tolist()[:2] == ["S001", "S002"]
+    assert df["U_Genero"].tolist() == ["M", "W", "U"]
+    assert df.attrs["snapshot"] is not None
+
+
+def test_busqueda_dirigida_solo_en_arranque_en_frio(snapshot_dir, monkeypatch):
+    import threading
+
+    from utils.data_cleaner import DataCleaner
+    from utils.reference_provider import ReferenceProvider
+
+    documentos = mongo_extractor.documentos_a_dataframe([
+        {"_id": ObjectId(), "U_Estilo": "S001", "U_Genero": "MENS", "U_Suela": "GOMA",
+         "updatedate": datetime.datetime(2024, 1, 1)},
+        {"_id": ObjectId(), "U_Estilo": "S002", "U_Genero": "WOMENS", "U_Suela": "EVA",
+         "updatedate": datetime.datetime(2024, 1, 2)},
+    ])
+    consultas = []
+
+    def crear_dataframe(nombre, limite=None, campos=None, agrupar_por=None, claves_busqueda=None, filtro=None):
+        consultas.append(claves_busqueda)
+        df = documentos[[c for c in documentos.columns if campos is None or c in campos]]
+        if claves_busqueda:
+            clave, valores = next(iter(claves_busqueda.items()))
+            df = df[df[clave].isin(valores)]
+        if agrupar_por:
+            df = df.drop_duplicates(subset=agrupar_por)
+        return df.reset_index(drop=True)
+
+    monkeypatch.setattr(mongo_extractor, "crear_dataframe_de_coleccion", crear_dataframe)
+    monkeypatch.setitem(mongo_extractor._colecciones_sincronizables, "Skechers ref", True)
+    # Mismos parámetros que get_reference_provider en app.py
+    provider = ReferenceProvider(lambda: ["Skechers ref"], mongo_extractor.cargar_coleccion_con_snapshot,
+                                 deduplicar=mongo_extractor.DEDUP_EN_SERVIDOR,
+                                 umbral_semijoin=mongo_extractor.UMBRAL_CLAVES_SEMIJOIN,
+                                 ttl_segundos=mongo_extractor.SNAPSHOT_TTL_SEGUNDOS,
+                                 rutas=mongo_extractor.COLECCIONES_POR_MARCA)
+
+    def limpiar():
+        cleaner = DataCleaner("SK", provider)
+        cleaner.show_messages = False
+        return cleaner.clean_data(pd.DataFrame({"ItemName": ["S001/Tenis/8/BLK"], "ItemCode": ["1"],
+                                                "Empresa": ["E1"]}))
+
+    primera = limpiar()
+    for hilo in threading.enumerate():
+        if hilo.name.startswith("snapshot-"):
+            hilo.join()
+    # Arranque en frío: búsqueda dirigida y descarga completa del snapshot en segundo plano
+    assert len(consultas) == 2 and {"U_Estilo": ["S001"]} in consultas
+
+    segunda = limpiar()
+
+    assert len(consultas) == 2
+    assert segunda["U_Genero"].tolist() == primera["U_Genero"].tolist() == ["MENS"]
+    assert list(provider.loaded()) != []
+
+
+def sin_mongo(monkeypatch, documentos):
+    """Sustituye MongoDB por los documentos dados; obtener_cliente falla si se llama"""
+    def obtener_cliente():
+        raise AssertionError("no debe consultar MongoDB")
+
+    def crear_dataframe(nombre, limite=None, campos=None, agrupar_por=None, claves_busqueda=None, filtro=None):
+        df = documentos[[c for c in documentos.columns if campos is None or c in campos]]
+        if agrupar_por:
+            df = df.drop_duplicates(subset=agrupar_por)
+        return df.reset_index(drop=True)
+
+    monkeypatch.setattr(mongo_extractor, "obtener_cliente", obtener_cliente)
+    monkeypatch.setattr(mongo_extractor, "crear_dataframe_de_coleccion", crear_dataframe)
+    # Proceso nuevo: sin comprobaciones memorizadas
+    monkeypatch.setattr(mongo_extractor, "_colecciones_sincronizables", {})
+
+
+def test_arranque_en_caliente_no_comprueba_las_fechas_en_mongo(snapshot_dir, monkeypatch):
+    campos = ["U_Estilo", "U_Genero"]
+    sin_mongo(monkeypatch, pd.DataFrame({
+        "_id": ["a1", "a2", "a3"], "U_Estilo": ["S001", "S002", "S001"], "U_Genero": ["M", "W", "X"],
+        "updatedate": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"]),
+    }))
+    mongo_extractor._refrescar_snapshot("Skechers ref", campos)
+    monkeypatch.setattr(mongo_extractor, "_colecciones_sincronizables", {})
+
+    df = mongo_extractor.cargar_coleccion_con_snapshot("Skechers ref", campos=campos, agrupar_por=["U_Estilo"])
+
+    _, metadata = mongo_extractor.leer_snapshot("Skechers ref", campos)
+    assert metadata["incremental"] and metadata["sincronizable"]
+    assert df["U_Genero"].tolist() == ["M", "W"]
+
+
+def test_snapshot_sin_marca_de_agua_no_es_incremental(snapshot_dir, monkeypatch):
+    campos = ["U_Estilo", "U_Genero"]
+    sin_mongo(monkeypatch, pd.DataFrame({"_id": ["a1", "a2"], "U_Estilo": ["S001", "S001"], "U_Genero": ["M", "X"]}))
+
+    mongo_extractor._refrescar_snapshot("Skechers ref", campos)
+    _, metadata = mongo_extractor.leer_snapshot("Skechers ref", campos)
+    assert not metadata["incremental"] and not metadata["sincronizable"]
+
+    # El snapshot deduplicado en el servidor también guarda la comprobación
+    mongo_extractor._refrescar_snapshot("Skechers ref", campos, ["U_Estilo"])
+    _, metadata = mongo_extractor.leer_snapshot("Skechers ref", campos, ["U_Estilo"])
+    assert metadata["sincronizable"] is False
+
+    monkeypatch.setattr(mongo_extractor, "_colecciones_sincronizables", {})
+    assert not mongo_extractor._usa_sincronizacion_incremental("Skechers ref", campos, ["U_Estilo"])
+
+
+def test_ping_solo_al_crear_el_cliente(monkeypatch):
+    from utils.extraction_metrics import ExtractionMetrics
+
+    pings = []
+
+    class Cliente:
+        def __init__(self, *args, **kwargs):
+            self.admin = self
+
+        def command(self, nombre):
+            pings.append(nombre)
+
+    monkeypatch.setattr(mongo_extractor, "MongoClient", Cliente)
+    monkeypatch.setitem(mongo_extractor.MONGO_CONFIG, "mongouri", "mongodb://prueba")
+    monkeypatch.setattr(mongo_extractor, "_cliente", None)
+
+    for _ in range(3):
+        metricas = ExtractionMetrics("Skechers ref", "completa")
+        mongo_extractor._conectar(metricas)
+        assert "conexion" in metricas.fases
+
+    assert pings == ["ping"]
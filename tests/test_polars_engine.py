@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from test_marcas import MARCAS, archivo_marcas, referencias_marcas
+from utils.data_cleaner import DataCleaner
+
+pytest.importorskip("polars")
+
+
+def archivo_con_nulos():
+    df = archivo_marcas()
+    df.loc[len(df)] = [np.nan, "300099", "E1", 99.0]
+    return df
+
+
+def archivo_mixto():
+    """ItemCode y Extra con números y texto en la misma columna (como llegan de un Excel)"""
+    df = archivo_con_nulos()
+    df["ItemCode"] = df["ItemCode"].astype(object)
+    df.loc[0, "ItemCode"] = 300001
+    df["Extra"] = df["Extra"].astype(object)
+    df.loc[1, "Extra"] = "n/a"
+    return df
+
+
+def referencias_mixtas():
+    """Referencias con valores de distinto tipo en una columna (como llegan de MongoDB)"""
+    referencias = referencias_marcas()
+    for df in referencias.values():
+        columnas = [col for col in df.columns if col not in ("U_Estilo", "U_Estilo_Color")]
+        df[columnas[0]] = df[columnas[0]].astype(object)
+        df.loc[0, columnas[0]] = 1
+        if len(columnas) > 1:
+            df[columnas[1]] = df[columnas[1]].astype(object)
+            df.loc[1, columnas[1]] = 2.5
+    return referencias
+
+
+def limpiar_con_ambos_motores(brand, archivo, referencias, compact_output=True):
+    resultados = []
+    for engine in ("pandas", "polars"):
+        cleaner = DataCleaner(brand, referencias(), engine=engine)
+        cleaner.show_messages = False
+        cleaner.compact_output = compact_output
+        resultados.append(cleaner.clean_data(archivo()))
+    return resultados
+
+
+@pytest.mark.parametrize("archivo,referencias", [
+    (archivo_con_nulos, referencias_marcas),
+    (archivo_con_nulos, referencias_mixtas),
+    (archivo_mixto, referencias_mixtas),
+])
+@pytest.mark.parametrize("compact_output", [True, False])
+@pytest.mark.parametrize("brand", MARCAS)
+def test_polars_igual_que_pandas(brand, compact_output, archivo, referencias):
+    pandas, polars = limpiar_con_ambos_motores(brand, archivo, referencias, compact_output)
+
+    pd.testing.assert_frame_equal(polars, pandas)
+
+
+def test_polars_codigo_de_color_sin_valores():
+    def sin_codigo_de_color():
+        return pd.DataFrame({"ItemName": ["S1/Desc/7/NEGRO", "S2/Desc/8", np.nan],
+                             "ItemCode": ["300", "400", "500"], "Empresa": ["E1", "E1", "E1"]})
+
+    pandas, polars = limpiar_con_ambos_motores("CL", sin_codigo_de_color, dict, compact_output=False)
+
+    assert polars["u_cod_color"].dtype == np.float64
+    pd.testing.assert_frame_equal(polars, pandas)
+
+
+@pytest.mark.parametrize("compact_output", [True, False])
+@pytest.mark.parametrize("brand", MARCAS)
+def test_polars_archivo_vacio(brand, compact_output):
+    def archivo_vacio():
+        return archivo_marcas().iloc[:0]
+
+    pandas, polars = limpiar_con_ambos_motores(brand, archivo_vacio, referencias_marcas, compact_output)
+
+    assert polars.empty
+    pd.testing.assert_frame_equal(polars, pandas)
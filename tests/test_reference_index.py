@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from utils.reference_index import ReferenceIndex
+
+
+def test_buscar_cascada_usa_el_estilo_si_no_cruza_el_estilo_color():
+    indice = ReferenceIndex(pd.DataFrame({
+        "U_Estilo": ["FB01", "FB01", "FB02"],
+        "U_Estilo_Color": ["FB01-BLK", "FB01-RED", "FB02-GRN"],
+        "U_Division": ["ACTIVE", np.nan, "LIFESTYLE"],
+        "U_Genero": ["WOMENS", "MENS", "WOMENS"],
+    }), ["U_Estilo", "U_Estilo_Color"])
+    estilos = pd.Series(["FB01", "FB01", "FB02", "FB01", "FB03"], index=[10, 11, 12, 13, 14])
+    estilos_color = pd.Series(["FB01-BLK", "FB01-XXX", "FB02-XXX", "FB01-RED", "FB03-BLK"], index=estilos.index)
+
+    resultado = indice.buscar_cascada([
+        ("U_Estilo_Color", estilos_color, ["U_Division", "U_Genero"]),
+        ("U_Estilo", estilos, ["U_Division", "U_Genero"]),
+    ])
+
+    assert resultado.index.tolist() == [10, 11, 12, 13, 14]
+    # Si el estilo-color no cruza se usa el primer documento del estilo
+    assert resultado["U_Division"].tolist()[:3] == ["ACTIVE", "ACTIVE", "LIFESTYLE"]
+    assert resultado["U_Genero"].tolist()[:3] == ["WOMENS", "WOMENS", "WOMENS"]
+    # Si cruza, manda el estilo-color y el estilo solo rellena sus huecos
+    assert resultado.loc[13].tolist() == ["ACTIVE", "MENS"]
+    assert resultado.loc[14].isna().all()
@@ -0,0 +1,107 @@
+import pandas as pd
+import pytest
+
+from utils.reference_provider import ReferenceProvider
+
+
+def proveedor():
+    referencia = pd.DataFrame({"U_Estilo": ["S001", "S002"], "U_Genero": ["M", "W"], "n": [1, 2]})
+    cargadas = []
+
+    def cargar(nombre, **kwargs):
+        cargadas.append(nombre)
+        return referencia.copy()
+
+    return ReferenceProvider(lambda: ["Skechers ref"], cargar), cargadas
+
+
+def test_get_reference_no_permite_modificar_la_cache():
+    provider, cargadas = proveedor()
+    referencia = provider.get_reference("SK", "Skechers", ["U_Estilo", "U_Genero", "n"])
+
+    with pytest.raises(ValueError):
+        referencia.loc[0, "U_Genero"] = "X"
+    with pytest.raises(ValueError):
+        referencia.loc[0, "n"] = 99
+    referencia["U_Talla"] = "7"
+
+    otra = provider.get_reference("SK", "Skechers", ["U_Estilo", "U_Genero", "n"])
+    assert cargadas == ["Skechers ref"]
+    assert otra.columns.tolist() == ["U_Estilo", "U_Genero", "n"]
+    assert otra["U_Genero"].tolist() == ["M", "W"]
+    assert otra["n"].tolist() == [1, 2]
+
+
+def test_tabla_del_indice_no_permite_modificar_la_cache():
+    provider, _ = proveedor()
+    indice = provider.get_index("SK", "Skechers", ["U_Estilo", "U_Genero", "n"])
+
+    tabla = indice.tabla("U_Estilo")
+    with pytest.raises(ValueError):
+        tabla.loc["S001", "U_Genero"] = "X"
+
+    assert indice.buscar("U_Estilo", pd.Series(["S001"]))["U_Genero"].tolist() == ["M"]
+
+
+def test_psycho_bunny_encuentra_estilos_con_espacios_en_la_referencia():
+    from utils.data_cleaner import DataCleaner
+
+    coleccion = pd.DataFrame({"U_Estilo": [" PB01 ", "PB02"], "U_Genero": ["MENS", "WOMENS"],
+                              "U_Prenda": ["POLO", "TEE"]})
+    consultas = []
+
+    def cargar(nombre, campos=None, claves_busqueda=None, **kwargs):
+        consultas.append(claves_busqueda)
+        if claves_busqueda:
+            # Como $in en MongoDB: las claves se comparan tal cual
+            clave, valores = next(iter(claves_busqueda.items()))
+            return coleccion[coleccion[clave].isin(valores)].reset_index(drop=True)
+        return coleccion.copy()
+
+    provider = ReferenceProvider(lambda: ["Psycho Bunny ref"], cargar, umbral_semijoin=5000)
+    cleaner = DataCleaner("PB", provider)
+    cleaner.show_messages = False
+
+    resultado = cleaner.clean_data(pd.DataFrame({"ItemName": ["PB01/Polo/M/BLUE"], "ItemCode": ["1"],
+                                                 "Empresa": ["E1"]}))
+
+    assert resultado[["U_Estilo", "U_Genero", "U_Prenda"]].iloc[0].tolist() == ["PB01", "MENS", "POLO"]
+    assert consultas == [None]
+
+
+def test_indice_se_reutiliza_con_busqueda_dirigida_sobre_snapshot():
+    consultas = []
+
+    def cargar(nombre, campos=None, claves_busqueda=None, **kwargs):
+        # Como cargar_coleccion_con_snapshot con snapshot en disco: devuelve la colección completa
+        consultas.append(claves_busqueda)
+        df = pd.DataFrame({"U_Estilo": ["S001", "S002"], "U_Genero": ["M", "W"]})
+        df.attrs["snapshot"] = "2024-01-01T00:00:00"
+        return df
+
+    # ttl_segundos=0: cada llamada vuelve al cargador, que devuelve el mismo snapshot
+    provider = ReferenceProvider(lambda: ["Skechers ref"], cargar, umbral_semijoin=5000, ttl_segundos=0)
+
+    primero = provider.get_index("SK", "Skechers", ["U_Estilo", "U_Genero"], valores_clave=["S001"])
+    segundo = provider.get_index("SK", "Skechers", ["U_Estilo", "U_Genero"], valores_clave=["S002"])
+
+    assert segundo is primero
+    assert len(consultas) == 2
+    assert segundo.buscar("U_Estilo", pd.Series(["S002"]))["U_Genero"].tolist() == ["W"]
+
+
+def test_get_reference_no_bloquea_el_dataframe_del_llamador():
+    referencia = pd.DataFrame({"U_Estilo": ["S001", "S002"], "U_Genero": ["M", "W"], "n": [1, 2],
+                               "fecha": pd.to_datetime(["2024-01-01", "2024-01-02"])})
+    provider = ReferenceProvider.from_dataframes({"Skechers ref": referencia})
+
+    vista = provider.get_reference("SK", "Skechers", ["U_Estilo", "U_Genero", "n", "fecha"])
+    with pytest.raises(ValueError):
+        vista.loc[0, "n"] = 99
+    vista.loc[0, "fecha"] = pd.Timestamp("2025-01-01")
+
+    referencia.loc[0, "U_Genero"] = "X"
+    referencia.loc[1, "n"] = 5
+    assert referencia["U_Genero"].tolist() == ["X", "W"]
+    assert referencia["n"].tolist() == [1, 5]
+    assert referencia["fecha"].iloc[0] == pd.Timestamp("2024-01-01")